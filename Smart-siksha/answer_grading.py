@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import math
+import time
+import hashlib
+import threading
+from collections import Counter
+import quiz_db
+import near_duplicates
+from question_bank import normalize, question_hash
+
+# -------------------- ANSWER GRADING SETTINGS --------------------
+# Answers with fewer words are graded 0 without asking the model
+MIN_WORDS = int(os.environ.get("EVAL_MIN_WORDS", "3"))
+# TF-IDF cosine to an accepted answer above which that answer's grade is reused
+SIMILAR_ANSWER = float(os.environ.get("EVAL_SIMILAR_ANSWER", "0.92"))
+# Model-graded answers scoring at least this become reference answers for their question
+ACCEPT_SCORE = int(os.environ.get("EVAL_ACCEPT_SCORE", "8"))
+REFERENCE_ANSWERS = int(os.environ.get("EVAL_REFERENCE_ANSWERS", "50"))
+# Answers sent to the model together in batch mode
+BATCH_SIZE = int(os.environ.get("EVAL_BATCH_SIZE", "8"))
+# Most answers accepted by one batch request
+MAX_ANSWERS = int(os.environ.get("EVAL_MAX_ANSWERS", "200"))
+
+_LOOKUP_SQL = "SELECT result FROM answer_grades WHERE question_key = ? AND answer_key = ?"
+_STORE_SQL = '''
+    INSERT OR REPLACE INTO answer_grades (question_key, answer_key, answer, result, score, created_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+_REFERENCES_SQL = '''
+    SELECT answer, result FROM answer_grades
+    WHERE question_key = ? AND score >= ?
+    ORDER BY created_at DESC
+    LIMIT ?
+'''
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+def normalize_answer(text):
+    """Lower-case, punctuation to spaces, whitespace collapsed: the answer part of the cache key"""
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", (text or "").lower())).strip()
+
+
+def answer_key(answer):
+    return hashlib.sha1(normalize_answer(answer).encode("utf-8")).hexdigest()[:16]
+
+
+def _terms(text):
+    return near_duplicates.content_words(text, numbers=True)
+
+
+def _tfidf(counts, idf):
+    vector = {term: count * idf.get(term, 1.0) for term, count in counts.items()}
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return vector, norm
+
+
+def _cosine(a, b):
+    (va, na), (vb, nb) = a, b
+    if not na or not nb:
+        return 0.0
+    if len(va) > len(vb):
+        va, vb = vb, va
+    return sum(v * vb.get(term, 0.0) for term, v in va.items()) / (na * nb)
+
+
+def _result(score, correctness, feedback, source, weak_topics=()):
+    return {"score": score, "correctness": correctness, "feedback": feedback,
+            "weak_topics": list(weak_topics), "source": source}
+
+
+def _count(source):
+    with _counts_lock:
+        _counts[source] += 1
+
+
+class Grader:
+    """
+    Pre-scoring and cached grades for answers to one question.
+    pregrade() settles the obvious cases locally; the rest go to the model and come back through store().
+    """
+
+    def __init__(self, question):
+        self.question = question
+        self.question_key = question_hash(normalize(question))
+        self.question_terms = set(_terms(question))
+        self._references = None
+
+    def references(self):
+        """Accepted (model-graded, score >= ACCEPT_SCORE) answers to this question, newest first, as TF-IDF vectors"""
+        if self._references is None:
+            with quiz_db.get_pool().connection() as conn:
+                rows = conn.execute(_REFERENCES_SQL, (self.question_key, ACCEPT_SCORE, REFERENCE_ANSWERS)).fetchall()
+            docs = [Counter(_terms(answer)) for answer, _ in rows]
+            # smoothed IDF over the question and its accepted answers
+            df = Counter(term for doc in docs + [Counter(self.question_terms)] for term in doc)
+            self.idf = {term: math.log((2 + len(docs)) / (1 + n)) + 1 for term, n in df.items()}
+            self._references = [(_tfidf(doc, self.idf), json.loads(result)) for doc, (_, result) in zip(docs, rows)]
+        return self._references
+
+    def pregrade(self, answer):
+        """A grade for answer without the model, or None when it needs one"""
+        words = normalize_answer(answer).split()
+        terms = _terms(answer)
+        if len(words) < MIN_WORDS or not terms:
+            _count("empty")
+            return _result(0, "incorrect", "The answer is empty or too short to grade. "
+                                           "Write a few sentences in your own words.", "prescore")
+
+        # an answer that adds even one content word ("Plants release oxygen ...") may be right: the model decides
+        if not set(terms) - self.question_terms:
+            _count("copied")
+            return _result(0, "incorrect", "The answer only repeats the question. "
+                                           "Explain the idea in your own words.", "prescore")
+
+        with quiz_db.get_pool().connection() as conn:
+            row = conn.execute(_LOOKUP_SQL, (self.question_key, answer_key(answer))).fetchone()
+        if row:
+            _count("cache")
+            return dict(json.loads(row[0]), source="cache")
+
+        references = self.references()
+        if references:
+            vector = _tfidf(Counter(terms), self.idf)
+            best, result = max(((_cosine(vector, ref), result) for ref, result in references), key=lambda x: x[0])
+            if best >= SIMILAR_ANSWER:
+                _count("similar_answer")
+                return dict(result, source="similar_answer")
+        return None
+
+    def store(self, answer, result):
+        """Cache a model grade; good ones also become reference answers"""
+        result = {k: v for k, v in result.items() if k != "source"}
+        with quiz_db.get_pool().transaction() as conn:
+            conn.execute(_STORE_SQL, (self.question_key, answer_key(answer), answer, json.dumps(result),
+                                      int(result.get("score", 0)), time.time()))
+        if self._references is not None and result.get("score", 0) >= ACCEPT_SCORE:
+            self._references = None
+        _count("model")
+
+
+def stats():
+    with quiz_db.get_pool().connection() as conn:
+        cached = conn.execute("SELECT COUNT(*) FROM answer_grades").fetchone()[0]
+    with _counts_lock:
+        counts = dict(_counts)
+    graded = sum(counts.values())
+    return {
+        "graded": graded,
+        "by_source": counts,
+        "model_share": round(counts.get("model", 0) / graded, 3) if graded else None,
+        "cached_grades": cached,
+    }
@@ -1,23 +1,43 @@
-from flask import Flask, render_template, request, jsonify, redirect, session, url_for
+from flask import Flask, render_template, request, jsonify, redirect, session, url_for, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
-import csv, os, subprocess, re, unicodedata, hashlib, threading, time
+import csv, os, subprocess, re, unicodedata, hashlib, threading, time, uuid, queue, shutil
 from fpdf import FPDF
 import numpy as np
 import textwrap
 import random
 from enum import Enum
-import requests
 import json
-import sqlite3
 from datetime import datetime
+from collections import OrderedDict
+import llm_client
+import llm_cache
+import llm_scheduler
+import llm_health
+import llm_breaker
+import tutor_sessions
+import quiz_db
+import question_bank
+import seen_questions
+import near_duplicates
+import math_questions
+import class_grading
+import answer_grading
+import knowledge_tracing
+import image_engine
+import image_cache
+import stage_graph
+import server_session
+from single_flight import SingleFlight
 
 app = Flask(__name__)
 CORS(app)
 app.secret_key = 'your_secret_key_here'
+# Session data lives server-side; the cookie only carries a signed session id
+server_session.init_app(app)
 
 CSV_PATH = "csv/users.csv"
-QUIZ_DB_PATH = "csv/quizzes.db"
+QUIZ_DB_PATH = quiz_db.QUIZ_DB_PATH
 os.makedirs("csv", exist_ok=True)
 os.makedirs("static/generated_pdfs", exist_ok=True)
 os.makedirs("static/generated_videos", exist_ok=True)
@@ -25,34 +45,30 @@ os.makedirs("static/generated_audio", exist_ok=True)
 os.makedirs("static/uploaded_books", exist_ok=True)
 
 def init_quiz_database():
-    """Initialize SQLite database for storing quizzes"""
-    conn = sqlite3.connect(QUIZ_DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS saved_quizzes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_name TEXT,
-            topic TEXT,
-            user_class TEXT,
-            quiz_data TEXT,
-            score INTEGER,
-            total_questions INTEGER,
-            percentage REAL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
-    print("✅ Quiz database initialized")
+    """Create or upgrade the SQLite quiz database (WAL mode, pooled connections, see quiz_db.py)"""
+    version = quiz_db.migrate()
+    print(f"✅ Quiz database initialized (schema v{version})")
+    # questions banked before the near-duplicate index existed are indexed in the background
+    threading.Thread(target=near_duplicates.index_missing, daemon=True).start()
+    # quiz history queued by the knowledge tracing migration is replayed in small chunks in the background
+    threading.Thread(target=knowledge_tracing.backfill, daemon=True).start()
 
 init_quiz_database()
 
 # Global variables for video generation
 video_generation_progress = {}
 
+# One running job per output folder; identical concurrent requests attach to it
+video_jobs = SingleFlight("video generation")
+pdf_jobs = SingleFlight("notes PDF")
+bank_jobs = SingleFlight("question bank refill")
+
+# Per-route latency SLOs (ms); a breached SLO serves the route's fast fallback until the model recovers
+quiz_breaker = llm_breaker.get("generate_quiz", slo_ms=30000)
+video_prompts_breaker = llm_breaker.get("video_prompts", slo_ms=60000)
+narration_breaker = llm_breaker.get("video_narration", slo_ms=60000)
+notes_breaker = llm_breaker.get("notes_pdf", slo_ms=300000)
+
 # Video generation classes and functions
 class TransitionType(Enum):
     FADE = "fade"
@@ -71,6 +87,10 @@ VIDEO_WIDTH = 1280
 VIDEO_HEIGHT = 720
 TRANSITION_DURATION = 0.5
 TRANSITION_FPS = 24
+MAX_VIDEO_SCENES = 15
+# "ffmpeg": one captioned still per (image, caption) segment, encoded once by ffmpeg's concat demuxer
+# "frames": every one of the ~24 frames a second captioned and written through cv2.VideoWriter
+VIDEO_RENDER_MODE = os.environ.get("VIDEO_RENDER_MODE", "ffmpeg" if shutil.which("ffmpeg") else "frames")
 
 # ----------------- Gamification Data Stores -----------------
 # These reset when server restarts (good enough for hackathon demo)
@@ -90,7 +110,9 @@ def interests():
 @app.route("/home")
 def home():
     username = session.get("username")
-    return render_template("home.html", user_badges=user_badges.get(username, []))
+    recommendations = knowledge_tracing.recommendations(session.get("user_name", "User"))
+    return render_template("home.html", user_badges=user_badges.get(username, []),
+                           recommendations=recommendations)
 
 
 @app.route("/logout")
@@ -169,31 +191,10 @@ def quiz():
 def get_last_quiz(user_name, topic):
     """Get the last saved quiz for a user and topic"""
     try:
-        conn = sqlite3.connect(QUIZ_DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT quiz_data, score, total_questions, percentage, created_at, completed_at
-            FROM saved_quizzes
-            WHERE user_name = ? AND topic = ?
-            ORDER BY created_at DESC
-            LIMIT 1
-        ''', (user_name, topic))
-
-        result = cursor.fetchone()
-        conn.close()
-
+        result = quiz_db.last_quiz(user_name, topic)
         if result:
-            quiz_data, score, total_questions, percentage, created_at, completed_at = result
-            return {
-                'quiz_data': json.loads(quiz_data),
-                'score': score,
-                'total_questions': total_questions,
-                'percentage': percentage,
-                'created_at': created_at,
-                'completed_at': completed_at,
-                'has_quiz': True
-            }
+            result['has_quiz'] = True
+            return result
         else:
             return {'has_quiz': False}
 
@@ -204,27 +205,13 @@ def get_last_quiz(user_name, topic):
 def save_quiz_to_db(user_name, topic, user_class, quiz_data, score=None, total_questions=None, percentage=None):
     """Save quiz to database"""
     try:
-        conn = sqlite3.connect(QUIZ_DB_PATH)
-        cursor = conn.cursor()
-
         if score is not None:
-            # Update existing quiz with results
-            cursor.execute('''
-                UPDATE saved_quizzes
-                SET score = ?, total_questions = ?, percentage = ?, completed_at = CURRENT_TIMESTAMP
-                WHERE user_name = ? AND topic = ? AND completed_at IS NULL
-                ORDER BY created_at DESC
-                LIMIT 1
-            ''', (score, total_questions, percentage, user_name, topic))
+            # Update the newest unfinished quiz with results
+            quiz_db.complete_quiz(user_name, topic, score, total_questions, percentage)
         else:
             # Insert new quiz
-            cursor.execute('''
-                INSERT INTO saved_quizzes (user_name, topic, user_class, quiz_data)
-                VALUES (?, ?, ?, ?)
-            ''', (user_name, topic, user_class, json.dumps(quiz_data)))
+            quiz_db.insert_quiz(user_name, topic, user_class, quiz_data)
 
-        conn.commit()
-        conn.close()
         print(f"✅ Quiz saved for {user_name} - {topic}")
         return True
 
@@ -234,45 +221,46 @@ def save_quiz_to_db(user_name, topic, user_class, quiz_data, score=None, total_q
 
 @app.route("/get_saved_quizzes", methods=["GET"])
 def get_saved_quizzes():
-    """Get all saved quizzes for the current user"""
+    """
+    Completed quizzes for the current user, newest first.
+    ?limit= sets the page size (default 20); pass the returned next_cursor as ?cursor= for the next page.
+    """
     user_name = session.get("user_name", "User")
 
     try:
-        conn = sqlite3.connect(QUIZ_DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            SELECT topic, score, total_questions, percentage, created_at, completed_at
-            FROM saved_quizzes
-            WHERE user_name = ? AND completed_at IS NOT NULL
-            ORDER BY completed_at DESC
-            LIMIT 20
-        ''', (user_name,))
-
-        results = cursor.fetchall()
-        conn.close()
-
-        saved_quizzes = []
-        for result in results:
-            topic, score, total_questions, percentage, created_at, completed_at = result
-            saved_quizzes.append({
-                'topic': topic,
-                'score': score,
-                'total_questions': total_questions,
-                'percentage': round(percentage, 1),  # Round percentage for display
-                'created_at': created_at,
-                'completed_at': completed_at
-            })
-
-        print(f"✅ Retrieved {len(saved_quizzes)} saved quizzes for {user_name}")
-        return jsonify({'saved_quizzes': saved_quizzes})
-
+        limit = request.args.get("limit", 20, type=int)
+        saved_quizzes, next_cursor = quiz_db.saved_quizzes(user_name, limit=limit, cursor=request.args.get("cursor"))
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor', 'saved_quizzes': []}), 400
     except Exception as e:
         print(f"❌ Error getting saved quizzes: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e), 'saved_quizzes': []}), 500
 
+    print(f"✅ Retrieved {len(saved_quizzes)} saved quizzes for {user_name}")
+    return jsonify({'saved_quizzes': saved_quizzes, 'next_cursor': next_cursor})
+
+@app.route("/topic_analytics", methods=["GET"])
+def topic_analytics():
+    """
+    How topics perform across all students, read from the rollup tables (never saved_quizzes).
+    ?topic= returns that topic's summary, score histogram and ?days= daily buckets (default 30);
+    without a topic, the ?limit= most-attempted topics.
+    """
+    topic = (request.args.get("topic") or "").strip()
+    try:
+        if not topic:
+            return jsonify({'topics': quiz_db.top_topics(request.args.get("limit", 20, type=int))})
+        analytics = quiz_db.topic_analytics(topic, days=request.args.get("days", 30, type=int))
+    except Exception as e:
+        print(f"❌ Error reading topic analytics: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    if analytics is None:
+        return jsonify({'error': f'No completed quizzes for {topic}'}), 404
+    return jsonify(analytics)
+
 @app.route("/watch/<topic>")
 def watch_video(topic):
     username = session.get("username")
@@ -318,14 +306,6 @@ def check_and_award_badges(username):
     if points >= 100 and "Achiever" not in user_badges.get(username, []):
         award_badge(username, "Achiever")
 
-def adaptive_recommendation(score, topic):
-    if score < 50:
-        return f"Recommend simpler video for {topic}"
-    elif score < 80:
-        return f"Recommend revision quiz for {topic}"
-    else:
-        return f"Recommend challenge questions for {topic}"
-
 
 # -----------------------------------------------------------------------------------------------------------------------------------------
 
@@ -353,89 +333,52 @@ def _shuffle_options_preserve_answer(q: dict) -> dict:
     q["answer_index"] = new_idx
     return q
 
-def _gen_unique_math_question() -> dict:
+def _accept_unique_question(q: dict, seen: set, used_set: set):
     """
-    Generate a single unique arithmetic question with plausible distractors.
-    Operations: +, -, ×, ÷, squares, square roots, simple fractions.
+    Validate a single question and return it with shuffled options.
+    Returns None if it is malformed or repeats a question in seen/used_set; accepted texts are added to seen.
     """
-    op = random.choice(["add", "sub", "mul", "div", "sq", "sqrt"])
-    a = random.randint(2, 20)
-    b = random.randint(2, 20)
-
-    if op == "add":
-        question = f"What is {a} + {b}?"
-        correct = a + b
-    elif op == "sub":
-        # ensure non-negative results for middle school
-        if b > a:
-            a, b = b, a
-        question = f"What is {a} - {b}?"
-        correct = a - b
-    elif op == "mul":
-        question = f"What is {a} × {b}?"
-        correct = a * b
-    elif op == "div":
-        # make divisible
-        correct = random.randint(2, 12)
-        a = correct * b
-        question = f"What is {a} ÷ {b}?"
-    elif op == "sq":
-        n = random.randint(2, 15)
-        question = f"What is {n}²?"
-        correct = n * n
-    else:  # "sqrt"
-        n = random.randint(2, 15)
-        val = n * n
-        question = f"What is the square root of {val}?"
-        correct = n
-
-    # plausible distractors near correct
-    distractors = set()
-    candidates = [correct - 2, correct - 1, correct + 1, correct + 2, correct + 3, correct - 3]
-    for c in candidates:
-        if c != correct and c >= 0:
-            distractors.add(c)
-        if len(distractors) == 3:
-            break
-    while len(distractors) < 3:
-        distractors.add(correct + random.randint(4, 8))
-
-    options = [str(correct)] + [str(x) for x in list(distractors)[:3]]
-    random.shuffle(options)
-    answer_index = options.index(str(correct))
-
-    return {
-        "question": question,
-        "options": options,
-        "answer_index": answer_index,
-    }
-
-def _fill_unique_questions(questions: list, topic: str, user_class: str, used_set: set) -> list:
+    if not isinstance(q, dict):
+        return None
+    qt = _normalize_text(q.get("question", ""))
+    if not qt or qt in seen or qt in used_set:
+        return None
+    opts = q.get("options")
+    ai = q.get("answer_index")
+    if not isinstance(opts, list) or len(opts) != 4 or not isinstance(ai, int) or not (0 <= ai < 4):
+        return None
+    seen.add(qt)
+    return _shuffle_options_preserve_answer(q)
+
+def _fill_unique_questions(questions: list, topic: str, user_class: str, used_set: set, accepted: list = None) -> list:
     """
     Ensure we return exactly 10 unique, valid questions.
     - Deduplicate by normalized question text.
     - Shuffle options and correct indices.
     - Fill missing with math generator if topic is math-like; otherwise, generate safe templated Qs.
-    - Avoid cross-generation duplicates using used_set per topic.
+    - Avoid cross-generation duplicates using used_set (the student's seen questions for this topic).
+    - Questions in `accepted` were already validated (and shown) and are kept unchanged.
     """
     # Seed some randomness so successive generations differ
     random.seed(time.time())
 
-    out = []
-    seen = set()
+    out = list(accepted or [])
+    seen = near_duplicates.NearDuplicateSet(_normalize_text(q.get("question", "")) for q in out)
 
     def push(q):
-        qt = _normalize_text(q.get("question", ""))
-        if not qt or qt in seen or qt in used_set:
-            return False
-        opts = q.get("options")
-        ai = q.get("answer_index")
-        if not isinstance(opts, list) or len(opts) != 4 or not isinstance(ai, int) or not (0 <= ai < 4):
+        q = _accept_unique_question(q, seen, used_set)
+        if q is None:
             return False
-        out.append(_shuffle_options_preserve_answer(q))
-        seen.add(qt)
+        out.append(q)
         return True
 
+    def push_arithmetic(band):
+        # arithmetic questions differ by their numbers: one exact-hash check per batch, no near-duplicate lookups
+        exclude = used_set.hashes | _question_hashes(seen.texts)
+        for q in math_questions.unique_questions(10 - len(out), band, exclude_hashes=exclude):
+            seen.add(_normalize_text(q["question"]))
+            out.append(q)
+
     # 1) Keep valid and unique from incoming list
     for q in questions or []:
         if len(out) == 10:
@@ -446,13 +389,12 @@ def _fill_unique_questions(questions: list, topic: str, user_class: str, used_se
     topic_lower = (topic or "").lower()
     is_math = any(k in topic_lower for k in ["math", "algebra", "geometry", "arithmetic", "number", "fraction", "equation"])
 
-    attempts = 0
-    while len(out) < 10 and attempts < 200:
-        attempts += 1
-        if is_math:
-            q = _gen_unique_math_question()
-            push(q)
-        else:
+    if is_math:
+        push_arithmetic(user_class)
+    else:
+        attempts = 0
+        while len(out) < 10 and attempts < 200:
+            attempts += 1
             # Safe templated general question with a clear correct option
             base = random.choice([
                 (f"Which statement is true about {topic}?", ["It has real-world applications", "It is never used", "It has no practical value", "Only experts can learn it"], 0),
@@ -468,37 +410,123 @@ def _fill_unique_questions(questions: list, topic: str, user_class: str, used_se
             }
             push(q)
 
-    # If still short, last resort: duplicate-safe math generators
-    while len(out) < 10:
-        q = _gen_unique_math_question()
-        if push(q):
-            continue
+    # If still short, last resort: arithmetic from the class band, then the widest band
+    for band in (user_class, "graduate"):
+        push_arithmetic(band)
 
     return out
 
-def _update_used_questions_session(topic: str, new_questions: list):
-    used_map = session.get("used_questions", {})
-    used_list = used_map.get(topic, [])
-    for q in new_questions:
-        used_list.append(_normalize_text(q.get("question", "")))
-    # keep last N to prevent cookie from growing too large
-    used_map[topic] = used_list[-200:]
-    session["used_questions"] = used_map
+def _question_hashes(texts) -> set:
+    """question_bank.question_hash of each question text, as SeenSet.hashes stores them"""
+    return {question_bank.question_hash(_normalize_text(text)) for text in texts}
 
-@app.route("/generate_quiz", methods=["POST"])
-def generate_quiz():
-    topic = session.get("current_topic", "General Knowledge")
-    user_class = session.get("user_class", "middle school")
-    user_name = session.get("user_name", "User")
-    data = request.get_json() or {}
-    force_refresh = data.get("force", False)
+def _load_seen_questions(topic: str, user_name: str = None, near: bool = True):
+    """
+    Questions this student was already shown for topic (kept server-side in seen_questions).
+    near=True also treats rewordings of seen bank questions as seen.
+    """
+    user_name = user_name or session.get("user_name", "User")
+    # move the list older versions kept in the session cookie server-side, once
+    legacy = session.pop("used_questions", None)
+    if legacy:
+        for legacy_topic, texts in legacy.items():
+            seen_questions.mark(user_name, legacy_topic, texts)
+    return seen_questions.load(user_name, topic, near=near)
+
+def _mark_questions_seen(topic: str, new_questions: list, user_name: str = None):
+    try:
+        seen_questions.mark(user_name or session.get("user_name", "User"), topic,
+                            [q.get("question", "") for q in new_questions])
+    except Exception as e:
+        print(f"⚠️ Could not record seen questions: {e}")
 
-    cache = session.get("quiz_cache")
-    if cache and cache.get("topic") == topic and not force_refresh:
-        return jsonify(cache["payload"])
+# Streamed quizzes finish after the response headers (and session cookie) are sent,
+# so the final payload waits here until the student's next request picks it up.
+streamed_quiz_results = OrderedDict()
+streamed_quiz_lock = threading.Lock()
+STREAMED_QUIZ_LIMIT = 500
 
-    print(f"🧠 Generating quiz for topic: {topic}, class: {user_class}")
+def _resolve_streamed_quiz():
+    """Move a finished streamed quiz into session["quiz_cache"] and return the cache"""
+    cache = session.get("quiz_cache")
+    if not cache or "stream_id" not in cache:
+        return cache
+    with streamed_quiz_lock:
+        payload = streamed_quiz_results.pop(cache["stream_id"], None)
+    if payload is None:
+        return None
+    session["quiz_cache"] = {"topic": cache["topic"], "payload": payload}
+    return session["quiz_cache"]
+
+class QuizStreamParser:
+    """
+    Pull complete question objects out of a model reply while it is still streaming.
+    Tracks brace depth and JSON string/escape state, and emits every innermost {...}
+    object with a "question" key as soon as its closing brace arrives, whatever
+    wrapper (code fence, {"quiz": [...]}, bare list) the model puts around it.
+    """
 
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.in_string = False
+        self.escape = False
+        self.stack = []  # [start offset, contains nested object]
+
+    def feed(self, text):
+        self.buffer += text
+        found = []
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"' and self.stack:
+                self.in_string = True
+            elif ch == "{":
+                if self.stack:
+                    self.stack[-1][1] = True
+                self.stack.append([self.pos, False])
+            elif ch == "}" and self.stack:
+                start, has_child = self.stack.pop()
+                if not has_child:
+                    try:
+                        obj = json.loads(self.buffer[start:self.pos + 1])
+                    except ValueError:
+                        obj = None
+                    if isinstance(obj, dict) and "question" in obj:
+                        found.append(obj)
+            self.pos += 1
+
+        # Nothing open: drop consumed text so the buffer stays small
+        if not self.stack:
+            self.buffer = ""
+            self.pos = 0
+        return found
+
+def _quiz_question_event(index, q):
+    return f"event: question\ndata: {json.dumps({'index': index, 'question': q})}\n\n"
+
+def _parse_quiz_output(full_output):
+    """Pull the question list out of a model reply; raises ValueError when there is none"""
+    output = re.sub(r"^\`\`\`json\s*|\s*\`\`\`$", "", full_output.strip(), flags=re.IGNORECASE)
+    quiz_data = None
+    try:
+        parsed = json.loads(output)
+        quiz_data = parsed if isinstance(parsed, dict) else {"quiz": parsed}
+    except Exception:
+        m = re.search(r"\{[\s\S]*\"quiz\"[\s\S]*\}", output)
+        if m:
+            quiz_data = json.loads(m.group(0))
+    if not quiz_data or "quiz" not in quiz_data:
+        raise ValueError("Invalid quiz format from model")
+    return quiz_data.get("quiz", [])
+
+def _quiz_prompt(topic, user_class, avoid=None):
     prompt = f"""Generate exactly 10 multiple-choice quiz questions about "{topic}" for {user_class} students.
 
 Each question must have:
@@ -518,59 +546,188 @@ Return ONLY valid JSON in this exact format:
   ]
 }}
 Make sure all 10 questions are about {topic} and appropriate for {user_class} students."""
+    if avoid:
+        prompt += "\nDo not repeat any of these existing questions:\n" + "\n".join(f"- {q}" for q in avoid)
+    return prompt
+
+def _bank_questions(topic, user_class, questions):
+    """Keep validated model questions for later quizzes and top the bank up when it runs low"""
+    try:
+        added = question_bank.add(topic, user_class, questions)
+        if added:
+            print(f"🏦 Banked {added} new questions for {topic} ({user_class})")
+        if question_bank.size(topic, user_class) < question_bank.LOW_WATER + question_bank.QUIZ_SIZE:
+            _start_bank_refill(topic, user_class)
+    except Exception as e:
+        print(f"⚠️ Could not bank questions: {e}")
+
+def _start_bank_refill(topic, user_class):
+    bank_jobs.start_background((question_bank.topic_key(topic), user_class), replenish_question_bank, topic, user_class)
+
+def replenish_question_bank(topic, user_class):
+    """Ask the model for another batch of questions for the bank (runs in the background)"""
+    if quiz_breaker.is_open():
+        return
+    print(f"🏦 Refilling question bank for {topic} ({user_class})")
+    avoid = question_bank.sample_questions(topic, user_class)
+    # uncached and a little warmer than usual, so each refill brings new questions
+    output = llm_client.generate(_quiz_prompt(topic, user_class, avoid), timeout=300, cache=False,
+                                 priority=llm_scheduler.BATCH, options={"temperature": 0.9})
+    seen = near_duplicates.NearDuplicateSet()
+    valid = [q for q in (_accept_unique_question(q, seen, set()) for q in _parse_quiz_output(output)) if q]
+    added = question_bank.add(topic, user_class, valid)
+    print(f"🏦 Refill added {added} questions for {topic} ({user_class})")
+
+def _serve_banked_quiz(topic, user_class, user_name, stream):
+    """Build the quiz from the question bank; returns None when the bank cannot fill one yet"""
+    try:
+        questions, fresh_left = question_bank.draw(topic, user_class, user_name)
+    except Exception as e:
+        print(f"⚠️ Question bank unavailable: {e}")
+        return None
+    if questions is None:
+        # the model call that follows banks its questions and refills from there
+        return None
+    if fresh_left < question_bank.LOW_WATER:
+        _start_bank_refill(topic, user_class)
+
+    quiz_data = {"quiz": [_shuffle_options_preserve_answer(q) for q in questions]}
+    print(f"🏦 Served quiz from the question bank ({fresh_left} unseen left)")
+    save_quiz_to_db(user_name, topic, user_class, quiz_data)
+    session["quiz_cache"] = {"topic": topic, "payload": quiz_data}
+    _mark_questions_seen(topic, quiz_data["quiz"], user_name)
+    if not stream:
+        return jsonify(quiz_data), 200
+    events = [_quiz_question_event(i, q) for i, q in enumerate(quiz_data["quiz"])]
+    events.append(f"event: done\ndata: {json.dumps({'count': len(quiz_data['quiz'])})}\n\n")
+    return Response(events, mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def _stream_quiz(prompt, topic, user_class, user_name, force_refresh):
+    """Send each validated question as an SSE "question" event as soon as the model finishes it"""
     try:
+        llm_client.check_capacity(llm_scheduler.STANDARD)
+    except llm_client.LLMQueueFull as e:
+        return queue_full_response(e)
+
+    used_set = _load_seen_questions(topic, user_name)
+    stream_id = uuid.uuid4().hex
+    session["quiz_cache"] = {"topic": topic, "stream_id": stream_id}
+
+    def events():
+        accepted = []
+        seen = near_duplicates.NearDuplicateSet()
+        parser = QuizStreamParser()
+        # an open breaker goes straight to the fallback questions below; otherwise the stream is
+        # timed against the quiz SLO like generate(..., breaker=quiz_breaker)
+        allowed = quiz_breaker.allow()
+        tokens = llm_client.stream(prompt, timeout=60, refresh=force_refresh,
+                                   priority=llm_scheduler.STANDARD) if allowed else ()
+        start = time.perf_counter()
+        outcome = None
         try:
-            response = requests.post(
-                "http://localhost:11434/api/generate",
-                json={"model": "llama3", "prompt": prompt, "stream": False},
-                timeout=60
-            )
-            if response.status_code == 200:
-                result = response.json()
-                full_output = result.get("response", "")
-                print(f"✅ Got response from Ollama HTTP API")
-            else:
-                raise Exception(f"Ollama HTTP API failed with status {response.status_code}")
-        except Exception as e:
-            print(f"⚠️ Ollama HTTP API failed: {e}, trying subprocess...")
-            process = subprocess.Popen(
-                ["ollama", "run", "llama3"],
-                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-            )
-            stdout, stderr = process.communicate(prompt, timeout=60)
-            full_output = stdout.strip()
-            print(f"✅ Got response from Ollama subprocess")
+            for token in tokens:
+                for candidate in parser.feed(token):
+                    q = _accept_unique_question(candidate, seen, used_set)
+                    if q is None:
+                        continue
+                    accepted.append(q)
+                    yield _quiz_question_event(len(accepted) - 1, q)
+                    if len(accepted) == 10:
+                        break
+                if len(accepted) == 10:
+                    break
+            outcome = True
+        except llm_client.LLMQueueFull as e:
+            print(f"⚠️ Quiz stream not started: {e}")
+        except llm_client.LLMError as e:
+            outcome = False
+            print(f"⚠️ Quiz stream failed after {len(accepted)} questions: {e}")
+        finally:
+            if allowed:
+                if outcome is None:
+                    # queue full or the student left mid-stream
+                    quiz_breaker.release()
+                else:
+                    quiz_breaker.record((time.perf_counter() - start) * 1000, outcome)
+                # a complete quiz stops reading: free the scheduler slot and the Ollama connection now
+                tokens.close()
+
+        if accepted:
+            quiz = _fill_unique_questions([], topic, user_class, used_set, accepted=accepted)
+        else:
+            print("⚠️ No usable questions streamed, using fallback questions")
+            quiz = create_fallback_quiz(topic, user_class, used_set)["quiz"]
+        for index in range(len(accepted), len(quiz)):
+            yield _quiz_question_event(index, quiz[index])
+        if accepted:
+            _bank_questions(topic, user_class, accepted)
+
+        quiz_data = {"quiz": quiz}
+        print(f"✅ Streamed {len(accepted)} model questions, {len(quiz) - len(accepted)} filled")
+        save_quiz_to_db(user_name, topic, user_class, quiz_data)
+        _mark_questions_seen(topic, quiz, user_name)
+        with streamed_quiz_lock:
+            streamed_quiz_results[stream_id] = quiz_data
+            while len(streamed_quiz_results) > STREAMED_QUIZ_LIMIT:
+                streamed_quiz_results.popitem(last=False)
+        yield f"event: done\ndata: {json.dumps({'count': len(quiz)})}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route("/generate_quiz", methods=["POST"])
+def generate_quiz():
+    topic = session.get("current_topic", "General Knowledge")
+    user_class = session.get("user_class", "middle school")
+    user_name = session.get("user_name", "User")
+    data = request.get_json() or {}
+    force_refresh = data.get("force", False)
+    stream = data.get("stream", False)
+
+    cache = _resolve_streamed_quiz()
+    if cache and cache.get("topic") == topic and not force_refresh and not stream:
+        return jsonify(cache["payload"])
+
+    # Questions already validated for this topic and class are served without calling the model
+    banked = _serve_banked_quiz(topic, user_class, user_name, stream)
+    if banked is not None:
+        return banked
+
+    print(f"🧠 Generating quiz for topic: {topic}, class: {user_class}")
+    prompt = _quiz_prompt(topic, user_class)
+
+    if stream:
+        return _stream_quiz(prompt, topic, user_class, user_name, force_refresh)
+
+    used_set = _load_seen_questions(topic, user_name)
+    try:
+        full_output = llm_client.generate(prompt, timeout=60, refresh=force_refresh, breaker=quiz_breaker)
+        print(f"✅ Got response from Ollama HTTP API")
 
         # Clean and parse JSON (more robust extraction)
-        output = re.sub(r"^\`\`\`json\s*|\s*\`\`\`$", "", full_output.strip(), flags=re.IGNORECASE)
-        quiz_data = None
-        try:
-            parsed = json.loads(output)
-            quiz_data = parsed if isinstance(parsed, dict) else {"quiz": parsed}
-        except Exception:
-            m = re.search(r"\{[\s\S]*\"quiz\"[\s\S]*\}", output)
-            if m:
-                quiz_data = json.loads(m.group(0))
-        if not quiz_data or "quiz" not in quiz_data:
-            raise ValueError("Invalid quiz format from model")
-
-        # Enforce structure + uniqueness + shuffle options
-        used_map = session.get("used_questions", {})
-        used_set = set(used_map.get(topic, []))
-        unique_quiz = _fill_unique_questions(quiz_data.get("quiz", []), topic, user_class, used_set)
+        model_questions = _parse_quiz_output(full_output)
+
+        # Enforce structure + uniqueness + shuffle options; only the model's own questions are banked
+        seen = near_duplicates.NearDuplicateSet()
+        valid = [q for q in (_accept_unique_question(dict(q), seen, set()) for q in model_questions if isinstance(q, dict)) if q]
+        _bank_questions(topic, user_class, valid)
+        unique_quiz = _fill_unique_questions(model_questions, topic, user_class, used_set)
         quiz_data = {"quiz": unique_quiz}
         print(f"✅ Generated {len(quiz_data['quiz'])} unique questions")
     except Exception as e:
         print(f"⚠️ JSON parsing failed or generation error: {e}, using fallback questions")
-        quiz_data = create_fallback_quiz(topic, user_class)
+        quiz_data = create_fallback_quiz(topic, user_class, used_set)
 
     # Save new quiz, update cache and cross-generation dedupe
     save_quiz_to_db(user_name, topic, user_class, quiz_data)
     session["quiz_cache"] = {"topic": topic, "payload": quiz_data}
-    _update_used_questions_session(topic, quiz_data["quiz"])
+    _mark_questions_seen(topic, quiz_data["quiz"], user_name)
     return jsonify(quiz_data), 200
 
-def create_fallback_quiz(topic, user_class):
+def create_fallback_quiz(topic, user_class, used_set=None):
     """
     Create a robust fallback quiz:
     - For math-like topics: generate 10 unique arithmetic questions with shuffled options.
@@ -579,19 +736,17 @@ def create_fallback_quiz(topic, user_class):
     topic_lower = (topic or "").lower()
     is_math = any(k in topic_lower for k in ["math", "algebra", "geometry", "arithmetic", "number", "fraction", "equation"])
 
-    used_map = session.get("used_questions", {})
-    used_set = set(used_map.get(topic, []))
+    if used_set is None:
+        # arithmetic questions differ by their numbers, so exact matching is enough
+        used_set = _load_seen_questions(topic, near=not is_math)
 
     if is_math:
+        # vectorized batches, already de-duplicated against the student's seen questions;
+        # the widest band only tops up a class band the student has exhausted
         questions = []
-        # keep generating unique math questions until we have 10
-        attempts = 0
-        while len(questions) < 10 and attempts < 200:
-            attempts += 1
-            q = _gen_unique_math_question()
-            qt = _normalize_text(q["question"])
-            if qt not in used_set and all(_normalize_text(x["question"]) != qt for x in questions):
-                questions.append(q)
+        for band in (user_class, "graduate"):
+            exclude = used_set.hashes | _question_hashes(q["question"] for q in questions)
+            questions += math_questions.unique_questions(10 - len(questions), band, exclude_hashes=exclude)
     else:
         base = [
             {
@@ -668,6 +823,22 @@ def create_fallback_quiz(topic, user_class):
     print(f"✅ Fallback produced {len(payload['quiz'])} unique questions")
     return payload
 
+@app.route("/math_drill", methods=["GET"])
+def math_drill():
+    """
+    Arithmetic practice at the student's class level: ?count= questions (default 20, at most
+    math_questions.DRILL_MAX), none repeated from earlier drills.
+    """
+    user_name = session.get("user_name", "User")
+    user_class = session.get("user_class", "middle school")
+    count = max(1, min(request.args.get("count", 20, type=int), math_questions.DRILL_MAX))
+
+    # arithmetic questions differ by their numbers, so exact matching is enough
+    used_set = _load_seen_questions(math_questions.DRILL_TOPIC, user_name, near=False)
+    questions = math_questions.unique_questions(count, user_class, exclude_hashes=used_set.hashes)
+    _mark_questions_seen(math_questions.DRILL_TOPIC, questions, user_name)
+    return jsonify({"topic": math_questions.DRILL_TOPIC, "user_class": user_class, "quiz": questions})
+
 @app.route("/submit_quiz", methods=["POST"])
 def submit_quiz():
     data = request.get_json() or {}
@@ -675,7 +846,7 @@ def submit_quiz():
     user_name = session.get("user_name", "User")
     topic = session.get("current_topic", "General Knowledge")
 
-    quiz_cache = session.get("quiz_cache", {})
+    quiz_cache = _resolve_streamed_quiz() or {}
     quiz = quiz_cache.get("payload", {}).get("quiz", [])
 
     if not quiz:
@@ -701,6 +872,7 @@ def submit_quiz():
 
     percentage = (correct_count / len(quiz)) * 100
     save_quiz_to_db(user_name, topic, None, None, correct_count, len(quiz), percentage)
+    _trace_quiz(user_name, topic, quiz, details)
 
     # Award points for quiz completion
     username = session.get("username")
@@ -714,16 +886,102 @@ def submit_quiz():
         "details": details
     })
 
-# --- EVALUATE the student's short answer to the open-ended question ---
-@app.route("/evaluate_paragraph", methods=["POST"])
-def evaluate_paragraph():
-    import re, json, subprocess
-    data = request.json or {}
-    user_text = data.get("text", "").strip()
-    question = data.get("question", "").strip()
-    topic = session.get("current_topic", "General Topic")
+def _trace_quiz(user_name, topic, quiz, details):
+    """Update the student's mastery of the topic and the questions' difficulty"""
+    try:
+        knowledge_tracing.record_quiz(user_name, topic, [
+            (question_bank.question_hash(question_bank.normalize(q["question"])), d["is_correct"])
+            for q, d in zip(quiz, details)
+        ])
+    except Exception as e:
+        print(f"⚠️ Could not update mastery for {user_name}: {e}")
+
+@app.route("/recommendations", methods=["GET"])
+def recommendations():
+    """The current user's next-topic recommendations (precomputed, weakest topic first) and topic mastery"""
+    user_name = session.get("user_name", "User")
+    return jsonify({
+        "recommendations": knowledge_tracing.recommendations(user_name),
+        "mastery": knowledge_tracing.mastery(user_name),
+    })
+
+@app.route("/grade_class", methods=["POST"])
+def grade_class():
+    """
+    Grade a whole class in one request (for teachers).
+    JSON: topic, user_class, students (names), answers (one row of option indexes per student,
+    null for unanswered) and either quiz (questions with answer_index) or answer_key.
+    Every attempt is saved in one transaction unless "save" is false; the response carries
+    per-student scores and per-question difficulty / discrimination.
+    Only teachers (class_grading.TEACHERS) can save; for everyone else "save" defaults to false.
+    """
+    data = request.get_json(silent=True) or {}
+    teacher = class_grading.is_teacher(session.get("user_name"))
+    save = bool(data.get("save", teacher))
+    if save and not teacher:
+        return jsonify({"error": "Only teachers can save results for a class"}), 403
+    topic = (data.get("topic") or "").strip()
+    user_class = data.get("user_class") or session.get("user_class", "middle school")
+    students = data.get("students") or []
+    quiz = data.get("quiz") or []
+    answer_key = data.get("answer_key")
+    if answer_key is None:
+        answer_key = [q.get("answer_index") if isinstance(q, dict) else None for q in quiz]
+
+    if not topic:
+        return jsonify({"error": "topic is required"}), 400
+    if not answer_key or not all(isinstance(k, int) and not isinstance(k, bool) for k in answer_key):
+        return jsonify({"error": "quiz questions need an integer answer_index (or send answer_key)"}), 400
+    if quiz and len(quiz) != len(answer_key):
+        return jsonify({"error": "answer_key and quiz have different lengths"}), 400
+    if not students or not all(isinstance(s, str) and s.strip() for s in students):
+        return jsonify({"error": "students must be a list of names"}), 400
+    if len(students) > class_grading.MAX_STUDENTS or len(answer_key) > class_grading.MAX_QUESTIONS:
+        return jsonify({"error": f"At most {class_grading.MAX_STUDENTS} students and "
+                                 f"{class_grading.MAX_QUESTIONS} questions per request"}), 400
+
+    start = time.perf_counter()
+    try:
+        answers = class_grading.answer_matrix(data.get("answers") or [], len(answer_key))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if answers.shape[0] != len(students):
+        return jsonify({"error": f"{len(students)} students but {answers.shape[0]} answer rows"}), 400
+
+    option_count = max([4] + [len(q.get("options") or []) for q in quiz if isinstance(q, dict)])
+    result = class_grading.grade(answers, answer_key, option_count)
+    grading_ms = (time.perf_counter() - start) * 1000
+
+    saved = 0
+    if save:
+        start = time.perf_counter()
+        try:
+            saved = quiz_db.insert_graded_quizzes(
+                class_grading.quiz_rows(students, topic, user_class, quiz, answers, answer_key, result))
+        except Exception as e:
+            print(f"❌ Error saving class results: {e}")
+            return jsonify({"error": "Could not save results"}), 500
+        saving_ms = (time.perf_counter() - start) * 1000
+    else:
+        saving_ms = 0.0
 
-    prompt = f"""You are grading a student's short answer.
+    print(f"✅ Graded {len(students)} students x {len(answer_key)} questions on {topic} "
+          f"({grading_ms:.1f} ms grading, {saving_ms:.1f} ms saving)")
+    return jsonify({
+        "topic": topic,
+        "students": [
+            {"user_name": name, "score": score, "total": len(answer_key), "percentage": round(percentage, 1)}
+            for name, score, percentage in zip(
+                students, result["scores"].tolist(), result["percentages"].tolist())
+        ],
+        "items": result["items"],
+        "summary": result["summary"],
+        "saved": saved,
+        "timings_ms": {"grading": round(grading_ms, 2), "saving": round(saving_ms, 2)},
+    })
+
+def _evaluation_prompt(question, user_text):
+    return f"""You are grading a student's short answer.
 
 QUESTION:
 {question}
@@ -746,28 +1004,145 @@ Return ONLY JSON:
   "weak_topics": ["…","…"]
 }}"""
 
-    process = subprocess.Popen(
-        ["ollama", "run", "llama3"],
-        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
-    )
-    stdout, stderr = process.communicate(prompt.encode("utf-8"), timeout=45)
-    output = stdout.decode("utf-8", errors="ignore").strip()
-    output = re.sub(r"^\`\`\`json\s*|\s*\`\`\`$", "", output, flags=re.IGNORECASE).strip()
+def _batch_evaluation_prompt(question, answers):
+    numbered = "\n\n".join(f"[{i}]\n{text}" for i, text in enumerate(answers, start=1))
+    return f"""You are grading several students' short answers to the same question.
+
+QUESTION:
+{question}
+
+STUDENT ANSWERS:
+{numbered}
+
+TASK (for EACH answer separately):
+- Judge correctness and completeness vs the QUESTION (not just grammar)
+- Briefly point out what is correct and what's missing/wrong
+- Recommend up to 3 specific subtopics to review
+- Give a score 0-10 (integer)
+- You can give 0 and low scores as well
+
+Return ONLY JSON with one entry per answer, "id" being the answer's number:
+{{
+  "results": [
+    {{"id": 1, "score": 8, "correctness": "partially correct", "feedback": "…", "weak_topics": ["…"]}}
+  ]
+}}"""
 
+def _parse_evaluation_json(output):
+    output = re.sub(r"^\`\`\`json\s*|\s*\`\`\`$", "", output or "", flags=re.IGNORECASE).strip()
     try:
-        result = json.loads(output)
+        return json.loads(output)
     except Exception:
         m = re.search(r"\{.*\}", output, re.DOTALL)
-        result = json.loads(m.group(0)) if m else {
-            "score": 0, "correctness": "incorrect",
-            "feedback": "Could not parse evaluation.", "weak_topics": []
-        }
+        try:
+            return json.loads(m.group(0)) if m else None
+        except Exception:
+            return None
+
+def _normalize_evaluation(result):
+    return {
+        "score": max(0, min(10, int(result.get("score", 0)))),
+        "correctness": str(result.get("correctness", "partially correct")).lower(),
+        "feedback": str(result.get("feedback", "")).strip(),
+        "weak_topics": result.get("weak_topics") or [],
+    }
+
+def _grade_with_model(question, answers, priority=llm_scheduler.INTERACTIVE):
+    """Model grades for answers (None where the output could not be parsed); one call per chunk"""
+    if len(answers) == 1:
+        prompt = _evaluation_prompt(question, answers[0])
+    else:
+        prompt = _batch_evaluation_prompt(question, answers)
+    try:
+        output = llm_client.generate(prompt, timeout=45 + 15 * (len(answers) - 1), priority=priority)
+    except llm_client.LLMQueueFull:
+        raise
+    except llm_client.LLMError as e:
+        print(f"⚠️ Evaluation model call failed: {e}")
+        return [None] * len(answers)
+
+    parsed = _parse_evaluation_json(output)
+    if len(answers) == 1:
+        entries = {1: parsed} if isinstance(parsed, dict) else {}
+    else:
+        items = parsed.get("results") if isinstance(parsed, dict) else parsed
+        entries = {}
+        for position, item in enumerate(items if isinstance(items, list) else [], start=1):
+            if isinstance(item, dict):
+                try:
+                    entries[int(item.get("id", position))] = item
+                except (TypeError, ValueError):
+                    entries[position] = item
+
+    results = []
+    for i in range(1, len(answers) + 1):
+        try:
+            results.append(_normalize_evaluation(entries[i]))
+        except (KeyError, TypeError, ValueError):
+            results.append(None)
+    return results
 
-    # normalize fields
-    result["score"] = int(result.get("score", 0))
-    result["correctness"] = str(result.get("correctness", "partially correct")).lower()
-    result["feedback"] = str(result.get("feedback", "")).strip()
-    result["weak_topics"] = result.get("weak_topics") or []
+def _evaluate_answers(question, answers, priority=llm_scheduler.INTERACTIVE):
+    """
+    Grade answers to one question: obvious cases and repeats are settled by answer_grading's
+    pre-scorer and cache, the rest go to the model in chunks of answer_grading.BATCH_SIZE.
+    A student waiting on their own answer is INTERACTIVE; a teacher's class batch must not hold that slot.
+    """
+    grader = answer_grading.Grader(question)
+    results = [None] * len(answers)
+    pending = OrderedDict()  # normalized answer -> positions, so identical answers cost one grade
+    for i, text in enumerate(answers):
+        result = grader.pregrade(text)
+        if result is not None:
+            results[i] = result
+        else:
+            pending.setdefault(answer_grading.normalize_answer(text), []).append(i)
+
+    unique = list(pending.values())
+    for start in range(0, len(unique), answer_grading.BATCH_SIZE):
+        chunk = unique[start:start + answer_grading.BATCH_SIZE]
+        texts = [answers[positions[0]] for positions in chunk]
+        for positions, text, result in zip(chunk, texts, _grade_with_model(question, texts, priority)):
+            if result is None:
+                result = {"score": 0, "correctness": "incorrect",
+                          "feedback": "Could not parse evaluation.", "weak_topics": [], "source": "unparsed"}
+            else:
+                grader.store(text, result)
+                result = dict(result, source="model")
+            for i in positions:
+                results[i] = result
+    return results
+
+# --- EVALUATE the student's short answer to the open-ended question ---
+@app.route("/evaluate_paragraph", methods=["POST"])
+def evaluate_paragraph():
+    """Grade one answer ("text") or, in batch mode, many answers to the same question ("answers")"""
+    data = request.json or {}
+    question = str(data.get("question", "")).strip()
+
+    if "answers" in data:
+        answers = data.get("answers")
+        if not isinstance(answers, list) or not all(isinstance(a, str) for a in answers):
+            return jsonify({"error": "answers must be a list of strings"}), 400
+        if len(answers) > answer_grading.MAX_ANSWERS:
+            return jsonify({"error": f"At most {answer_grading.MAX_ANSWERS} answers per request"}), 400
+        start = time.perf_counter()
+        results = _evaluate_answers(question, [a.strip() for a in answers], priority=llm_scheduler.STANDARD)
+        print(f"✅ Evaluated {len(answers)} answers "
+              f"({sum(r['source'] == 'model' for r in results)} by the model) "
+              f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return jsonify({"results": results}), 200
+
+    user_text = str(data.get("text", "")).strip()
+    result = _evaluate_answers(question, [user_text])[0]
+    if result["source"] != "unparsed":
+        try:
+            knowledge_tracing.record_answer(
+                session.get("user_name", "User"), session.get("current_topic", "General Topic"),
+                question_bank.question_hash(question_bank.normalize(question)),
+                result["score"], result["weak_topics"])
+        except Exception as e:
+            print(f"⚠️ Could not update mastery: {e}")
     return jsonify(result), 200
 
     topic = session.get("current_topic", "General Topic")
@@ -833,19 +1208,21 @@ def generate_video_route():
     topic = session.get("current_topic", "General Topic")
     interests = session.get("user_interests", "science")
     user_class = session.get("user_class", "high school")
+    # "draft" renders quickly on CPU-only nodes, "final" at full quality (image_engine.PROFILES)
+    quality = (request.get_json(silent=True) or {}).get("quality") or image_engine.DEFAULT_PROFILE
+    if quality not in image_engine.PROFILES:
+        return jsonify({"status": "error", "message": f"quality must be one of {', '.join(image_engine.PROFILES)}"}), 400
     
     try:
-        # Start video generation in background thread with user data
-        thread = threading.Thread(target=generate_video_async, args=(topic, interests, user_class))
-        thread.daemon = True
-        thread.start()
-        
         interest_hash = get_interest_hash(interests.split(","))
         folder_name = f"{topic.replace(' ', '_')}__{interest_hash}"
         
+        # Start video generation in background thread unless this folder is already being generated
+        started = video_jobs.start_background(folder_name, generate_video_async, topic, interests, user_class, quality)
+        
         return jsonify({
             "status": "processing",
-            "message": "Video generation started",
+            "message": "Video generation started" if started else "Video generation already in progress",
             "folder": folder_name
         })
     except Exception as e:
@@ -857,12 +1234,24 @@ def regenerate_video_route():
     topic = session.get("current_topic", "General Topic")
     interests = session.get("user_interests", "science")
     user_class = session.get("user_class", "high school")
+    # "draft" renders quickly on CPU-only nodes, "final" at full quality (image_engine.PROFILES)
+    quality = (request.get_json(silent=True) or {}).get("quality") or image_engine.DEFAULT_PROFILE
+    if quality not in image_engine.PROFILES:
+        return jsonify({"status": "error", "message": f"quality must be one of {', '.join(image_engine.PROFILES)}"}), 400
     
     try:
         interest_hash = get_interest_hash(interests.split(","))
         folder_name = f"{topic.replace(' ', '_')}__{interest_hash}"
         base_dir = os.path.join(app.root_path, "static", "generated_videos", folder_name)
         
+        # Never delete files from under a generation that is still running
+        if video_jobs.in_flight(folder_name):
+            return jsonify({
+                "status": "processing",
+                "message": "Video generation already in progress",
+                "folder": folder_name
+            })
+        
         # Delete existing video files to force regeneration
         files_to_delete = [
             "final_output_video.mp4",
@@ -882,18 +1271,17 @@ def regenerate_video_route():
         # Also delete generated images folder
         images_dir = os.path.join(base_dir, "generated_images")
         if os.path.exists(images_dir):
-            import shutil
             shutil.rmtree(images_dir)
             print("🗑️ Deleted generated images folder")
         
-        # Start video generation in background thread with user data
-        thread = threading.Thread(target=generate_video_async, args=(topic, interests, user_class))
-        thread.daemon = True
-        thread.start()
+        # Start video generation in background thread with user data; refresh asks the model and
+        # Stable Diffusion for new prompts, narration and images instead of the cached ones
+        started = video_jobs.start_background(folder_name, generate_video_async, topic, interests, user_class, quality,
+                                              refresh=True)
         
         return jsonify({
             "status": "processing",
-            "message": "Video regeneration started",
+            "message": "Video regeneration started" if started else "Video generation already in progress",
             "folder": folder_name
         })
     except Exception as e:
@@ -924,28 +1312,43 @@ def check_video_status():
         return jsonify({"status": "processing"})
 
 def update_progress(folder_name, progress, step, message, substep=None):
-    """Update progress for a specific video generation"""
+    """
+    Update progress for a specific video generation.
+    Stages run concurrently, so progress never moves backwards while processing.
+    """
+    previous = video_generation_progress.get(folder_name) or {}
+    if previous.get('status') == 'processing':
+        progress = max(progress, previous.get('progress', 0))
     video_generation_progress[folder_name] = {
         'progress': progress,
         'step': step,
         'message': message,
         'substep': substep,
-        'status': 'processing'
+        'status': 'processing',
+        'stage_timings': previous.get('stage_timings')
     }
     print(f"📊 Progress: {progress}% - {message}")
 
+def update_stage_timings(folder_name, timings):
+    """Store the per-stage timings of a running generation; the progress shown to the student is unchanged"""
+    previous = video_generation_progress.get(folder_name)
+    if previous and previous.get('status') == 'processing':
+        video_generation_progress[folder_name] = dict(previous, stage_timings=timings)
+
 def complete_progress(folder_name, video_url):
     """Mark video generation as completed"""
+    previous = video_generation_progress.get(folder_name) or {}
     video_generation_progress[folder_name] = {
         'progress': 100,
         'step': 6,
         'message': 'Video generation completed!',
         'status': 'completed',
-        'video_url': video_url
+        'video_url': video_url,
+        'stage_timings': previous.get('stage_timings')
     }
 
-def generate_video_async(topic, interests, user_class):
-    """Generate video asynchronously with proper error handling"""
+def generate_video_async(topic, interests, user_class, profile=None, refresh=False):
+    """Generate video asynchronously with proper error handling; refresh bypasses the LLM and image caches"""
     try:
         print(f"🎬 Starting video generation for topic: {topic}, interests: {interests}, class: {user_class}")
         
@@ -959,7 +1362,7 @@ def generate_video_async(topic, interests, user_class):
         print(f"📁 Created directory: {base_dir}")
         
         # Generate video using the advanced pipeline
-        success = generate_educational_video(topic, interests, user_class, base_dir, folder_name)
+        success = generate_educational_video(topic, interests, user_class, base_dir, folder_name, profile, refresh)
         
         if success and os.path.exists(final_output):
             print(f"✅ Video generation completed successfully: {final_output}")
@@ -989,10 +1392,19 @@ def generate_video_async(topic, interests, user_class):
             'status': 'error'
         }
 
-def generate_educational_video(topic, interests, user_class, base_dir, folder_name):
-    """Complete video generation function with class-based content and progress tracking"""
+def generate_educational_video(topic, interests, user_class, base_dir, folder_name, profile=None, refresh=False):
+    """
+    Complete video generation function with class-based content and progress tracking.
+    refresh (Regenerate video) asks for new prompts and narration and renders new images.
+    Runs as a stage graph: narration and voiceover only need the scene count, so they run while
+    the images render, and each scene's frames are written as soon as its image is in place.
+
+        prompts ─┬─ images ───────────────┐
+                 └─ narration ─ voiceover ┴─ frames ─ final
+    """
     try:
         print(f"🎬 Starting educational video generation for {user_class} level...")
+        video_generation_progress.pop(folder_name, None)
         
         output_images_dir = os.path.join(base_dir, "generated_images")
         os.makedirs(output_images_dir, exist_ok=True)
@@ -1004,75 +1416,177 @@ def generate_educational_video(topic, interests, user_class, base_dir, folder_na
         video_file = os.path.join(base_dir, "output_video.mp4")
         final_output = os.path.join(base_dir, "final_output_video.mp4")
         
-        # Step 1: Generate image prompts (5% progress)
-        update_progress(folder_name, 5, 0, "Generating educational image prompts...")
-        image_prompts = generate_image_prompts_with_class(topic, interests, user_class)
-        print(f"✅ Generated {len(image_prompts)} image prompts for {user_class} level")
+        scene_ready = queue.Queue()   # image indexes as they land; None once image generation has ended
+        images_done = threading.Event()
+        # step, opening message and slice of the progress bar (from %, to %) of each stage
+        stage_steps = {"prompts": 0, "images": 1, "narration": 2, "voiceover": 3, "frames": 4, "final": 5}
+        stage_messages = {
+            "prompts": "Generating educational image prompts...",
+            "images": "Starting AI image generation...",
+            "narration": "Creating narration script...",
+            "voiceover": "Creating professional voiceover...",
+            "frames": "Building video with transitions and captions...",
+            "final": "Adding audio and finalizing video...",
+        }
+        stage_bands = {"prompts": (0, 5), "images": (5, 55), "narration": (55, 60), "voiceover": (60, 70),
+                       "frames": (70, 95), "final": (95, 100)}
+        stage_done = dict.fromkeys(stage_bands, 0.0)
+        progress_lock = threading.Lock()
         
-        with open(prompts_file, "w", encoding="utf-8") as f:
-            for i, prompt in enumerate(image_prompts, 1):
-                f.write(f"{i}. {prompt}\n")
+        def report(stage, fraction, message=None, substep=None):
+            """
+            Fill fraction (0 to 1) of stage's band. The bar shows the sum over all bands,
+            so stages running side by side each move it; message None keeps the current message.
+            """
+            with progress_lock:
+                stage_done[stage] = max(stage_done[stage], min(fraction, 1.0))
+                progress = int(sum((high - low) * stage_done[name] for name, (low, high) in stage_bands.items()))
+                if message is None:
+                    current = video_generation_progress.get(folder_name) or {}
+                    step, message, substep = current.get('step', 0), current.get('message', ''), current.get('substep')
+                else:
+                    step = stage_steps[stage]
+                update_progress(folder_name, progress, step, message, substep)
         
-        # Step 2: Generate images using Stable Diffusion (5% to 60% progress)
-        update_progress(folder_name, 10, 1, "Starting AI image generation...")
-        if not generate_educational_images_with_progress(output_images_dir, topic, image_prompts, folder_name):
-            print("❌ Image generation failed - cannot create video without images")
-            return False
+        def on_stage(stage, status, timings):
+            with progress_lock:
+                update_stage_timings(folder_name, timings)
+            if status == "done":
+                report(stage, 1.0)
         
-        # Step 3: Generate narration script based on images and class (65% progress)
-        update_progress(folder_name, 65, 2, "Analyzing images and creating narration script...")
-        voice_lines = generate_voice_script_with_class(topic, interests, user_class, output_images_dir)
-        if not voice_lines:
-            print("❌ Script generation failed")
-            return False
+        graph = stage_graph.StageGraph(on_event=on_stage)
+        
+        # Step 1: Generate image prompts
+        def make_prompts():
+            report("prompts", 0, stage_messages["prompts"])
+            image_prompts = generate_image_prompts_with_class(topic, interests, user_class, refresh=refresh)
+            print(f"✅ Generated {len(image_prompts)} image prompts for {user_class} level")
+            with open(prompts_file, "w", encoding="utf-8") as f:
+                for i, prompt in enumerate(image_prompts, 1):
+                    f.write(f"{i}. {prompt}\n")
+            return image_prompts
         
-        print(f"✅ Generated {len(voice_lines)} voice lines for {user_class} level")
+        # Step 2: Generate images using Stable Diffusion
+        def make_images(image_prompts):
+            report("images", 0, stage_messages["images"])
+            try:
+                if not generate_educational_images_with_progress(
+                        output_images_dir, topic, image_prompts, profile, on_image=scene_ready.put,
+                        report=lambda *update: report("images", *update), refresh=refresh):
+                    raise RuntimeError("Image generation failed - cannot create video without images")
+                images_done.set()
+            finally:
+                scene_ready.put(None)
         
-        full_script = " ".join(voice_lines)
-        with open(audio_script_file, "w", encoding="utf-8") as f:
-            f.write(full_script)
+        # Step 3: Narration script for the scene count (runs alongside the images)
+        def make_narration(image_prompts):
+            report("narration", 0, stage_messages["narration"])
+            voice_lines = generate_voice_script_with_class(topic, interests, user_class, scene_count=len(image_prompts),
+                                                           refresh=refresh)
+            if not voice_lines:
+                raise RuntimeError("Script generation failed")
+            print(f"✅ Generated {len(voice_lines)} voice lines for {user_class} level")
+            with open(audio_script_file, "w", encoding="utf-8") as f:
+                f.write(" ".join(voice_lines))
+            return voice_lines
         
-        # Step 4: Generate audio (75% progress)
-        update_progress(folder_name, 75, 3, "Creating professional voiceover...")
-        if not generate_audio_advanced(full_script, audio_file):
-            print("❌ Audio generation failed")
-            return False
+        # Step 4: Voiceover, its duration and the synchronized captions
+        def make_voiceover(voice_lines):
+            report("voiceover", 0, stage_messages["voiceover"])
+            full_script = " ".join(voice_lines)
+            if not generate_audio_advanced(full_script, audio_file):
+                raise RuntimeError("Audio generation failed")
+            audio_duration = get_audio_duration(audio_file, full_script)
+            sentence_timings = estimate_sentence_timing_advanced(voice_lines, audio_duration)
+            create_synced_srt_file(voice_lines, sentence_timings, captions_file)
+            return voice_lines, audio_duration, sentence_timings
         
-        # Step 5: Get audio duration and create video (85% progress)
-        update_progress(folder_name, 85, 4, "Building video with transitions and captions...")
-        try:
-            if os.path.exists(audio_file):
-                # Try to get audio duration
-                try:
-                    import librosa
-                    audio_duration = librosa.get_duration(path=audio_file)
-                    print(f"🎵 Audio duration: {audio_duration:.2f} seconds")
-                except ImportError:
-                    # Fallback duration calculation
-                    audio_duration = len(full_script.split()) / 150 * 60
-                    print(f"🎵 Estimated audio duration: {audio_duration:.2f} seconds")
+        # Step 5: Frames, written scene by scene as the images land.
+        # In "ffmpeg" mode each scene only becomes one captioned still per caption, encoded at the end;
+        # returns True when the video is such a slideshow.
+        def make_frames(image_prompts, voiceover):
+            import cv2
+            voice_lines, audio_duration, sentence_timings = voiceover
+            scene_count = min(len(image_prompts), MAX_VIDEO_SCENES)
+            image_frames = scene_frame_count(audio_duration, scene_count)
+            print(f"📊 Video timing: {audio_duration / scene_count:.2f}s per image ({image_frames} frames)")
+            
+            slideshow = VIDEO_RENDER_MODE == "ffmpeg"
+            stills, stills_dir, video_writer = [], os.path.join(base_dir, "slideshow"), None
+            if slideshow:
+                os.makedirs(stills_dir, exist_ok=True)
             else:
-                audio_duration = len(full_script.split()) / 150 * 60
-                print(f"🎵 Estimated audio duration: {audio_duration:.2f} seconds")
-        except Exception as e:
-            print(f"⚠️ Could not get audio duration: {e}")
-            audio_duration = len(full_script.split()) / 150 * 60
+                video_writer = cv2.VideoWriter(video_file, cv2.VideoWriter_fourcc(*'mp4v'), TRANSITION_FPS,
+                                               (VIDEO_WIDTH, VIDEO_HEIGHT))
+                if not video_writer.isOpened():
+                    raise RuntimeError("Could not open video writer")
+            try:
+                landed, next_scene, written = set(), 0, 0
+                while next_scene < scene_count:
+                    idx = scene_ready.get()
+                    if idx is None:
+                        if not images_done.is_set():
+                            raise RuntimeError("Image generation failed")
+                        break
+                    landed.add(idx)
+                    # scenes are written in order; one that lands early waits for those before it
+                    while next_scene in landed:
+                        image = load_scene_image(os.path.join(output_images_dir, f"image_{next_scene+1:02d}.png"))
+                        if image is None:
+                            print(f"⚠️ Could not load image {next_scene+1}")
+                        elif slideshow:
+                            stills += write_scene_stills(image, stills_dir, written, written * image_frames,
+                                                         image_frames, sentence_timings, voice_lines)
+                            written += 1
+                        else:
+                            write_scene_frames(video_writer, image, written * image_frames, image_frames,
+                                               sentence_timings, voice_lines)
+                            written += 1
+                        next_scene += 1
+                        report("frames", next_scene / scene_count, stage_messages["frames"],
+                               f"Scene {next_scene}/{scene_count}")
+                if not written:
+                    raise RuntimeError("No valid images loaded")
+                if slideshow:
+                    print(f"🎞️ Encoding {len(stills)} stills ({written * image_frames} frames) with ffmpeg...")
+                    if not encode_slideshow(stills, video_file, audio_duration):
+                        print("🔄 Falling back to frame-by-frame rendering...")
+                        slideshow = False
+                        if not create_video_with_advanced_transitions(output_images_dir, video_file, sentence_timings,
+                                                                      voice_lines, audio_duration):
+                            raise RuntimeError("Video creation failed")
+            finally:
+                if video_writer is not None:
+                    video_writer.release()
+                shutil.rmtree(stills_dir, ignore_errors=True)
+            print(f"✅ Video created: {video_file}")
+            return slideshow
         
-        # Generate synchronized captions
-        sentence_timings = estimate_sentence_timing_advanced(voice_lines, audio_duration)
-        create_synced_srt_file(voice_lines, sentence_timings, captions_file)
+        # Step 6: Combine with audio
+        def make_final(slideshow, _voiceover):
+            report("final", 0, stage_messages["final"])
+            # a slideshow is already H.264, so only the audio is encoded
+            if not combine_audio_video_advanced(video_file, audio_file, final_output, copy_video=slideshow):
+                raise RuntimeError("Audio-video combination failed")
         
-        # Create video with transitions and captions
-        if not create_video_with_advanced_transitions(output_images_dir, video_file, sentence_timings, voice_lines, audio_duration):
-            print("❌ Video creation failed")
-            return False
+        graph.add("prompts", make_prompts)
+        graph.add("images", make_images, after=["prompts"])
+        graph.add("narration", make_narration, after=["prompts"])
+        graph.add("voiceover", make_voiceover, after=["narration"])
+        graph.add("frames", make_frames, after=["prompts", "voiceover"])
+        graph.add("final", make_final, after=["frames", "voiceover"])
         
-        # Step 6: Combine with audio (95% progress)
-        update_progress(folder_name, 95, 5, "Adding audio and finalizing video...")
-        if not combine_audio_video_advanced(video_file, audio_file, final_output):
-            print("❌ Audio-video combination failed")
+        start = time.perf_counter()
+        try:
+            graph.run()
+        except stage_graph.StageFailed as e:
+            print(f"❌ {e}")
             return False
         
+        timings = graph.timings()
+        print("⏱️ Stage timings: " + ", ".join(f"{name} {t['seconds']:.1f}s" for name, t in timings.items())
+              + f" (wall clock {time.perf_counter() - start:.1f}s)")
+        
         # Complete (100% progress)
         video_url = f"/static/generated_videos/{folder_name}/final_output_video.mp4"
         complete_progress(folder_name, video_url)
@@ -1085,96 +1599,120 @@ def generate_educational_video(topic, interests, user_class, base_dir, folder_na
         import traceback
         traceback.print_exc()
         return False
-def generate_educational_images_with_progress(output_dir, topic, prompts, folder_name):
-    """Generate images with detailed progress tracking using Stable Diffusion"""
+
+def get_audio_duration(audio_file, script):
+    """Length of the voiceover in seconds, estimated from the word count if it cannot be read"""
+    try:
+        if os.path.exists(audio_file):
+            # Try to get audio duration
+            try:
+                import librosa
+                audio_duration = librosa.get_duration(path=audio_file)
+                print(f"🎵 Audio duration: {audio_duration:.2f} seconds")
+                return audio_duration
+            except ImportError:
+                pass
+    except Exception as e:
+        print(f"⚠️ Could not get audio duration: {e}")
+    # Fallback duration calculation
+    audio_duration = len(script.split()) / 150 * 60
+    print(f"🎵 Estimated audio duration: {audio_duration:.2f} seconds")
+    return audio_duration
+
+def generate_educational_images_with_progress(output_dir, topic, prompts, profile=None, on_image=None, report=None,
+                                              refresh=False):
+    """
+    Generate images with detailed progress tracking using the resident Stable Diffusion engine.
+    profile is an image_engine quality profile ("draft" or "final"); draft images are upscaled to 16:9 here.
+    on_image(index) is called as each image_XX.png is in place (0-based, in completion order).
+    report(fraction, message, substep) receives progress through the images (0 to 1).
+    refresh renders every scene again with new seeds instead of reusing cached images.
+    """
     print("🎨 Generating images with Stable Diffusion and progress tracking...")
 
     try:
-        # Check for required libraries
         try:
-            from diffusers import StableDiffusionPipeline
-            import torch
             import cv2
         except ImportError as e:
             print(f"❌ Required libraries not installed: {e}")
             print("👉 Please install: pip install diffusers torch transformers accelerate opencv-python")
             return False
 
-        # Detect device and dtype
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        dtype = torch.float16 if device == "cuda" else torch.float32
-
-        update_progress(folder_name, 15, 1, "Loading AI image generation model...", "Initializing Stable Diffusion")
-
-        try:
-            # ✅ FIXED: No device_map="auto" (avoids meta tensor issue)
-            pipe = StableDiffusionPipeline.from_pretrained(
-                "runwayml/stable-diffusion-v1-5",
-                torch_dtype=dtype,
-                safety_checker=None
-            )
-
-            pipe = pipe.to(device)
-
-            # Reduce VRAM usage if on GPU
-            if device == "cuda":
-                pipe.enable_attention_slicing()
-                # pipe.enable_vae_slicing()
-                # pipe.enable_sequential_cpu_offload()
-
-            print(f"🎨 Using device: {device}, dtype: {dtype}")
-
-        except Exception as e:
-            import traceback
-            print("❌ Failed to load Stable Diffusion model:")
-            traceback.print_exc()
-            return False
-
-        # Generate images with progress updates
+        enhanced_prompts = [
+            f"{prompt}, educational illustration, professional, detailed, "
+            f"high quality, 16:9 aspect ratio, clean background"
+            for prompt in prompts
+        ]
         total_images = len(prompts)
-        for idx, prompt in enumerate(prompts):
-            current_progress = 20 + int((idx / total_images) * 40)  # 20% → 60%
-            update_progress(folder_name, current_progress, 1, "Generating educational images...", f"Image {idx+1}/{total_images}")
+        done = 0
+        report = report or (lambda fraction, message, substep=None: None)
+
+        # Scenes already rendered with the same model, prompt, seed and settings (for any student) come from the cache.
+        # A refresh salts the prompt seeds, so the scenes render differently and are not looked up.
+        salt = uuid.uuid4().hex if refresh else None
+        seeds = [image_engine.prompt_seed(f"{prompt}#{salt}") if salt else image_engine.prompt_seed(prompt)
+                 for prompt in enhanced_prompts]
+        cache_keys = []
+        pending = []
+        for idx, prompt in enumerate(enhanced_prompts):
+            fields = dict(image_engine.engine.render_fields(prompt, profile, seed=seeds[idx]),
+                          output=[VIDEO_WIDTH, VIDEO_HEIGHT])
+            key = image_cache.make_key(fields)
+            cache_keys.append((key, fields))
+            if not refresh and image_cache.fetch(key, os.path.join(output_dir, f"image_{idx+1:02d}.png")):
+                done += 1
+                if on_image:
+                    on_image(idx)
+            else:
+                pending.append(idx)
+        if pending and image_engine.engine.pipe is None:
+            report(0, "Loading AI image generation model...", "Initializing Stable Diffusion")
+        if done:
+            print(f"♻️ Reused {done}/{total_images} cached images")
+            report(done / total_images, "Generating educational images...", f"Image {done}/{total_images}")
+        results = image_engine.engine.submit([enhanced_prompts[i] for i in pending], profile=profile,
+                                             seeds=[seeds[i] for i in pending]).results() if pending else []
+
+        # Save images as the engine finishes them
+        for position, image, error in results:
+            idx = pending[position]
+            done += 1
+            report(done / total_images, "Generating educational images...", f"Image {done}/{total_images}")
 
             try:
-                enhanced_prompt = (
-                    f"{prompt}, educational illustration, professional, detailed, "
-                    f"high quality, 16:9 aspect ratio, clean background"
-                )
-
-                image = pipe(
-                    enhanced_prompt,
-                    num_inference_steps=25,
-                    guidance_scale=7.5,
-                    width=768,
-                    height=432,
-                    negative_prompt="blurry, low quality, distorted, ugly, bad anatomy, text, watermark, signature"
-                ).images[0]
-
-                # Convert to proper 16:9 format
+                if error is not None:
+                    raise error
+
+                # Convert to proper 16:9 format (and upscale draft renders)
                 image_16_9 = resize_to_16_9_advanced(image)
 
-                # Save with high quality
+                # Save with high quality; never write through a hard link shared with the image cache
                 output_path = os.path.join(output_dir, f"image_{idx+1:02d}.png")
+                if os.path.lexists(output_path):
+                    os.remove(output_path)
                 cv2.imwrite(output_path, cv2.cvtColor(image_16_9, cv2.COLOR_RGB2BGR))
+                if not refresh:
+                    # a salted render is never looked up again
+                    key, fields = cache_keys[idx]
+                    image_cache.put(key, output_path, fields)
 
                 print(f"✅ Generated educational image {idx+1}/{total_images}")
 
             except Exception as e:
-                import traceback
                 print(f"⚠️ Failed to generate image {idx+1}: {e}")
-                traceback.print_exc()
                 # Create fallback placeholder
-                create_fallback_image(output_dir, idx+1, prompt, topic)
-
-        # Clear GPU memory
-        if device == "cuda":
-            torch.cuda.empty_cache()
+                create_fallback_image(output_dir, idx+1, prompts[idx], topic)
+            if on_image:
+                on_image(idx)
 
-        update_progress(folder_name, 60, 1, "All images generated successfully!", "Completed")
+        report(1, "All images generated successfully!", "Completed")
         print(f"✅ Successfully generated all {total_images} images")
         return True
 
+    except image_engine.ImageEngineUnavailable as e:
+        print(f"❌ Stable Diffusion unavailable: {e}")
+        return False
+
     except Exception as e:
         import traceback
         print("❌ Stable Diffusion setup failed:")
@@ -1219,8 +1757,10 @@ def create_fallback_image(output_dir, idx, prompt, topic):
         # Add educational icon
         cv2.putText(img, "📚", (VIDEO_WIDTH-150, VIDEO_HEIGHT-50), cv2.FONT_HERSHEY_SIMPLEX, 2, (100, 100, 100), 3)
         
-        # Save image
+        # Save image (replacing, not rewriting, a cached scene that may be hard-linked here)
         output_path = os.path.join(output_dir, f"image_{idx:02d}.png")
+        if os.path.lexists(output_path):
+            os.remove(output_path)
         cv2.imwrite(output_path, img)
         
     except Exception as e:
@@ -1261,8 +1801,8 @@ def resize_to_16_9_advanced(image, target_width=VIDEO_WIDTH, target_height=VIDEO
     
     return canvas
 
-def generate_image_prompts_with_class(topic, interests, user_class):
-    """Generate image prompts appropriate for the student's class level"""
+def generate_image_prompts_with_class(topic, interests, user_class, refresh=False):
+    """Generate image prompts appropriate for the student's class level; refresh skips the LLM cache"""
     print(f"🧠 Generating prompts for {user_class} level: {topic}, interests: {interests}")
     
     # Create class-appropriate prompt
@@ -1294,18 +1834,10 @@ Write exactly 15 image prompts, one per line:
 ..."""
 
     try:
-        process = subprocess.Popen(
-            ['ollama', 'run', 'llama3'],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            encoding='utf-8',
-            errors='replace'
-        )
-        stdout, stderr = process.communicate(ollama_prompt, timeout=120)
+        stdout = llm_client.generate(ollama_prompt, timeout=120, refresh=refresh, priority=llm_scheduler.BATCH,
+                                     breaker=video_prompts_breaker)
         
-        if process.returncode == 0:
+        if stdout:
             lines = clean_ollama_response(stdout)
             prompts = []
             for line in lines[:15]:
@@ -1388,16 +1920,21 @@ def clean_script(raw_text):
         cleaned.append(line)
     return cleaned
 
-def generate_voice_script_with_class(topic, interests, user_class, images_dir):
-    """Generate voice script appropriate for the student's class level"""
+def generate_voice_script_with_class(topic, interests, user_class, images_dir=None, scene_count=None, refresh=False):
+    """
+    Generate voice script appropriate for the student's class level.
+    Only the number of scenes matters: pass scene_count to write the script before the images exist.
+    refresh skips the LLM cache.
+    """
     print(f"🗣️ Generating {user_class}-level voice script for topic: {topic}")
     
-    images = sorted([img for img in os.listdir(images_dir) if img.endswith(".png")])
-    if not images:
+    if scene_count is None:
+        scene_count = len([img for img in os.listdir(images_dir) if img.endswith(".png")])
+    if not scene_count:
         print("❌ No images found to generate script from!")
         return []
     
-    print(f"📸 Found {len(images)} images to analyze for {user_class} level")
+    print(f"📸 Writing narration for {scene_count} scenes at {user_class} level")
     
     # Class-appropriate language and complexity
     class_instructions = {
@@ -1412,9 +1949,9 @@ def generate_voice_script_with_class(topic, interests, user_class, images_dir):
     
     ollama_prompt = f"""You are creating a detailed educational narration script for a video about "{topic}" for {user_class} students interested in {interests}.
 {class_instruction}
-The video has {len(images)} educational scenes/images that will be shown in sequence. 
+The video has {scene_count} educational scenes/images that will be shown in sequence. 
 
-Create exactly {len(images)} narration sentences - one for each scene. Each sentence should:
+Create exactly {scene_count} narration sentences - one for each scene. Each sentence should:
 - Be appropriate for {user_class} level understanding
 - Be 12-18 words long for clear narration
 - Build upon the previous sentence to create a flowing educational story
@@ -1423,25 +1960,17 @@ Create exactly {len(images)} narration sentences - one for each scene. Each sent
 - Explain concepts progressively from basic to advanced (appropriate for {user_class})
 - Use engaging, educational language suitable for {user_class} students
 
-Write exactly {len(images)} sentences, one per line, that will narrate this educational video about {topic} for {user_class} students:
+Write exactly {scene_count} sentences, one per line, that will narrate this educational video about {topic} for {user_class} students:
 1.
 2.
 3.
 ..."""
 
     try:
-        process = subprocess.Popen(
-            ['ollama', 'run', 'llama3'],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            encoding='utf-8',
-            errors='replace'
-        )
-        stdout, stderr = process.communicate(ollama_prompt, timeout=120)
+        stdout = llm_client.generate(ollama_prompt, timeout=120, refresh=refresh, priority=llm_scheduler.BATCH,
+                                     breaker=narration_breaker)
         
-        if process.returncode == 0:
+        if stdout:
             lines = clean_ollama_response(stdout)
             voice_lines = []
             
@@ -1450,10 +1979,10 @@ Write exactly {len(images)} sentences, one per line, that will narrate this educ
                 if cleaned_line and len(cleaned_line.split()) >= 8:
                     voice_lines.append(cleaned_line)
             
-            while len(voice_lines) < len(images):
+            while len(voice_lines) < scene_count:
                 voice_lines.append(f"This concept helps {user_class} students understand another important aspect of {topic}.")
             
-            voice_lines = voice_lines[:len(images)]
+            voice_lines = voice_lines[:scene_count]
             
             print(f"✅ Generated {len(voice_lines)} class-appropriate voice lines")
             return voice_lines
@@ -1464,12 +1993,12 @@ Write exactly {len(images)} sentences, one per line, that will narrate this educ
     # Class-appropriate fallback script
     print(f"📝 Creating {user_class}-level educational script as fallback...")
     basic_script = []
-    for i in range(len(images)):
+    for i in range(scene_count):
         if i == 0:
             basic_script.append(f"Welcome to our {user_class}-level exploration of {topic} and its important concepts.")
         elif i == 1:
             basic_script.append(f"Let's understand the fundamental principles of {topic} at the {user_class} level.")
-        elif i == len(images) - 1:
+        elif i == scene_count - 1:
             basic_script.append(f"This completes our {user_class}-level journey through {topic} and its applications.")
         else:
             basic_script.append(f"This {user_class}-level concept reveals another important aspect of {topic}.")
@@ -1521,17 +2050,11 @@ def create_video_with_advanced_transitions(images_dir, video_file, sentence_timi
         
         # Load all images
         loaded_images = []
-        for img_name in images[:15]:
-            img_path = os.path.join(images_dir, img_name)
-            frame = cv2.imread(img_path)
+        for img_name in images[:MAX_VIDEO_SCENES]:
+            frame = load_scene_image(os.path.join(images_dir, img_name))
             if frame is None:
                 print(f"⚠️ Could not load image: {img_name}")
                 continue
-            
-            # Ensure frame is correct size
-            if frame.shape[:2] != (VIDEO_HEIGHT, VIDEO_WIDTH):
-                frame = cv2.resize(frame, (VIDEO_WIDTH, VIDEO_HEIGHT))
-            
             loaded_images.append(frame)
         
         if len(loaded_images) < 1:
@@ -1542,10 +2065,9 @@ def create_video_with_advanced_transitions(images_dir, video_file, sentence_timi
         
         # Calculate timing
         num_images = len(loaded_images)
-        image_display_time = audio_duration / num_images
-        image_frames = max(int(image_display_time * TRANSITION_FPS), 24)  # At least 1 second per image
+        image_frames = scene_frame_count(audio_duration, num_images)
         
-        print(f"📊 Video timing: {image_display_time:.2f}s per image ({image_frames} frames)")
+        print(f"📊 Video timing: {audio_duration / num_images:.2f}s per image ({image_frames} frames)")
         
         # Create video writer
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
@@ -1556,19 +2078,9 @@ def create_video_with_advanced_transitions(images_dir, video_file, sentence_timi
             return False
         
         print("🎬 Writing video frames...")
-        current_video_time = 0
-        frame_duration = 1.0 / TRANSITION_FPS
-        
         for i, current_image in enumerate(loaded_images):
             print(f"   Processing image {i+1}/{len(loaded_images)}")
-            
-            # Display current image with captions
-            for frame_idx in range(image_frames):
-                # Get appropriate caption for current time
-                caption = get_current_caption(current_video_time, sentence_timings, voice_lines)
-                frame_with_caption = add_caption_to_frame_advanced(current_image.copy(), caption)
-                video_writer.write(frame_with_caption)
-                current_video_time += frame_duration
+            write_scene_frames(video_writer, current_image, i * image_frames, image_frames, sentence_timings, voice_lines)
         
         video_writer.release()
         print(f"✅ Video created: {video_file}")
@@ -1580,6 +2092,109 @@ def create_video_with_advanced_transitions(images_dir, video_file, sentence_timi
         traceback.print_exc()
         return False
 
+def load_scene_image(img_path):
+    """A scene image at video size (BGR), or None if it cannot be read"""
+    import cv2
+    frame = cv2.imread(img_path)
+    if frame is None:
+        return None
+    # Ensure frame is correct size
+    if frame.shape[:2] != (VIDEO_HEIGHT, VIDEO_WIDTH):
+        frame = cv2.resize(frame, (VIDEO_WIDTH, VIDEO_HEIGHT))
+    return frame
+
+def scene_frame_count(audio_duration, num_images):
+    """Frames each scene is shown for: an equal share of the narration, at least 1 second"""
+    return max(int(audio_duration / num_images * TRANSITION_FPS), 24)
+
+def write_scene_frames(video_writer, image, first_frame, image_frames, sentence_timings, voice_lines):
+    """Write one scene's frames, captioned for their place (first_frame onwards) in the video"""
+    frame_duration = 1.0 / TRANSITION_FPS
+    current_video_time = first_frame * frame_duration
+    for frame_idx in range(image_frames):
+        # Get appropriate caption for current time
+        caption = get_current_caption(current_video_time, sentence_timings, voice_lines)
+        video_writer.write(add_caption_to_frame_advanced(image.copy(), caption))
+        current_video_time += frame_duration
+
+def scene_segments(first_frame, image_frames, sentence_timings, voice_lines):
+    """
+    A scene's frames grouped into runs with the same caption: [(caption, frame_count), ...].
+    Captions are looked up per frame exactly as write_scene_frames does, so both renderings match.
+    """
+    frame_duration = 1.0 / TRANSITION_FPS
+    current_video_time = first_frame * frame_duration
+    segments = []
+    for frame_idx in range(image_frames):
+        caption = get_current_caption(current_video_time, sentence_timings, voice_lines)
+        if segments and segments[-1][0] == caption:
+            segments[-1][1] += 1
+        else:
+            segments.append([caption, 1])
+        current_video_time += frame_duration
+    return [(caption, count) for caption, count in segments]
+
+def write_scene_stills(image, stills_dir, scene_index, first_frame, image_frames, sentence_timings, voice_lines):
+    """Caption each of a scene's segments once and save it as a still; returns [(path, frame_count), ...]"""
+    import cv2
+    stills = []
+    for n, (caption, count) in enumerate(scene_segments(first_frame, image_frames, sentence_timings, voice_lines)):
+        path = os.path.join(stills_dir, f"scene_{scene_index+1:02d}_{n:02d}.png")
+        cv2.imwrite(path, add_caption_to_frame_advanced(image.copy(), caption), [cv2.IMWRITE_PNG_COMPRESSION, 1])
+        stills.append((path, count))
+    return stills
+
+def encode_slideshow(stills, video_file, seconds=None):
+    """
+    Encode [(still, frame_count), ...] with ffmpeg's concat demuxer as a variable frame rate H.264
+    stream: one encoded frame per still, held for its duration, so encoding cost follows the number
+    of segments, not frames. seconds (the narration length) cuts the holds that would run past it, so
+    the result is ready for combine_audio_video_advanced(copy_video=True), which does not cut the video.
+    """
+    if seconds is not None:
+        # scenes last at least a second, so a short narration can end before the last scene does
+        remaining, trimmed = max(1, round(seconds * TRANSITION_FPS)), []
+        for path, count in stills:
+            if remaining <= 0:
+                break
+            trimmed.append((path, min(count, remaining)))
+            remaining -= count
+        stills = trimmed
+    if not stills:
+        return False
+    list_file = os.path.splitext(video_file)[0] + "_stills.txt"
+    with open(list_file, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n")
+        for path, count in stills:
+            # long holds are listed in one-second pieces: the repeats encode as near-empty frames and
+            # players get a frame at least every second to seek to
+            while count > 0:
+                hold = min(count, TRANSITION_FPS)
+                f.write(f"file '{os.path.abspath(path)}'\nduration {hold / TRANSITION_FPS:.6f}\n")
+                count -= hold
+        # the demuxer ignores the last entry's duration unless the file is listed once more
+        f.write(f"file '{os.path.abspath(stills[-1][0])}'\n")
+    ffmpeg_command = [
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0", "-i", list_file,
+        "-vsync", "vfr",           # keep one frame per still instead of repeating it 24 times a second
+        "-pix_fmt", "yuv420p",
+        "-c:v", "libx264",
+        "-preset", "veryfast",
+        "-tune", "stillimage",
+        "-crf", "20",
+        video_file
+    ]
+    try:
+        subprocess.run(ffmpeg_command, timeout=600, check=True, capture_output=True, text=True)
+        return True
+    except Exception as e:
+        print(f"⚠️ FFmpeg slideshow failed: {e}")
+        return False
+    finally:
+        if os.path.exists(list_file):
+            os.remove(list_file)
+
 def add_caption_to_frame_advanced(frame, caption_text, font_scale=0.9, thickness=2):
     """Add professional captions to frame"""
     import cv2
@@ -1782,8 +2397,8 @@ def generate_audio_advanced(script, audio_file):
         print(f"❌ Could not create audio file at all: {e}")
         return False
 
-def combine_audio_video_advanced(video_file, audio_file, output_file):
-    """Combine audio and video with normalization"""
+def combine_audio_video_advanced(video_file, audio_file, output_file, copy_video=False):
+    """Combine audio and video with normalization; copy_video keeps an already H.264 video stream as is"""
     print(f"📽️ Combining {video_file} with {audio_file}")
     
     if not os.path.exists(video_file):
@@ -1792,7 +2407,6 @@ def combine_audio_video_advanced(video_file, audio_file, output_file):
     
     if not os.path.exists(audio_file):
         print(f"⚠️ Audio file not found, copying video only")
-        import shutil
         shutil.copy2(video_file, output_file)
         return True
     
@@ -1800,15 +2414,19 @@ def combine_audio_video_advanced(video_file, audio_file, output_file):
         "ffmpeg", "-y",
         "-i", video_file,
         "-i", audio_file,
-        "-c:v", "libx264",        # standard video codec
-        "-preset", "fast",
-        "-crf", "23",
-        "-pix_fmt", "yuv420p",
+        *(["-c:v", "copy"] if copy_video else [
+            "-c:v", "libx264",    # standard video codec
+            "-preset", "fast",
+            "-crf", "23",
+            "-pix_fmt", "yuv420p",
+        ]),
         "-c:a", "aac",            # force AAC audio
         "-b:a", "192k",           # good audio quality
         "-ar", "44100",           # normalize sample rate
         "-ac", "2",               # stereo output
-        "-shortest",              # cut extra video or audio
+        # cut extra video or audio; a copied slideshow is already cut to the narration (encode_slideshow),
+        # and -shortest drops the tail of a copied variable frame rate stream
+        *([] if copy_video else ["-shortest"]),
         output_file
     ]
     
@@ -1825,7 +2443,6 @@ def combine_audio_video_advanced(video_file, audio_file, output_file):
     except Exception as e:
         print(f"⚠️ FFmpeg failed: {e}")
         # Fallback: just copy video
-        import shutil
         shutil.copy2(video_file, output_file)
         print("✅ Copied video as fallback (no audio)")
         return True
@@ -1890,15 +2507,7 @@ def generate_audio_notes():
 
         Keep it concise and educational. Student interests: {interests}"""
 
-        process = subprocess.Popen(
-            ["ollama", "run", "llama3"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        stdout, stderr = process.communicate(input=prompt.encode("utf-8"), timeout=120)
-        notes_text = stdout.decode("utf-8", errors="ignore").strip()
-        notes_text = remove_spinner_artifacts(notes_text)
+        notes_text = llm_client.generate(prompt, timeout=120, priority=llm_scheduler.STANDARD)
 
         # Generate audio using pyttsx3 or gTTS
         import pyttsx3
@@ -1925,6 +2534,8 @@ def generate_audio_notes():
             "notes_text": notes_text
         })
 
+    except llm_client.LLMQueueFull as e:
+        return queue_full_response(e)
     except Exception as e:
         print(f"❌ Audio generation error: {e}")
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -1994,18 +2605,19 @@ Question: {question}
 
 Answer:"""
 
+    if data.get("stream"):
+        return stream_llm_answer(prompt, timeout=20, timeout_text=MODEL_WARMING_TEXT)
+
+    unready_text = model_unready_text(MODEL_WARMING_TEXT)
+    if unready_text:
+        return jsonify({"answer": unready_text, "model_status": llm_health.status()})
+
     try:
-        process = subprocess.Popen(
-            ["ollama", "run", "llama3"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        stdout, stderr = process.communicate(input=prompt.encode("utf-8"), timeout=20)
-        answer = stdout.decode("utf-8", errors="ignore").strip()
-        answer = remove_spinner_artifacts(answer)
+        answer = llm_client.generate(prompt, timeout=20, priority=llm_scheduler.INTERACTIVE)
 
         return jsonify({"answer": answer})
+    except llm_client.LLMQueueFull as e:
+        return queue_full_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -2069,17 +2681,11 @@ def get_coding_lesson():
     Keep it fun and easy to understand!"""
 
     try:
-        process = subprocess.Popen(
-            ["ollama", "run", "llama3"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        stdout, stderr = process.communicate(input=prompt.encode("utf-8"), timeout=200)
-        lesson = stdout.decode("utf-8", errors="ignore").strip()
-        lesson = remove_spinner_artifacts(lesson)
+        lesson = llm_client.generate(prompt, timeout=200, priority=llm_scheduler.STANDARD)
 
         return jsonify({"lesson": lesson})
+    except llm_client.LLMQueueFull as e:
+        return queue_full_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -2228,6 +2834,57 @@ def edit_profile():
                            interests=session.get("user_interests", []),
                            success=False)
 
+# -------------------- LLM METRICS --------------------
+
+@app.route("/llm_cache_stats", methods=["GET"])
+def llm_cache_stats():
+    """Hit/miss counters and size of the shared LLM response cache"""
+    return jsonify(llm_cache.stats())
+
+@app.route("/llm_scheduler_stats", methods=["GET"])
+def llm_scheduler_stats():
+    """Queue depth, rejections and queue-wait times per LLM priority class"""
+    return jsonify(llm_scheduler.scheduler.stats())
+
+@app.route("/llm_health", methods=["GET"])
+def llm_health_status():
+    """Readiness of the configured models (warming / ready / down) for the UI to check"""
+    return jsonify(llm_health.readiness())
+
+@app.route("/llm_breaker_stats", methods=["GET"])
+def llm_breaker_stats():
+    """Circuit breaker state, rolling p95 latency and error rate per LLM route"""
+    return jsonify(llm_breaker.stats())
+
+@app.route("/question_bank_stats", methods=["GET"])
+def question_bank_stats():
+    """Size of the question bank and how often its questions have been served"""
+    return jsonify(question_bank.stats())
+
+@app.route("/answer_grading_stats", methods=["GET"])
+def answer_grading_stats():
+    """How short answers were graded (pre-scored, cached, reused or by the model) and the cache size"""
+    return jsonify(answer_grading.stats())
+
+@app.route("/tutor_session_stats", methods=["GET"])
+def tutor_session_stats():
+    """Live tutor conversations, context memory and how many turns reused an encoded context"""
+    return jsonify(tutor_sessions.sessions.stats())
+
+@app.route("/image_engine_stats", methods=["GET"])
+def image_engine_stats():
+    """Stable Diffusion engine state, load / warmup time, per-image latency and queue depth"""
+    return jsonify(image_engine.engine.stats())
+
+@app.route("/image_cache_stats", methods=["GET"])
+def image_cache_stats():
+    """Hit rate and disk use of the generated scene image cache"""
+    return jsonify(image_cache.stats())
+
+@app.errorhandler(llm_client.LLMQueueFull)
+def handle_llm_queue_full(error):
+    return queue_full_response(error)
+
 # -------------------- AI + PDF GENERATION --------------------
 
 @app.route("/ask_ai", methods=["POST"])
@@ -2240,28 +2897,50 @@ def ask_ai():
     topic = session.get("current_topic", "General Learning")
     user_class = session.get("user_class", "high school")
 
-    prompt = f"You are a helpful {user_class} tutor for {topic}. Answer briefly and clearly in 2-3 sentences max. Student interests: {interests}.\n\nQ: {question}\nA:"
+    preamble = f"You are a helpful {user_class} tutor for {topic}. Answer briefly and clearly in 2-3 sentences max. Student interests: {interests}."
+    fallback_answer = f"I'm here to help with {topic}! Could you ask a more specific question about this topic?"
 
-    try:
-        process = subprocess.Popen(
-            ["ollama", "run", "llama3"],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+    # Follow-up questions continue the encoded conversation instead of re-sending the preamble
+    conversation = tutor_sessions.sessions.get_or_create(
+        data.get("conversation_id") or session.get("tutor_conversation"), preamble)
+    session["tutor_conversation"] = conversation.id
+    prompt, context = tutor_sessions.sessions.begin_turn(conversation, question)
+
+    if data.get("stream"):
+        return stream_llm_answer(
+            prompt, timeout=20, max_chars=500, timeout_text=fallback_answer, context=context,
+            on_done=lambda answer, final: conversation.record(question, answer, final.get("context"))
         )
-        stdout, stderr = process.communicate(input=prompt.encode("utf-8"), timeout=20)
-        output = stdout.decode("utf-8", errors="ignore").strip()
-        clean_output = remove_spinner_artifacts(output)
+
+    # Answer at once instead of waiting out the timeout on a model that is still loading or unreachable
+    unready_text = model_unready_text(fallback_answer)
+    if unready_text:
+        return jsonify({"answer": unready_text, "model_status": llm_health.status()})
+
+    try:
+        clean_output, new_context = llm_client.generate_turn(
+            prompt, context=context, timeout=20, priority=llm_scheduler.INTERACTIVE)
+        conversation.record(question, clean_output, new_context)
 
         if len(clean_output) > 500:
             clean_output = clean_output[:500] + "..."
 
-        return jsonify({"answer": clean_output})
-    except subprocess.TimeoutExpired:
-        return jsonify({"answer": f"I'm here to help with {topic}! Could you ask a more specific question about this topic?"})
+        return jsonify({"answer": clean_output, "conversation_id": conversation.id})
+    except llm_client.LLMQueueFull as e:
+        return queue_full_response(e)
+    except llm_client.LLMTimeout:
+        return jsonify({"answer": fallback_answer})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/tutor/reset", methods=["POST"])
+def reset_tutor_conversation():
+    """Start the next /ask_ai question in a fresh conversation"""
+    conversation_id = session.pop("tutor_conversation", None)
+    if conversation_id:
+        tutor_sessions.sessions.reset(conversation_id)
+    return jsonify({"status": "ok"})
+
 @app.route("/generate_pdf", methods=["POST"])
 def generate_pdf_route():
     topic = session.get("current_topic", "General Topic")
@@ -2271,7 +2950,9 @@ def generate_pdf_route():
     folder_name = f"{topic.replace(' ', '_')}__{interest_hash}"
     topic_folder = os.path.join(app.root_path, "static", "generated_pdfs", folder_name)
     pdf_path = os.path.join(topic_folder, "notes.pdf")
-    if os.path.exists(pdf_path):
+    # notes borrowed while the model was slow are replaced once it has recovered
+    borrowed = os.path.exists(os.path.join(topic_folder, CACHED_NOTES_MARKER))
+    if os.path.exists(pdf_path) and (not borrowed or notes_breaker.is_open()):
         print(f"📄 PDF already exists for {topic} at {user_class} level")
         return jsonify({
             "status": "ok",
@@ -2280,12 +2961,30 @@ def generate_pdf_route():
         })
     try:
         print(f"📚 Generating new PDF for {topic} at {user_class} level...")
-        generate_notes_pdf(topic, interests, user_class, topic_folder)
+        # Students opening the same topic concurrently wait on one generation
+        pdf_jobs.do(folder_name, generate_notes_pdf, topic, interests, user_class, topic_folder)
         return jsonify({
             "status": "ok",
             "message": f"Successfully generated {user_class}-level notes",
             "folder": folder_name
         })
+    except llm_client.LLMQueueFull as e:
+        return queue_full_response(e)
+    except llm_client.LLMTimeout as e:
+        print(f"⚠️ Notes model too slow ({e}), looking for cached notes")
+        if serve_cached_notes(topic, topic_folder):
+            return jsonify({
+                "status": "ok",
+                "message": "The AI is busy, showing saved notes for this topic",
+                "folder": folder_name,
+                "fallback": True
+            })
+        response = jsonify({
+            "status": "busy",
+            "message": "The AI is busy right now, please try again shortly"
+        })
+        response.headers["Retry-After"] = str(notes_breaker.retry_after())
+        return response, 503
     except Exception as e:
         print("❌ PDF Generation Failed:", str(e))
         return jsonify({
@@ -2300,6 +2999,32 @@ def get_interest_hash(interests):
     key = ",".join(interests)
     return hashlib.md5(key.encode()).hexdigest()[:8]
 
+CACHED_NOTES_MARKER = "cached_from.txt"
+
+def serve_cached_notes(topic, topic_folder):
+    """
+    Copy notes already generated for the same topic (for other interests) into topic_folder.
+    Returns True when a PDF was found.
+    """
+    pdfs_root = os.path.dirname(topic_folder)
+    prefix = f"{topic.replace(' ', '_')}__"
+    candidates = []
+    for name in os.listdir(pdfs_root):
+        pdf_path = os.path.join(pdfs_root, name, "notes.pdf")
+        own = os.path.join(pdfs_root, name) == topic_folder
+        borrowed = os.path.exists(os.path.join(pdfs_root, name, CACHED_NOTES_MARKER))
+        if name.startswith(prefix) and not own and not borrowed and os.path.exists(pdf_path):
+            candidates.append((os.path.getmtime(pdf_path), pdf_path))
+    if not candidates:
+        return False
+    os.makedirs(topic_folder, exist_ok=True)
+    source = max(candidates)[1]
+    shutil.copy2(source, os.path.join(topic_folder, "notes.pdf"))
+    with open(os.path.join(topic_folder, CACHED_NOTES_MARKER), "w") as f:
+        f.write(os.path.basename(os.path.dirname(source)))
+    print(f"📄 Served cached notes for {topic}")
+    return True
+
 def generate_notes_pdf(topic, interests, user_class, topic_folder):
     """Generate PDF notes appropriate for the student's class level"""
     print(f"📚 Starting PDF generation for {user_class} level: {topic}")
@@ -2314,14 +3039,7 @@ def generate_notes_pdf(topic, interests, user_class, topic_folder):
     """
 
     print("🤖 Generating content with AI...")
-    process = subprocess.Popen(
-        ["ollama", "run", "llama3"],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-    )
-    stdout, stderr = process.communicate(prompt.encode('utf-8'))
-    content = stdout.decode('utf-8', errors='ignore').strip()
+    content = llm_client.generate(prompt, timeout=600, priority=llm_scheduler.BATCH, breaker=notes_breaker)
 
     print("📄 Creating PDF document...")
     os.makedirs(topic_folder, exist_ok=True)
@@ -2345,8 +3063,85 @@ def generate_notes_pdf(topic, interests, user_class, topic_folder):
             pdf.multi_cell(0, 8, txt=clean_text(line))
             pdf.ln(2)
     pdf.output(pdf_path)
+    if os.path.exists(os.path.join(topic_folder, CACHED_NOTES_MARKER)):
+        os.remove(os.path.join(topic_folder, CACHED_NOTES_MARKER))
     print(f"✅ PDF saved successfully: {pdf_path}")
 
+MODEL_WARMING_TEXT = "The AI model is still warming up. Please try again in a moment."
+MODEL_DOWN_TEXT = "The AI model is not reachable right now. Please try again later."
+
+def model_unready_text(warming_text):
+    """What to answer instead of calling the model: None when it is ready, else a warming or unavailable text"""
+    status = llm_health.status()
+    if status in (None, "ready"):
+        return None
+    return MODEL_DOWN_TEXT if status == "down" else warming_text
+
+def stream_llm_answer(prompt, timeout, max_chars=None, timeout_text=None, context=None, on_done=None):
+    """
+    Stream model tokens to the browser as Server-Sent Events.
+    Each event carries {"token": ...}; a final "done" event closes the answer and
+    an "error" event reports failures that happen before or during the stream.
+    While the model is warming up, timeout_text is sent at once instead (MODEL_DOWN_TEXT when it is unreachable).
+    context continues an encoded conversation; on_done(answer, final_chunk) is called after a
+    successful stream (final_chunk is empty when the answer was cut at max_chars).
+    """
+    unready_text = model_unready_text(timeout_text) if timeout_text else None
+    if unready_text:
+        ready_events = [f"data: {json.dumps({'token': unready_text})}\n\n", "event: done\ndata: {}\n\n"]
+        return Response(ready_events, mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+    try:
+        llm_client.check_capacity(llm_scheduler.INTERACTIVE)
+    except llm_client.LLMQueueFull as e:
+        return queue_full_response(e)
+
+    extra = {"context": list(context)} if context else {}
+
+    def events():
+        sent = 0
+        parts = []
+        final = {}
+        try:
+            # conversation turns need the model's closing chunk, which a cache hit does not have
+            for token in llm_client.stream(prompt, timeout=timeout, priority=llm_scheduler.INTERACTIVE,
+                                           cache=on_done is None, final=final, **extra):
+                if max_chars and sent + len(token) > max_chars:
+                    parts.append(token[:max_chars - sent])
+                    yield f"data: {json.dumps({'token': token[:max_chars - sent] + '...'})}\n\n"
+                    break
+                sent += len(token)
+                parts.append(token)
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            if on_done is not None:
+                on_done("".join(parts).strip(), final)
+        except llm_client.LLMTimeout as e:
+            print(f"⚠️ Streaming answer timed out: {e}")
+            if timeout_text and sent == 0:
+                yield f"data: {json.dumps({'token': timeout_text})}\n\n"
+            else:
+                yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        except llm_client.LLMError as e:
+            print(f"❌ Streaming answer failed: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        yield "event: done\ndata: {}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def queue_full_response(error):
+    """429 with a Retry-After hint when the LLM scheduler is shedding load"""
+    response = jsonify({
+        "error": "The AI tutor is busy right now. Please try again shortly.",
+        "retry_after": error.retry_after
+    })
+    response.status_code = 429
+    response.headers["Retry-After"] = str(error.retry_after)
+    return response
+
 def remove_spinner_artifacts(text):
     spinner_chars = "⠋⠙⠹⠸⠼⠴⠦⠧⠇⠏"
     return re.sub(f"[{re.escape(spinner_chars)}]", "", text).strip()
@@ -2364,5 +3159,16 @@ if __name__ == "__main__":
     os.makedirs("static/uploaded_books", exist_ok=True)
     os.makedirs("csv", exist_ok=True)
 
+    # Preload the models and keep probing them in the background so the first
+    # student question does not pay the model load time. The debug reloader runs
+    # this block twice; only the serving child process should warm up.
+    debug = True
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        print(f"🔥 Warming up AI models: {', '.join(llm_health.WARMUP_MODELS)}")
+        llm_health.start()
+        if image_engine.PRELOAD:
+            print(f"🔥 Preloading {image_engine.MODEL_ID} for video generation")
+            image_engine.engine.start(preload=True)
+
     print("✅ Application ready!")
-    app.run(debug=True, threaded=True)
+    app.run(debug=debug, threaded=True)
@@ -0,0 +1,116 @@
+"""
+Short-answer grading benchmark against the mock Ollama server: one model call per answer (the old
+/evaluate_paragraph) against answer_grading.py's pre-scorer, cache and batched model calls.
+
+A class answers the same question; some answers are empty, some restate the question and some are
+copied from a classmate, as in a real upload. Before timing anything it checks the pre-scorer on
+hand-written answers: only empty answers and pure restatements of the question may get 0 without the model.
+
+Usage (from the Smart-siksha folder):
+    python benchmarks/bench_answer_grading.py --students 40 --ttft 1.0 --tps 40
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+QUESTION = "Explain how photosynthesis converts light energy into chemical energy."
+IDEAS = ["chlorophyll absorbs sunlight", "water is split and oxygen is released",
+         "carbon dioxide is fixed into glucose", "ATP and NADPH carry the energy",
+         "the Calvin cycle runs in the stroma", "light reactions happen in the thylakoids"]
+
+# (question, answer, should the pre-scorer give it 0?)
+PRESCORE_CASES = [
+    ("Which gas do plants release during photosynthesis?", "Plants release oxygen gas during photosynthesis.", False),
+    ("Which gas do plants release during photosynthesis?", "Plants release gas during photosynthesis.", True),
+    (QUESTION, "Photosynthesis converts light energy into chemical energy.", True),
+    (QUESTION, "Chlorophyll converts light energy into chemical energy.", False),
+    (QUESTION, "idk", True),
+]
+
+
+def check_prescore(answer_grading):
+    wrong = []
+    for question, answer, expected in PRESCORE_CASES:
+        result = answer_grading.Grader(question).pregrade(answer)
+        if (result is not None and result["source"] == "prescore") != expected:
+            wrong.append((question, answer, result))
+    for question, answer, result in wrong:
+        print(f"❌ {question!r} / {answer!r}: {result['feedback'] if result else 'sent to the model'}")
+    if wrong:
+        sys.exit(f"{len(wrong)} of {len(PRESCORE_CASES)} answers pre-scored wrongly")
+    print(f"✅ {len(PRESCORE_CASES)} answers pre-scored as expected")
+
+
+def class_answers(students, rng):
+    answers = []
+    for _ in range(students):
+        kind = rng.random()
+        if kind < 0.1:
+            answers.append(rng.choice(["", "idk", "no idea"]))
+        elif kind < 0.2:
+            answers.append("Photosynthesis converts light energy into chemical energy.")
+        elif kind < 0.4 and answers:
+            answers.append(rng.choice(answers))
+        else:
+            answers.append("In photosynthesis " + ", ".join(rng.sample(IDEAS, 3)) + ".")
+    return answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--ttft", type=float, default=1.0, help="mock time to first token, seconds")
+    parser.add_argument("--tps", type=float, default=40.0, help="mock tokens per second")
+    args = parser.parse_args()
+
+    from mock_ollama import start_mock_server
+    server = start_mock_server(ttft=args.ttft, tps=args.tps)
+    workdir = tempfile.mkdtemp(prefix="bench_answers_")
+    os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["QUIZ_DB_PATH"] = os.path.join(workdir, "quizzes.db")
+    try:
+        real_stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            import app
+            import llm_client
+            import llm_scheduler
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+
+        check_prescore(app.answer_grading)
+        answers = class_answers(args.students, random.Random(5))
+        print(f"{len(answers)} answers, {len(set(answers))} distinct; mock ttft {args.ttft}s, {args.tps} tok/s")
+        print(f"{'grading':<34}{'model calls':>12}{'seconds':>10}")
+
+        start = time.perf_counter()
+        for text in answers:
+            llm_client.generate(app._evaluation_prompt(QUESTION, text), timeout=45,
+                                priority=llm_scheduler.INTERACTIVE)
+        print(f"{'one call per answer':<34}{len(answers):>12}{time.perf_counter() - start:>10.2f}")
+
+        for label in ("pre-score + batch, cold cache", "pre-score + batch, warm cache"):
+            start = time.perf_counter()
+            results = app._evaluate_answers(QUESTION, answers)
+            elapsed = time.perf_counter() - start
+            # distinct answers the model graded, sent BATCH_SIZE per call
+            graded = len({app.answer_grading.normalize_answer(a) for a, r in zip(answers, results)
+                          if r["source"] == "model"})
+            calls = -(-graded // app.answer_grading.BATCH_SIZE)
+            print(f"{label:<34}{calls:>12}{elapsed:>10.2f}")
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
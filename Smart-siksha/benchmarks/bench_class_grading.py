@@ -0,0 +1,104 @@
+"""
+Class grading benchmark: grading every student the way /submit_quiz does (a Python loop over the
+quiz, one saved_quizzes transaction per student) against /grade_class (class_grading.py's NumPy
+pass plus one transaction for the whole class).
+
+Usage (from the Smart-siksha folder):
+    python benchmarks/bench_class_grading.py --classes 30x10 40x25 1000x50
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+def make_class(students, questions, seed=7):
+    """Answers from students of varying ability, so the item statistics are meaningful"""
+    rng = np.random.default_rng(seed)
+    key = rng.integers(0, 4, questions)
+    ability = rng.normal(0, 1, students)[:, None]
+    hardness = rng.normal(0, 1, questions)[None, :]
+    knows = rng.random((students, questions)) < 1 / (1 + np.exp(hardness - ability))
+    guesses = rng.integers(0, 4, (students, questions))
+    answers = np.where(knows, key[None, :], guesses)
+    answers[rng.random((students, questions)) < 0.03] = -1
+    quiz = [{"question": f"Question {i + 1}?", "options": ["A", "B", "C", "D"], "answer_index": int(k)}
+            for i, k in enumerate(key)]
+    names = [f"student{i}" for i in range(students)]
+    return names, quiz, answers.tolist()
+
+
+def legacy(quiz_db, names, quiz, answers, topic):
+    """One student at a time, as /submit_quiz followed by save_quiz_to_db"""
+    for name, row in zip(names, answers):
+        correct_count = 0
+        for i, q in enumerate(quiz):
+            user_idx = row[i] if row[i] is not None else -1
+            if user_idx == q["answer_index"]:
+                correct_count += 1
+        percentage = correct_count / len(quiz) * 100
+        quiz_data = json.dumps({"quiz": quiz, "answers": row})
+        quiz_db.insert_graded_quizzes([(name, topic, "middle school", quiz_data, correct_count, len(quiz), percentage)])
+
+
+def batched(quiz_db, class_grading, names, quiz, answers, topic):
+    key = [q["answer_index"] for q in quiz]
+    matrix = class_grading.answer_matrix(answers, len(key))
+    result = class_grading.grade(matrix, key)
+    graded = time.perf_counter()
+    quiz_db.insert_graded_quizzes(
+        class_grading.quiz_rows(names, topic, "middle school", quiz, matrix, key, result))
+    return graded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--classes", nargs="+", default=["30x10", "40x25", "1000x50"],
+                        help="students x questions")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_grading_")
+    os.environ["QUIZ_DB_PATH"] = os.path.join(workdir, "quizzes.db")
+    try:
+        import quiz_db
+        import class_grading
+        real_stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            quiz_db.migrate()
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+
+        print(f"{'class':>10}{'legacy ms':>12}{'grade ms':>10}{'grade+save ms':>15}{'speedup':>9}")
+        for spec in args.classes:
+            students, questions = (int(n) for n in spec.lower().split("x"))
+            names, quiz, answers = make_class(students, questions)
+
+            legacy_s = grade_s = total_s = float("inf")
+            for run in range(args.repeat):
+                start = time.perf_counter()
+                legacy(quiz_db, names, quiz, answers, f"legacy {spec} {run}")
+                legacy_s = min(legacy_s, time.perf_counter() - start)
+
+                start = time.perf_counter()
+                graded = batched(quiz_db, class_grading, names, quiz, answers, f"batched {spec} {run}")
+                end = time.perf_counter()
+                grade_s, total_s = min(grade_s, graded - start), min(total_s, end - start)
+            print(f"{spec:>10}{legacy_s * 1e3:>12.1f}{grade_s * 1e3:>10.2f}"
+                  f"{total_s * 1e3:>15.2f}{legacy_s / total_s:>8.1f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
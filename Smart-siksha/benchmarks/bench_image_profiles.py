@@ -0,0 +1,75 @@
+"""
+Image generation benchmark: images per minute for each quality profile of the resident Stable
+Diffusion engine (image_engine.py), on whatever device torch finds. Needs torch and diffusers
+(and the model weights, downloaded on first run).
+
+Each profile renders the same scene prompts; the first batch of every profile is a discarded
+warm-up so the numbers reflect a resident, warmed pipeline.
+
+Usage (from the Smart-siksha folder):
+    python benchmarks/bench_image_profiles.py --images 8 --profiles draft final --threads 0
+"""
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+SCENES = [
+    "a plant leaf absorbing sunlight with labelled chloroplasts",
+    "the water cycle over mountains and a lake",
+    "a cross-section of the human heart with arrows for blood flow",
+    "planets of the solar system in orbit around the sun",
+    "a volcano erupting with labelled magma chamber",
+    "a simple electric circuit with a battery, switch and bulb",
+    "the layers of the earth from crust to inner core",
+    "a food chain in a grassland ecosystem",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=8, help="images timed per profile")
+    parser.add_argument("--profiles", nargs="+", default=None, help="default: every profile")
+    parser.add_argument("--threads", type=int, default=None, help="torch CPU threads (0 = one per core)")
+    args = parser.parse_args()
+
+    if args.threads is not None:
+        os.environ["SD_CPU_THREADS"] = str(args.threads)
+    import image_engine
+
+    try:
+        import diffusers  # noqa: F401
+        import torch  # noqa: F401
+    except ImportError as e:
+        sys.exit(f"torch and diffusers are required for this benchmark: {e}")
+
+    engine = image_engine.ImageEngine()
+    profiles = args.profiles or list(image_engine.PROFILES)
+    prompts = [SCENES[i % len(SCENES)] + f", scene {i + 1}, educational illustration" for i in range(args.images)]
+
+    start = time.perf_counter()
+    engine.start(preload=True)
+    list(engine.submit(prompts[:1], profile=profiles[0]).results())
+    stats = engine.stats()
+    print(f"{stats['model']} on {stats['device']}: load {stats['load_ms'] / 1000:.1f} s, "
+          f"warmup {stats['warmup_ms'] / 1000:.1f} s, first image after {time.perf_counter() - start:.1f} s")
+
+    print(f"{'profile':<8}{'size':>10}{'steps':>7}{'batch':>7}{'s/image':>10}{'images/min':>12}")
+    for name in profiles:
+        settings = image_engine.PROFILES[name]
+        batch = settings["batch"]
+        list(engine.submit(prompts[:batch], profile=name).results())   # warm-up for this size and scheduler
+
+        start = time.perf_counter()
+        failed = sum(error is not None for _, _, error in engine.submit(prompts, profile=name).results())
+        elapsed = time.perf_counter() - start
+        done = len(prompts) - failed
+        print(f"{name:<8}{settings['width']:>5}x{settings['height']:<4}{settings['steps']:>7}{batch:>7}"
+              f"{elapsed / max(done, 1):>10.2f}{done / elapsed * 60:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Latency comparison: `ollama run llama3` subprocess vs the pooled HTTP client.
+
+Usage (from the Smart-siksha folder, with `ollama serve` running):
+    python benchmarks/bench_llm_client.py --runs 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_client
+
+
+def run_subprocess(prompt, model):
+    process = subprocess.Popen(
+        ["ollama", "run", model],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    stdout, _ = process.communicate(prompt.encode("utf-8"), timeout=300)
+    return stdout.decode("utf-8", errors="ignore")
+
+
+def run_pooled(prompt, model):
+    return llm_client.generate(prompt, model=model, timeout=300)
+
+
+def measure(label, fn, prompt, model, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(prompt, model)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{label:<12} runs={runs:<3} mean={statistics.mean(timings):8.1f}ms "
+          f"p50={statistics.median(timings):8.1f}ms p95={p95:8.1f}ms")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--model", default=llm_client.DEFAULT_MODEL)
+    parser.add_argument("--prompt", default="Answer in one word: what colour is the sky?")
+    args = parser.parse_args()
+
+    # one untimed call so both paths hit an already-loaded model
+    run_pooled(args.prompt, args.model)
+
+    measure("subprocess", run_subprocess, args.prompt, args.model, args.runs)
+    measure("http-pooled", run_pooled, args.prompt, args.model, args.runs)
+
+
+if __name__ == "__main__":
+    main()
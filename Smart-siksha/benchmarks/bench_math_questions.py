@@ -0,0 +1,106 @@
+"""
+Arithmetic question generator benchmark: the old one-question-at-a-time generator with a
+reject-duplicates loop against math_questions.py's NumPy batches with np.unique de-duplication.
+
+Both produce unique questions that are not in a student's seen set of --seen questions.
+
+Usage (from the Smart-siksha folder):
+    python benchmarks/bench_math_questions.py --counts 10 1000 5000 --seen 500
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import math_questions
+from question_bank import normalize, question_hash
+from seen_questions import SeenSet
+
+
+def legacy_question():
+    """The generator app.py used before math_questions.py (middle school band only)"""
+    op = random.choice(["add", "sub", "mul", "div", "sq", "sqrt"])
+    a = random.randint(2, 20)
+    b = random.randint(2, 20)
+    if op == "add":
+        question, correct = f"What is {a} + {b}?", a + b
+    elif op == "sub":
+        if b > a:
+            a, b = b, a
+        question, correct = f"What is {a} - {b}?", a - b
+    elif op == "mul":
+        question, correct = f"What is {a} × {b}?", a * b
+    elif op == "div":
+        correct = random.randint(2, 12)
+        a = correct * b
+        question = f"What is {a} ÷ {b}?"
+    elif op == "sq":
+        n = random.randint(2, 15)
+        question, correct = f"What is {n}²?", n * n
+    else:
+        n = random.randint(2, 15)
+        question, correct = f"What is the square root of {n * n}?", n
+    distractors = set()
+    for c in [correct - 2, correct - 1, correct + 1, correct + 2, correct + 3, correct - 3]:
+        if c != correct and c >= 0:
+            distractors.add(c)
+        if len(distractors) == 3:
+            break
+    options = [str(correct)] + [str(x) for x in list(distractors)[:3]]
+    random.shuffle(options)
+    return {"question": question, "options": options, "answer_index": options.index(str(correct))}
+
+
+def legacy_unique(count, seen, max_attempts=200):
+    """The old loop: generate, reject repeats, give up after max_attempts per question"""
+    out, taken = [], set()
+    attempts = 0
+    while len(out) < count and attempts < max_attempts * count:
+        attempts += 1
+        q = legacy_question()
+        qt = normalize(q["question"])
+        if qt not in seen and qt not in taken:
+            taken.add(qt)
+            out.append(q)
+    return out
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 1000, 5000])
+    parser.add_argument("--seen", type=int, default=500, help="questions the student has already been shown")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seen = SeenSet(question_hash(normalize(q["question"])) for q in legacy_unique(args.seen, ()))
+    print(f"student has seen {len(seen)} questions (middle school band)")
+    print(f"{'count':>7}{'legacy ms':>12}{'legacy got':>12}{'batched ms':>12}{'batched got':>13}{'speedup':>9}")
+    for count in args.counts:
+        legacy_s, legacy_out = timed(lambda: legacy_unique(count, seen), args.repeat)
+        batched_s, batched_out = timed(
+            lambda: math_questions.unique_questions(count, "middle school", exclude_hashes=seen.hashes), args.repeat)
+        print(f"{count:>7}{legacy_s * 1e3:>12.2f}{len(legacy_out):>12}{batched_s * 1e3:>12.2f}"
+              f"{len(batched_out):>13}{legacy_s / batched_s:>8.1f}x")
+
+    print("\nper class band, 10000 questions, nothing seen:")
+    for band in math_questions.DIFFICULTY_BANDS:
+        elapsed, out = timed(lambda: math_questions.unique_questions(10000, band), args.repeat)
+        print(f"  {band:<14}{elapsed * 1e3:>8.2f} ms  {len(out):>6} unique")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Near-duplicate lookup benchmark: MinHash LSH (near_duplicates.py, question_lsh table) against
+comparing a question with every banked question of its topic.
+
+Seeds a bank of synthetic questions, then looks up reworded copies of banked questions (which
+should be found) and unrelated new questions (which should not). Before timing anything it checks
+is_near_duplicate() on hand-written pairs: short questions that ask different things about the same
+subject must not be flagged, rewordings must be.
+
+Usage (from the Smart-siksha folder):
+    python benchmarks/bench_near_duplicates.py --questions 200000 --topics 20 --lookups 500
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+OPENERS = ["What is", "Which", "Why does", "How does", "What happens when", "Which of these"]
+FILLERS = ["the process of", "the main idea of", "the concept of"]
+# (question, question, should they be near-duplicates?)
+PAIRS = [
+    ("What is photosynthesis?", "What is the process of photosynthesis?", True),
+    ("What is the concept of gravity?", "What is gravity?", True),
+    ("Name the largest planet in the solar system.", "Which is the largest planet in the solar system?", True),
+    ("What is the largest planet in the solar system?", "What is the smallest planet in the solar system?", False),
+    ("How do plants make food?", "How do animals make food?", False),
+    ("Define photosynthesis.", "Give an example of photosynthesis.", False),
+    ("Define photosynthesis.", "What is an example of photosynthesis?", False),
+    ("What is the definition of a mammal?", "What is an example of a mammal?", False),
+    ("What are the types of rocks?", "What is the meaning of rocks?", False),
+    ("What is an igneous rock called?", "What type of rock is igneous?", False),
+    ("Which gas do plants release in photosynthesis?", "What gas is released by plants in photosynthesis?", True),
+    ("What is 12 + 5?", "What is 12 + 6?", False),
+    ("Why does ice float on water?", "Why does ice float on the water?", True),
+]
+
+
+def vocabulary(rng, size):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return sorted({"".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)})
+
+
+def question(rng, words):
+    return f"{rng.choice(OPENERS)} {' '.join(rng.sample(words, 5))}?"
+
+
+def reword(rng, text):
+    """Same content words, different opener and an added filler phrase"""
+    body = text.rstrip("?").split()
+    content = [w for w in body if w.islower() and len(w) > 3 and w not in ("does", "happens", "when", "these")]
+    return f"{rng.choice(OPENERS)} {rng.choice(FILLERS)} {' '.join(content)}?"
+
+
+def seed(quiz_db, near_duplicates, rng, questions, topics, words):
+    rows = []
+    for i in range(questions):
+        topic = f"topic {i % topics}"
+        text = question(rng, words)
+        rows.append((topic, topic, "middle school", text, json.dumps(["a", "b", "c", "d"]), 0, f"{i:016x}"))
+    with quiz_db.get_pool().transaction() as conn:
+        conn.executemany("INSERT INTO question_bank (topic, topic_key, user_class, question, options, "
+                         "answer_index, question_hash) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    start = time.perf_counter()
+    near_duplicates.index_missing()
+    return rows, time.perf_counter() - start
+
+
+def brute_force(quiz_db, near_duplicates, topic_key, text):
+    with quiz_db.get_pool().connection() as conn:
+        rows = conn.execute("SELECT question FROM question_bank WHERE topic_key = ? AND user_class = ?",
+                            (topic_key, "middle school")).fetchall()
+    return any(near_duplicates.is_near_duplicate(text, row[0]) for row in rows)
+
+
+def lsh(quiz_db, near_duplicates, topic_key, text):
+    with quiz_db.get_pool().connection() as conn:
+        return near_duplicates.find_banked(conn, topic_key, "middle school", text) is not None
+
+
+def measure(fn, cases):
+    latencies, found = [], 0
+    for topic_key, text in cases:
+        start = time.perf_counter()
+        found += bool(fn(topic_key, text))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1e3, latencies[int(len(latencies) * 0.95)] * 1e3, found
+
+
+def check_pairs(near_duplicates):
+    wrong = [(a, b, near_duplicates.similarity(a, b)) for a, b, expected in PAIRS
+             if near_duplicates.is_near_duplicate(a, b) != expected]
+    for a, b, sim in wrong:
+        print(f"❌ {a!r} / {b!r}: similarity {sim:.2f} (threshold {near_duplicates.THRESHOLD})")
+    if wrong:
+        sys.exit(f"{len(wrong)} of {len(PAIRS)} question pairs classified wrongly")
+    print(f"✅ {len(PAIRS)} question pairs classified as expected")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=100000)
+    parser.add_argument("--topics", type=int, default=20)
+    parser.add_argument("--lookups", type=int, default=300)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_near_dup_")
+    os.environ["QUIZ_DB_PATH"] = os.path.join(workdir, "quizzes.db")
+    try:
+        real_stdout = sys.stdout
+        sys.stdout = open(os.devnull, "w")
+        try:
+            import quiz_db
+            import near_duplicates
+            quiz_db.migrate()
+            rng = random.Random(3)
+            words = vocabulary(rng, 20000)
+            rows, index_s = seed(quiz_db, near_duplicates, rng, args.questions, args.topics, words)
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+
+        check_pairs(near_duplicates)
+        print(f"{args.questions} banked questions, {args.questions // args.topics} per topic; "
+              f"LSH indexing took {index_s:.1f} s")
+        picks = rng.sample(rows, args.lookups)
+        reworded = [(row[1], reword(rng, row[3])) for row in picks]
+        unrelated = [(row[1], question(rng, words)) for row in picks]
+
+        print(f"{'lookup':<34}{'p50 ms':>9}{'p95 ms':>9}{'found':>9}")
+        for label, fn in (("brute force over the topic", brute_force), ("MinHash LSH", lsh)):
+            for kind, cases in (("reworded", reworded), ("unrelated", unrelated)):
+                p50, p95, found = measure(lambda t, q: fn(quiz_db, near_duplicates, t, q), cases)
+                print(f"{label + ', ' + kind:<34}{p50:>9.3f}{p95:>9.3f}{found:>6}/{len(cases)}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
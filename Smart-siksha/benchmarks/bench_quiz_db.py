@@ -0,0 +1,135 @@
+"""
+Quiz-history query benchmark: the old access pattern (new connection per call, no indexes,
+OFFSET paging, full-table topic aggregates) against quiz_db.py (pooled WAL connections, covering
+indexes, keyset paging, analytics rollups).
+
+Usage (from the Smart-siksha folder):
+    python benchmarks/bench_quiz_db.py --rows 1000000 --users 5000 --queries 200
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import quiz_db
+
+TOPICS = ["Photosynthesis", "Fractions", "Gravity", "World War II", "Python loops", "Cells", "Algebra", "Poetry"]
+
+
+def seed(path, rows, users):
+    """Fill a database at path with rows quiz attempts spread over users, 80% of them completed"""
+    conn = sqlite3.connect(path)
+    for statement in quiz_db.MIGRATIONS[0]:
+        conn.execute(statement)
+    rng = random.Random(42)
+    quiz_json = '{"quiz": []}'
+    batch = []
+    for i in range(rows):
+        completed = rng.random() < 0.8
+        day = i * 86400 // max(1, rows // 365)
+        stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(1_600_000_000 + day + i % 86400))
+        batch.append((
+            f"student{rng.randrange(users)}", rng.choice(TOPICS), "middle school", quiz_json,
+            rng.randint(0, 10) if completed else None, 10 if completed else None,
+            rng.uniform(0, 100) if completed else None, stamp, stamp if completed else None,
+        ))
+        if len(batch) == 50000:
+            conn.executemany("INSERT INTO saved_quizzes (user_name, topic, user_class, quiz_data, score, "
+                             "total_questions, percentage, created_at, completed_at) VALUES (?,?,?,?,?,?,?,?,?)", batch)
+            batch = []
+    if batch:
+        conn.executemany("INSERT INTO saved_quizzes (user_name, topic, user_class, quiz_data, score, "
+                         "total_questions, percentage, created_at, completed_at) VALUES (?,?,?,?,?,?,?,?,?)", batch)
+    conn.commit()
+    conn.close()
+
+
+def legacy_last_quiz(path, user, topic):
+    conn = sqlite3.connect(path)
+    conn.execute("SELECT quiz_data, score, total_questions, percentage, created_at, completed_at FROM saved_quizzes "
+                 "WHERE user_name = ? AND topic = ? ORDER BY created_at DESC LIMIT 1", (user, topic)).fetchone()
+    conn.close()
+
+
+def legacy_page(path, user, page):
+    conn = sqlite3.connect(path)
+    conn.execute("SELECT topic, score, total_questions, percentage, created_at, completed_at FROM saved_quizzes "
+                 "WHERE user_name = ? AND completed_at IS NOT NULL ORDER BY completed_at DESC LIMIT 20 OFFSET ?",
+                 (user, page * 20)).fetchall()
+    conn.close()
+
+
+def legacy_topic_stats(path, topic):
+    """What a per-topic dashboard cost before the rollups: an aggregate over every attempt"""
+    conn = sqlite3.connect(path)
+    conn.execute("SELECT COUNT(*), AVG(percentage), SUM(percentage * percentage), MIN(percentage), MAX(percentage) "
+                 "FROM saved_quizzes WHERE topic = ? AND completed_at IS NOT NULL", (topic,)).fetchone()
+    conn.execute("SELECT CAST(percentage / 10 AS INTEGER), COUNT(*) FROM saved_quizzes "
+                 "WHERE topic = ? AND completed_at IS NOT NULL GROUP BY 1", (topic,)).fetchall()
+    conn.close()
+
+
+def pooled_deep_page(user, pages):
+    cursor = None
+    for _ in range(pages + 1):
+        _, cursor = quiz_db.saved_quizzes(user, limit=20, cursor=cursor)
+        if cursor is None:
+            break
+
+
+def timed(label, fn, calls):
+    start = time.perf_counter()
+    for args in calls:
+        fn(*args)
+    per_call = (time.perf_counter() - start) / len(calls) * 1000
+    print(f"{label:<44}{per_call:>10.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_quiz_db_")
+    legacy_path = os.path.join(workdir, "legacy.db")
+    try:
+        print(f"Seeding {args.rows} rows for {args.users} students...")
+        seed(legacy_path, args.rows, args.users)
+        pooled_path = os.path.join(workdir, "pooled.db")
+        shutil.copy(legacy_path, pooled_path)
+        quiz_db.QUIZ_DB_PATH = pooled_path
+        quiz_db.migrate()
+
+        rng = random.Random(7)
+        calls = [(f"student{rng.randrange(args.users)}", rng.choice(TOPICS)) for _ in range(args.queries)]
+        users = [(user,) for user, _ in calls]
+
+        print(f"{'query':<44}{'per call':>13}")
+        timed("latest quiz, connect per call, no index", lambda u, t: legacy_last_quiz(legacy_path, u, t), calls)
+        timed("latest quiz, pooled + index", quiz_db.last_quiz, calls)
+        timed("history page 1, connect per call, no index", lambda u: legacy_page(legacy_path, u, 0), users)
+        timed("history page 1, pooled + covering index", lambda u: quiz_db.saved_quizzes(u), users)
+        timed("history page 5, OFFSET", lambda u: legacy_page(legacy_path, u, 4), users)
+        timed("history pages 1-5, keyset", lambda u: pooled_deep_page(u, 4), users)
+        topics = [(topic,) for _, topic in calls[:20]]
+        timed("topic analytics, full-table aggregate", lambda t: legacy_topic_stats(legacy_path, t), topics)
+        timed("topic analytics, rollups", quiz_db.topic_analytics, topics)
+
+        with quiz_db.get_pool().connection() as conn:
+            plan = conn.execute("EXPLAIN QUERY PLAN " + quiz_db._SAVED_NEXT_PAGE_SQL, ("student1", "2030", 1, 21)).fetchall()
+        print("keyset page plan:", "; ".join(row[-1] for row in plan))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+End-to-end latency benchmark for every LLM-backed route, run against the mock Ollama server.
+
+No GPU, network or real model is needed: the mock answers with canned text at a
+configurable time-to-first-token and tokens/sec, so the numbers measure our own
+request path (client pool, cache, scheduler, parsing, PDF building, ...).
+
+Usage (from the Smart-siksha folder):
+    python benchmarks/bench_routes.py --requests 50 --concurrency 8 --ttft 0.05 --tps 400
+    python benchmarks/bench_routes.py --routes ask_ai,generate_quiz_stream --json
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(HERE)
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, HERE)
+
+from mock_ollama import start_mock_server
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def build_routes(app_module):
+    """Route name -> (session values, request function(client, i) returning a response)"""
+    base_session = {
+        "user_name": "Bench Student",
+        "user_class": "middle school",
+        "user_interests": "science,sports",
+        "current_topic": "Photosynthesis",
+    }
+
+    def post(path, body):
+        return lambda client, i: client.post(path, json=body(i), buffered=False)
+
+    routes = {
+        "ask_ai": (base_session, post("/ask_ai", lambda i: {"question": f"Why are leaves green? ({i})"})),
+        "ask_ai_stream": (base_session, post("/ask_ai", lambda i: {"question": f"Why are leaves green? ({i})", "stream": True})),
+        "ask_book_question": (base_session, post("/ask_book_question", lambda i: {
+            "question": f"Who is the hero? ({i})", "book_context": "Once upon a time a student learned science."})),
+        "ask_book_question_stream": (base_session, post("/ask_book_question", lambda i: {
+            "question": f"Who is the hero? ({i})", "book_context": "Once upon a time a student learned science.",
+            "stream": True})),
+        "evaluate_paragraph": (base_session, post("/evaluate_paragraph", lambda i: {
+            "question": "Explain photosynthesis.", "text": f"Plants turn light into food ({i})."})),
+        "generate_quiz": (base_session, post("/generate_quiz", lambda i: {"force": True})),
+        "generate_quiz_stream": (base_session, post("/generate_quiz", lambda i: {"force": True, "stream": True})),
+        "get_coding_lesson": (base_session, post("/get_coding_lesson", lambda i: {"topic": f"loops {i}"})),
+        "generate_pdf": (base_session, lambda client, i: _fresh_pdf(client, i)),
+        "image_prompts": (None, lambda client, i: app_module.generate_image_prompts_with_class(
+            f"Photosynthesis {i}", "science", "middle school")),
+        "narration_script": (None, lambda client, i: _narration(app_module, i)),
+    }
+    return routes
+
+
+def _fresh_pdf(client, i):
+    # a new topic each time so the route never short-circuits on an existing PDF
+    with client.session_transaction() as sess:
+        sess["current_topic"] = f"Photosynthesis bench {i} {time.time_ns()}"
+    return client.post("/generate_pdf", json={}, buffered=False)
+
+
+_narration_dir = None
+_narration_lock = threading.Lock()
+
+
+def _narration(app_module, i):
+    global _narration_dir
+    with _narration_lock:
+        if _narration_dir is None:
+            _narration_dir = tempfile.mkdtemp(prefix="bench_images_")
+            for n in range(1, 16):
+                open(os.path.join(_narration_dir, f"image_{n:02d}.png"), "wb").close()
+    return app_module.generate_voice_script_with_class(f"Photosynthesis {i}", "science", "middle school", _narration_dir)
+
+
+def run_route(app_module, name, session_values, call, requests_count, concurrency):
+    latencies, ttfts, errors = [], [], 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def client():
+        c = getattr(local, "client", None)
+        if c is None:
+            c = app_module.app.test_client()
+            if session_values:
+                with c.session_transaction() as sess:
+                    sess.update(session_values)
+            local.client = c
+        return c
+
+    def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        first = None
+        ok = True
+        result = call(client(), i)
+        if hasattr(result, "response"):
+            # drain the body, noting when the first chunk arrived (time-to-first-token for SSE routes)
+            for chunk in result.response:
+                if first is None and chunk:
+                    first = time.perf_counter()
+            result.close()
+            ok = result.status_code < 400
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if first is not None:
+                ttfts.append(first - start)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests_count)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ttfts.sort()
+    return {
+        "route": name,
+        "requests": requests_count,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "ttft_p50_ms": round(percentile(ttfts, 50) * 1000, 1) if ttfts else None,
+        "throughput_rps": round(requests_count / wall, 2) if wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=30, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--ttft", type=float, default=0.05, help="mock time-to-first-token in seconds")
+    parser.add_argument("--tps", type=float, default=400.0, help="mock tokens per second (0 = instant)")
+    parser.add_argument("--routes", default="", help="comma-separated subset of routes")
+    parser.add_argument("--cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    server = start_mock_server(ttft=args.ttft, tps=args.tps)
+    workdir = tempfile.mkdtemp(prefix="bench_routes_")
+
+    # Point the app at the mock and keep every file it writes out of the source tree
+    os.environ["OLLAMA_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["LLM_CACHE_PATH"] = os.path.join(workdir, "llm_cache.db")
+    if not args.cache:
+        os.environ["LLM_CACHE_ENABLED"] = "0"
+    os.chdir(workdir)
+
+    import app as app_module
+    app_module.app.root_path = workdir
+
+    routes = build_routes(app_module)
+    selected = [r.strip() for r in args.routes.split(",") if r.strip()] or list(routes)
+    unknown = [r for r in selected if r not in routes]
+    if unknown:
+        parser.error(f"unknown routes: {', '.join(unknown)} (choose from {', '.join(routes)})")
+
+    # keep route logging and fpdf font warnings out of the report
+    warnings.filterwarnings("ignore")
+    real_stdout = sys.stdout
+    results = []
+    try:
+        for name in selected:
+            session_values, call = routes[name]
+            sys.stdout = open(os.devnull, "w")
+            try:
+                results.append(run_route(app_module, name, session_values, call, args.requests, args.concurrency))
+            finally:
+                sys.stdout.close()
+                sys.stdout = real_stdout
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"mock ttft={args.ttft}s tps={args.tps} requests={args.requests} concurrency={args.concurrency}")
+    print(f"{'route':<26}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ttft p50':>10}{'req/s':>9}")
+    for r in results:
+        ttft = f"{r['ttft_p50_ms']:.1f}" if r["ttft_p50_ms"] is not None else "-"
+        print(f"{r['route']:<26}{r['errors']:>5}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+              f"{r['p99_ms']:>10.1f}{ttft:>10}{r['throughput_rps']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Session backend benchmark: size of the Cookie header each request uploads and request latency,
+for Flask's signed-cookie sessions against the server-side stores in server_session.py.
+
+The session is filled like a real student's: profile, a cached 10-question quiz and a few uploaded books.
+
+Usage (from the Smart-siksha folder):
+    python benchmarks/bench_sessions.py --requests 2000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+
+WORDS = ("plants light energy chlorophyll leaves glucose oxygen carbon dioxide water roots stomata "
+         "sunlight cells membrane enzyme reaction process stage product").split()
+
+
+def student_session():
+    # varied text like real model output, so the cookie backend's zlib compression is not flattered
+    rng = random.Random(1)
+    quiz = [{
+        "question": "Which " + " ".join(rng.choice(WORDS) for _ in range(10)) + "?",
+        "options": [" ".join(rng.choice(WORDS) for _ in range(3)) for _ in range(4)],
+        "answer_index": rng.randrange(4),
+    } for _ in range(10)]
+    return {
+        "user_name": "Bench Student",
+        "user_contact": "9876543210",
+        "user_age": "14",
+        "user_gender": "Female",
+        "user_class": "middle school",
+        "user_interests": "science,sports,music",
+        "current_topic": "Photosynthesis",
+        "quiz_cache": {"topic": "Photosynthesis", "payload": {"quiz": quiz}},
+        "uploaded_books": [{"filename": f"book_{i}.pdf", "filepath": f"/static/uploaded_books/book_{i}.pdf"}
+                           for i in range(5)],
+    }
+
+
+def run(app_module, server_session, backend, requests_count):
+    app = app_module.app
+    app.session_interface = server_session.make_interface(backend)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(student_session())
+    cookie = client.get_cookie("session")
+    cookie_bytes = len(f"session={cookie.value}") if cookie else 0
+
+    latencies = []
+    for _ in range(requests_count):
+        start = time.perf_counter()
+        response = client.get("/get_books")
+        response.get_data()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "backend": backend,
+        "cookie_bytes": cookie_bytes,
+        "p50_us": latencies[len(latencies) // 2] * 1e6,
+        "p95_us": latencies[int(len(latencies) * 0.95)] * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_sessions_")
+    os.chdir(workdir)
+    real_stdout = sys.stdout
+    try:
+        sys.stdout = open(os.devnull, "w")
+        try:
+            import app as app_module
+            import server_session
+            app_module.app.root_path = workdir
+            results = [run(app_module, server_session, backend, args.requests)
+                       for backend in ("cookie", "sqlite", "file")]
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.requests} requests to /get_books per backend")
+    print(f"{'backend':<10}{'cookie bytes':>14}{'p50 us':>10}{'p95 us':>10}")
+    for r in results:
+        print(f"{r['backend']:<10}{r['cookie_bytes']:>14}{r['p50_us']:>10.0f}{r['p95_us']:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Video rendering benchmark: the two ways the video generation frames stage renders its scenes.
+"frames" writes every frame, captioned, through cv2.VideoWriter (write_scene_frames) and re-encodes it
+when the audio is added; "ffmpeg" captions one still per scene and caption (write_scene_stills), encodes
+them once with ffmpeg's concat demuxer (encode_slideshow) and stream-copies them when the audio is added.
+
+Scenes are synthetic 1280x720 images and the narration is a fixed script over a silent track, so no
+model is needed; the app's own caption timing decides where captions change. Both videos are sampled
+at a few timestamps to check they show the same picture. Needs opencv-python and ffmpeg on PATH.
+
+Usage (from the Smart-siksha folder):
+    python benchmarks/bench_video_render.py --scenes 8 --seconds 60 --repeat 3
+"""
+import argparse
+import contextlib
+import io
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+SENTENCES = [
+    "Plants make their own food through a process called photosynthesis.",
+    "Sunlight is captured by chlorophyll inside the chloroplasts of the leaf.",
+    "Water travels up from the roots through tiny tubes called xylem.",
+    "Carbon dioxide enters the leaf through small openings named stomata.",
+    "Inside the chloroplast, light energy splits water molecules apart.",
+    "Oxygen is released into the air as a by-product.",
+    "The energy is stored in glucose, a simple sugar.",
+    "Plants use glucose to grow, and animals eat plants for energy.",
+]
+
+
+def make_scenes(folder, count):
+    import cv2
+    import numpy as np
+    ramp = np.linspace(0, 255, 1280, dtype=np.uint8)
+    for i in range(count):
+        image = np.zeros((720, 1280, 3), dtype=np.uint8)
+        image[:, :, i % 3] = ramp
+        image[:, :, (i + 1) % 3] = 255 - np.linspace(0, 255, 720, dtype=np.uint8)[:, None]
+        cv2.putText(image, f"Scene {i + 1}", (80, 200), cv2.FONT_HERSHEY_SIMPLEX, 4, (255, 255, 255), 8)
+        cv2.imwrite(os.path.join(folder, f"image_{i + 1:02d}.png"), image)
+
+
+def duration(video_file):
+    probe = subprocess.run(["ffmpeg", "-i", video_file], capture_output=True, text=True).stderr
+    match = re.search(r"Duration: (\d+):(\d+):([\d.]+)", probe)
+    return int(match[1]) * 3600 + int(match[2]) * 60 + float(match[3]) if match else None
+
+
+def frame_at(video_file, seconds, fps):
+    """The frame on screen at seconds (a held still has its timestamp before that, so resample to fps first)"""
+    import cv2
+    import numpy as np
+    raw = subprocess.run(["ffmpeg", "-v", "error", "-i", video_file, "-vf", f"fps={fps}", "-ss", f"{seconds:.3f}",
+                          "-frames:v", "1", "-f", "image2pipe", "-c:v", "png", "-"], capture_output=True).stdout
+    return cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR) if raw else None
+
+
+def load_scenes(images_dir, app):
+    paths = sorted(os.path.join(images_dir, name) for name in os.listdir(images_dir) if name.endswith(".png"))
+    return [app.load_scene_image(path) for path in paths[:app.MAX_VIDEO_SCENES]]
+
+
+def render_frames(app, images_dir, video_file, timings, voice_lines, audio_duration):
+    """VIDEO_RENDER_MODE=frames: every frame through cv2.VideoWriter"""
+    import cv2
+    images = load_scenes(images_dir, app)
+    image_frames = app.scene_frame_count(audio_duration, len(images))
+    writer = cv2.VideoWriter(video_file, cv2.VideoWriter_fourcc(*"mp4v"), app.TRANSITION_FPS,
+                             (app.VIDEO_WIDTH, app.VIDEO_HEIGHT))
+    try:
+        for i, image in enumerate(images):
+            app.write_scene_frames(writer, image, i * image_frames, image_frames, timings, voice_lines)
+    finally:
+        writer.release()
+    return True
+
+
+def render_slideshow(app, images_dir, video_file, timings, voice_lines, audio_duration):
+    """VIDEO_RENDER_MODE=ffmpeg: captioned stills, encoded once and cut to the narration"""
+    images = load_scenes(images_dir, app)
+    image_frames = app.scene_frame_count(audio_duration, len(images))
+    stills_dir = os.path.splitext(video_file)[0] + "_stills"
+    os.makedirs(stills_dir, exist_ok=True)
+    try:
+        stills = []
+        for i, image in enumerate(images):
+            stills += app.write_scene_stills(image, stills_dir, i, i * image_frames, image_frames, timings, voice_lines)
+        return app.encode_slideshow(stills, video_file, audio_duration)
+    finally:
+        shutil.rmtree(stills_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenes", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=60.0, help="narration length")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    try:
+        import cv2  # noqa: F401
+    except ImportError as e:
+        sys.exit(f"opencv-python is required for this benchmark: {e}")
+    if not shutil.which("ffmpeg"):
+        sys.exit("ffmpeg must be on PATH for this benchmark")
+
+    import app
+
+    voice_lines = [SENTENCES[i % len(SENTENCES)] for i in range(max(args.scenes, len(SENTENCES)))]
+    timings = app.estimate_sentence_timing_advanced(voice_lines, args.seconds)
+    paths = {
+        "frames": (render_frames, False),
+        "ffmpeg": (render_slideshow, True),
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        images_dir = os.path.join(tmp, "images")
+        os.makedirs(images_dir)
+        make_scenes(images_dir, args.scenes)
+        audio_file = os.path.join(tmp, "narration.wav")
+        subprocess.run(["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "anullsrc=r=22050:cl=mono",
+                        "-t", str(args.seconds), audio_file], check=True)
+        image_frames = app.scene_frame_count(args.seconds, args.scenes)
+        segments = sum(len(app.scene_segments(i * image_frames, image_frames, timings, voice_lines))
+                       for i in range(args.scenes))
+        print(f"{args.scenes} scenes, {args.seconds:.0f}s narration: {args.scenes * image_frames} frames, "
+              f"{segments} (image, caption) segments")
+
+        print(f"{'mode':<8}{'render s':>10}{'mux s':>8}{'total s':>9}{'length s':>10}{'size KB':>9}")
+        finals = {}
+        for mode, (render, copy_video) in paths.items():
+            video_file = os.path.join(tmp, f"{mode}.mp4")
+            finals[mode] = os.path.join(tmp, f"{mode}_final.mp4")
+            render_s, mux_s = [], []
+            for _ in range(args.repeat):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    if not render(app, images_dir, video_file, timings, voice_lines, args.seconds):
+                        sys.exit(f"{mode} rendering failed")
+                    rendered = time.perf_counter()
+                    app.combine_audio_video_advanced(video_file, audio_file, finals[mode], copy_video=copy_video)
+                    render_s.append(rendered - start)
+                    mux_s.append(time.perf_counter() - rendered)
+            render_med, mux_med = statistics.median(render_s), statistics.median(mux_s)
+            print(f"{mode:<8}{render_med:>10.2f}{mux_med:>8.2f}{render_med + mux_med:>9.2f}"
+                  f"{duration(finals[mode]) or 0:>10.2f}{os.path.getsize(finals[mode]) / 1024:>9.0f}")
+
+        # lossy encodes differ slightly, so compare the mean pixel error
+        worst = 0.0
+        for k in range(1, 11):
+            t = args.seconds * k / 11
+            a, b = (frame_at(finals[mode], t, app.TRANSITION_FPS) for mode in paths)
+            if a is None or b is None:
+                sys.exit(f"could not decode a frame at {t:.2f}s")
+            worst = max(worst, float(cv2.absdiff(a, b).mean()))
+        print(f"largest mean pixel difference between the two videos at 10 timestamps: {worst:.2f} / 255")
+
+
+if __name__ == "__main__":
+    main()
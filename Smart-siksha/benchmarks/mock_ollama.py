@@ -0,0 +1,203 @@
+"""
+Offline stand-in for the Ollama HTTP API.
+
+Implements POST /api/generate (streaming and non-streaming) plus GET /api/tags,
+returning deterministic canned answers shaped like what each Smart-Siksha prompt
+expects (quiz JSON, grading JSON, numbered scene lines, plain prose). Quiz questions
+also depend on the request number, so repeated quiz requests get questions the
+student has not seen yet, as they would from a real model.
+Latency is simulated with a fixed time-to-first-token and a tokens/sec rate.
+
+Usage (from the Smart-siksha folder):
+    python benchmarks/mock_ollama.py --port 11434 --ttft 0.2 --tps 40
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def canned_response(prompt, model, request_number=0):
+    """Deterministic answer for a prompt (and, for quizzes, the request number), shaped like the route expects"""
+    seed = int(hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()[:12], 16)
+    rng = random.Random(seed)
+    lower = prompt.lower()
+
+    if "multiple-choice quiz questions" in lower:
+        rng = random.Random(f"{seed}:{request_number}")
+        quiz = []
+        for i in range(10):
+            a, b = rng.randint(2, 999), rng.randint(2, 999)
+            quiz.append({
+                "question": f"Mock question {request_number}.{i + 1}: what is {a} + {b}?",
+                "options": [str(a + b), str(a + b + 1), str(a + b - 1), str(a + b + 2)],
+                "answer_index": 0,
+            })
+        return "```json\n" + json.dumps({"quiz": quiz}, indent=2) + "\n```"
+
+    if "grading a student's short answer" in lower:
+        return json.dumps({
+            "score": rng.randint(0, 10),
+            "correctness": rng.choice(["correct", "partially correct", "incorrect"]),
+            "feedback": "Mock feedback: the answer covers the main idea but misses one detail.",
+            "weak_topics": ["definitions", "examples"],
+        })
+
+    if "grading several students' short answers" in lower:
+        count = len(re.findall(r"^\[\d+\]$", prompt, re.MULTILINE))
+        return json.dumps({"results": [{
+            "id": i,
+            "score": rng.randint(0, 10),
+            "correctness": rng.choice(["correct", "partially correct", "incorrect"]),
+            "feedback": "Mock feedback: the answer covers the main idea but misses one detail.",
+            "weak_topics": ["definitions", "examples"],
+        } for i in range(1, count + 1)]})
+
+    if "image prompts" in lower or "narration sentences" in lower:
+        lines = [
+            f"{i}. Mock scene {i} showing a clear educational illustration of the key concept step {i}"
+            for i in range(1, 16)
+        ]
+        return "\n".join(lines)
+
+    sentences = [
+        "This is a deterministic mock answer from the offline model.",
+        "It has enough words to look like a real explanation for a student.",
+        "Key points are listed clearly so downstream parsing behaves normally.",
+        "Examples connect the topic to everyday life.",
+    ]
+    rng.shuffle(sentences)
+    return " ".join(sentences)
+
+
+def tokenize(text):
+    """Split text into word-sized pieces that keep their trailing whitespace, like model tokens"""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+class MockOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ttft = 0.0
+    tps = 0.0
+    loaded_models = set()
+    request_numbers = itertools.count()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data):
+        line = (json.dumps(data) + "\n").encode("utf-8")
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": f"{m}:latest"} for m in sorted(self.loaded_models)]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+
+        model = body.get("model", "llama3")
+        prompt = body.get("prompt", "")
+        self.loaded_models.add(model)
+        delay = 1.0 / self.tps if self.tps else 0.0
+
+        # An empty prompt only loads the model, as in the real API
+        tokens = tokenize(canned_response(prompt, model, next(self.request_numbers))) if prompt else []
+        # like the real API, the returned context is the previous one plus this turn's tokens
+        prompt_tokens = tokenize(prompt)
+        final = {
+            "model": model, "response": "", "done": True,
+            "prompt_eval_count": len(prompt_tokens), "eval_count": len(tokens),
+            "context": list(body.get("context") or []) + list(range(len(prompt_tokens) + len(tokens))),
+        }
+
+        if not body.get("stream", True):
+            time.sleep(self.ttft + delay * len(tokens))
+            final["response"] = "".join(tokens)
+            self._send_json(200, final)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            time.sleep(self.ttft)
+            for token in tokens:
+                self._write_chunk({"model": model, "response": token, "done": False})
+                if delay:
+                    time.sleep(delay)
+            self._write_chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # client stopped reading, e.g. after enough quiz questions
+            pass
+
+
+class MockOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # pooled clients drop idle keep-alive connections; that is not worth a traceback
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_mock_server(host="127.0.0.1", port=0, ttft=0.0, tps=0.0):
+    """Start the mock server in a daemon thread and return it; server.server_address has the bound port"""
+    handler = type("ConfiguredMockOllamaHandler", (MockOllamaHandler,), {
+        "ttft": ttft, "tps": tps, "loaded_models": set(), "request_numbers": itertools.count(),
+    })
+    server = MockOllamaServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--tps", type=float, default=40.0, help="tokens per second (0 = instant)")
+    args = parser.parse_args()
+
+    server = start_mock_server(args.host, args.port, args.ttft, args.tps)
+    print(f"🧪 Mock Ollama listening on http://{args.host}:{server.server_address[1]} "
+          f"(ttft={args.ttft}s, {args.tps} tok/s)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import os
+import json
+import numpy as np
+
+# -------------------- CLASS GRADING SETTINGS --------------------
+MAX_STUDENTS = int(os.environ.get("CLASS_GRADING_MAX_STUDENTS", "5000"))
+MAX_QUESTIONS = int(os.environ.get("CLASS_GRADING_MAX_QUESTIONS", "500"))
+# Share of the class in the upper and lower groups of the discrimination index (Kelley's 27%)
+GROUP_SHARE = 0.27
+UNANSWERED = -1
+# Accounts (comma-separated user names) allowed to save attempts under other students' names
+TEACHERS = {name.strip() for name in os.environ.get("TEACHERS", "").split(",") if name.strip()}
+
+
+def is_teacher(user_name):
+    return bool(user_name) and user_name in TEACHERS
+
+
+def answer_matrix(answers, questions):
+    """
+    Turn a students x questions list of option indexes into an int array; None means unanswered.
+    Raises ValueError for ragged rows, non-numbers or a width that does not match the quiz.
+    """
+    shape_error = f"answers must be a list of rows with {questions} answers each"
+    try:
+        matrix = np.array(answers, dtype=float)
+    except (TypeError, ValueError):
+        raise ValueError(shape_error)
+    if matrix.ndim != 2 or matrix.shape[1] != questions:
+        raise ValueError(shape_error)
+    if not np.all(np.isnan(matrix) | (np.isfinite(matrix) & (matrix == np.round(matrix)))):
+        raise ValueError("answers must be option indexes")
+    return np.nan_to_num(matrix, nan=UNANSWERED).astype(np.int32)
+
+
+def _rounded(values, digits=3):
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def grade(answers, answer_key, option_count=4):
+    """
+    Grade a whole class at once.
+    answers is a students x questions int array (UNANSWERED for blanks), answer_key the correct
+    option per question. Returns per-student scores and per-question item statistics:
+    difficulty is the share of students answering correctly, discrimination the upper-minus-lower
+    group difference, point_biserial the item / rest-of-test score correlation.
+    """
+    answer_key = np.asarray(answer_key, dtype=np.int32)
+    students, questions = answers.shape
+    correct = answers == answer_key[None, :]
+    scores = correct.sum(axis=1)
+    percentages = scores * (100.0 / questions)
+
+    difficulty = correct.mean(axis=0) if students else np.full(questions, np.nan)
+
+    discrimination = np.full(questions, np.nan)
+    if students >= 2:
+        group = max(1, int(round(students * GROUP_SHARE)))
+        order = np.argsort(scores, kind="stable")
+        discrimination = correct[order[-group:]].mean(axis=0) - correct[order[:group]].mean(axis=0)
+
+    # item vs. rest score, so an item is not correlated with itself
+    items = correct.astype(float)
+    rest = scores[:, None] - items
+    items_c = items - items.mean(axis=0) if students else items
+    rest_c = rest - rest.mean(axis=0) if students else rest
+    denominator = np.sqrt((items_c ** 2).sum(axis=0) * (rest_c ** 2).sum(axis=0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        point_biserial = np.where(denominator > 0, (items_c * rest_c).sum(axis=0) / denominator, np.nan)
+
+    option_counts = np.stack([(answers == k).sum(axis=0) for k in range(option_count)], axis=1)
+    blanks = (answers == UNANSWERED).sum(axis=0)
+
+    return {
+        "scores": scores,
+        "percentages": percentages,
+        "items": [
+            {
+                "question": i,
+                "difficulty": d,
+                "discrimination": disc,
+                "point_biserial": pb,
+                "option_counts": counts,
+                "unanswered": blank,
+            }
+            for i, (d, disc, pb, counts, blank) in enumerate(zip(
+                _rounded(difficulty), _rounded(discrimination), _rounded(point_biserial),
+                option_counts.tolist(), blanks.tolist()))
+        ],
+        "summary": {
+            "students": students,
+            "questions": questions,
+            "mean_percentage": round(float(percentages.mean()), 1) if students else None,
+            "std_percentage": round(float(percentages.std()), 1) if students else None,
+            "median_percentage": round(float(np.median(percentages)), 1) if students else None,
+        },
+    }
+
+
+def quiz_rows(students, topic, user_class, quiz, answers, answer_key, result):
+    """saved_quizzes rows for quiz_db.insert_graded_quizzes, one per student"""
+    answer_key = [int(k) for k in answer_key]
+    total = answers.shape[1]
+    return [
+        (name, topic, user_class, json.dumps({"quiz": quiz, "answer_key": answer_key, "answers": row}),
+         score, total, percentage)
+        for name, row, score, percentage in zip(
+            students, answers.tolist(), result["scores"].tolist(), result["percentages"].tolist())
+    ]
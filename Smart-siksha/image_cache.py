@@ -0,0 +1,91 @@
+import os
+import json
+import shutil
+import hashlib
+import sqlite3
+import threading
+
+from sqlite_lru import LRUStore
+
+# -------------------- IMAGE CACHE SETTINGS --------------------
+IMAGE_CACHE_DIR = os.environ.get("IMAGE_CACHE_DIR", "csv/image_cache")
+IMAGE_CACHE_PATH = os.environ.get("IMAGE_CACHE_PATH", "csv/image_cache.db")
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get("IMAGE_CACHE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+IMAGE_CACHE_ENABLED = os.environ.get("IMAGE_CACHE_ENABLED", "1") != "0"
+
+
+def make_key(fields):
+    """Content hash of everything that decides the pixels: model, prompts, steps, seed, resolution, ..."""
+    blob = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _path(key):
+    return os.path.join(IMAGE_CACHE_DIR, key[:2], f"{key}.png")
+
+
+def _remove(key):
+    """Evicted images lose only the cache's name; videos holding a hard link keep their copy"""
+    try:
+        os.remove(_path(key))
+    except OSError:
+        pass
+
+
+_store = LRUStore(IMAGE_CACHE_PATH, "image_cache", ("fields",), IMAGE_CACHE_MAX_BYTES,
+                  on_evict=_remove, counters=("linked", "copied"))
+
+
+def _link_or_copy(src, dest):
+    """Hard-link src to dest (same inode, no extra disk), copying across filesystems"""
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+        _store.count("linked")
+    except OSError:
+        shutil.copyfile(src, dest)
+        _store.count("copied")
+
+
+def fetch(key, dest):
+    """Put the cached image for key at dest; False on a miss"""
+    if not IMAGE_CACHE_ENABLED:
+        return False
+    path = _path(key)
+    try:
+        if _store.get(key, check=lambda: os.path.exists(path)) is None:
+            return False
+        _link_or_copy(path, dest)
+        return True
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Image cache read failed: {e}")
+        return False
+
+
+def put(key, src, fields=None):
+    """Add a rendered image (a file that will not be rewritten in place) and evict beyond the size budget"""
+    if not IMAGE_CACHE_ENABLED or not os.path.exists(src):
+        return
+    path = _path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        _link_or_copy(src, tmp)
+        os.replace(tmp, path)
+        _store.put(key, os.path.getsize(path), fields=json.dumps(fields or {}, sort_keys=True))
+    except (sqlite3.Error, OSError) as e:
+        print(f"⚠️ Image cache write failed: {e}")
+
+
+def stats():
+    """Store counters plus the cache settings"""
+    result = _store.stats()
+    result["enabled"] = IMAGE_CACHE_ENABLED
+    return result
+
+
+def clear():
+    """Remove every cached image"""
+    _store.clear()
+    shutil.rmtree(IMAGE_CACHE_DIR, ignore_errors=True)
@@ -0,0 +1,305 @@
+import os
+import gc
+import time
+import hashlib
+import queue
+import threading
+from collections import deque
+
+# -------------------- IMAGE ENGINE SETTINGS --------------------
+MODEL_ID = os.environ.get("SD_MODEL", "runwayml/stable-diffusion-v1-5")
+# Load the pipeline when the app starts instead of on the first video
+PRELOAD = os.environ.get("SD_PRELOAD", "0") == "1"
+# Unload the pipeline after this many idle seconds...
+IDLE_UNLOAD = float(os.environ.get("SD_IDLE_UNLOAD", "900"))
+# ...or sooner, once idle for SD_PRESSURE_IDLE seconds, when free memory drops below this many MB
+MIN_FREE_MEMORY_MB = float(os.environ.get("SD_MIN_FREE_MEMORY_MB", "2048"))
+PRESSURE_IDLE = float(os.environ.get("SD_PRESSURE_IDLE", "60"))
+# How often the idle worker checks the two conditions above
+CHECK_INTERVAL = 15
+# Per-image latencies kept for the p50 / p95 in stats()
+LATENCY_WINDOW = 200
+# torch intra-op threads on CPU (0 = one per core)
+CPU_THREADS = int(os.environ.get("SD_CPU_THREADS", "0"))
+
+# -------------------- QUALITY PROFILES --------------------
+# "draft" renders small with few DPM-Solver++ steps and leaves the upscale to resize_to_16_9_advanced;
+# "final" is the original 768x432, 25-step render. batch = prompts per forward pass.
+PROFILES = {
+    "draft": {"width": 512, "height": 288, "steps": 12, "guidance": 7.0, "scheduler": "dpm", "batch": 4},
+    "final": {"width": 768, "height": 432, "steps": 25, "guidance": 7.5, "scheduler": "default", "batch": 2},
+}
+DEFAULT_PROFILE = os.environ.get("SD_PROFILE", "final")
+NEGATIVE_PROMPT = "blurry, low quality, distorted, ugly, bad anatomy, text, watermark, signature"
+
+
+class ImageEngineUnavailable(Exception):
+    """Raised for a job when the pipeline (or torch / diffusers) cannot be loaded"""
+
+
+def available_memory_mb():
+    """MemAvailable from /proc/meminfo, or None where that does not exist"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def prompt_seed(prompt):
+    """Deterministic seed for a prompt, so the same scene renders the same image every time"""
+    return int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:4], "big") & 0x7FFFFFFF
+
+
+class ImageJob:
+    """Prompts waiting for the engine; results() yields (index, image or None, error or None) as they finish"""
+
+    def __init__(self, prompts, profile, negative_prompt, seeds):
+        self.prompts = list(prompts)
+        self.profile = profile
+        self.negative_prompt = negative_prompt
+        self.seeds = list(seeds) if seeds is not None else [prompt_seed(p) for p in self.prompts]
+        self.submitted_at = time.perf_counter()
+        self._results = queue.Queue()
+
+    def put(self, index, image=None, error=None):
+        self._results.put((index, image, error))
+
+    def fail(self, error):
+        self._results.put((None, None, error))
+
+    def results(self):
+        for _ in range(len(self.prompts)):
+            index, image, error = self._results.get()
+            if index is None:
+                raise error
+            yield index, image, error
+
+
+class ImageEngine:
+    """
+    One resident Stable Diffusion pipeline per process, owned by a single worker thread.
+    Jobs run in submission order; the pipeline is loaded (and warmed with a one-step dummy
+    inference) on the first job or at start(), and unloaded when idle.
+    """
+
+    def __init__(self, model_id=MODEL_ID, idle_unload=IDLE_UNLOAD):
+        self.model_id = model_id
+        self.idle_unload = idle_unload
+        self.pipe = None
+        self.device = None
+        self.state = "unloaded"
+        self.last_error = None
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._busy = False
+        self._last_used = time.monotonic()
+        self._schedulers = {}
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counts = {"loads": 0, "unloads": 0, "jobs": 0, "images": 0, "failed_images": 0}
+        self._profile_totals = {name: [0, 0.0] for name in PROFILES}   # profile -> [images, seconds]
+        self._load_ms = None
+        self._warmup_ms = None
+
+    # ---- worker ----
+
+    def start(self, preload=False):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="image-engine", daemon=True)
+                self._worker.start()
+        if preload:
+            self._jobs.put(None)   # a None job only loads the pipeline
+
+    def _run(self):
+        while True:
+            try:
+                job = self._jobs.get(timeout=CHECK_INTERVAL)
+            except queue.Empty:
+                self._maybe_unload()
+                continue
+            self._busy = True
+            try:
+                self._ensure_loaded()
+                if job is not None:
+                    self._process(job)
+            except ImageEngineUnavailable as e:
+                if job is not None:
+                    job.fail(e)
+            finally:
+                self._busy = False
+                self._last_used = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self.pipe is not None:
+            return
+        try:
+            from diffusers import StableDiffusionPipeline, DPMSolverMultistepScheduler
+            import torch
+        except ImportError as e:
+            self.state, self.last_error = "failed", str(e)
+            print(f"❌ Required libraries not installed: {e}")
+            print("👉 Please install: pip install diffusers torch transformers accelerate opencv-python")
+            raise ImageEngineUnavailable(str(e))
+
+        self.state = "loading"
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        dtype = torch.float16 if device == "cuda" else torch.float32
+        print(f"🎨 Loading {self.model_id} on {device} ({dtype})...")
+        start = time.perf_counter()
+        try:
+            # No device_map="auto" (avoids the meta tensor issue)
+            pipe = StableDiffusionPipeline.from_pretrained(self.model_id, torch_dtype=dtype, safety_checker=None)
+            pipe = pipe.to(device)
+            if device == "cuda":
+                # Reduce VRAM usage
+                pipe.enable_attention_slicing()
+            else:
+                torch.set_num_threads(CPU_THREADS or os.cpu_count() or 1)
+                # NHWC convolutions are the faster layout for oneDNN on CPU
+                pipe.unet.to(memory_format=torch.channels_last)
+                pipe.vae.to(memory_format=torch.channels_last)
+            pipe.set_progress_bar_config(disable=True)
+            self._schedulers = {
+                "default": pipe.scheduler,
+                "dpm": DPMSolverMultistepScheduler.from_config(pipe.scheduler.config, algorithm_type="dpmsolver++"),
+            }
+            loaded = time.perf_counter()
+            # one dummy step allocates the buffers and picks the kernels before a student's job arrives
+            with torch.inference_mode():
+                pipe("warmup", num_inference_steps=1, width=256, height=256, guidance_scale=1.0)
+        except Exception as e:
+            self.state, self.last_error = "failed", str(e)
+            print(f"❌ Failed to load Stable Diffusion model: {e}")
+            raise ImageEngineUnavailable(str(e))
+
+        self.pipe, self.device = pipe, device
+        self._load_ms = (loaded - start) * 1000
+        self._warmup_ms = (time.perf_counter() - loaded) * 1000
+        self._counts["loads"] += 1
+        self.state, self.last_error = "ready", None
+        print(f"✅ Stable Diffusion ready (load {self._load_ms / 1000:.1f}s, warmup {self._warmup_ms / 1000:.1f}s)")
+
+    def _render(self, profile, prompts, negative_prompt, seeds):
+        """One forward pass over a batch of prompts"""
+        import torch
+        settings = PROFILES[profile]
+        self.pipe.scheduler = self._schedulers[settings["scheduler"]]
+        generators = [torch.Generator(device="cpu").manual_seed(seed) for seed in seeds]
+        with torch.inference_mode():
+            return self.pipe(
+                prompts,
+                negative_prompt=[negative_prompt] * len(prompts),
+                num_inference_steps=settings["steps"],
+                guidance_scale=settings["guidance"],
+                width=settings["width"],
+                height=settings["height"],
+                generator=generators,
+            ).images
+
+    def _process(self, job):
+        self._counts["jobs"] += 1
+        size = PROFILES[job.profile]["batch"]
+        for first in range(0, len(job.prompts), size):
+            indexes = range(first, min(first + size, len(job.prompts)))
+            start = time.perf_counter()
+            try:
+                images = self._render(job.profile, [job.prompts[i] for i in indexes], job.negative_prompt,
+                                      [job.seeds[i] for i in indexes])
+            except Exception as e:
+                self._counts["failed_images"] += len(indexes)
+                for index in indexes:
+                    job.put(index, error=e)
+                continue
+            elapsed = time.perf_counter() - start
+            self._latencies.extend([elapsed / len(indexes)] * len(indexes))
+            self._counts["images"] += len(indexes)
+            totals = self._profile_totals[job.profile]
+            totals[0] += len(indexes)
+            totals[1] += elapsed
+            for index, image in zip(indexes, images):
+                job.put(index, image=image)
+        if self.device == "cuda":
+            import torch
+            torch.cuda.empty_cache()
+
+    def _maybe_unload(self):
+        if self.pipe is None or self._busy or not self._jobs.empty():
+            return
+        idle = time.monotonic() - self._last_used
+        free_mb = available_memory_mb()
+        if idle >= self.idle_unload:
+            self.unload(f"idle for {idle:.0f}s")
+        elif free_mb is not None and free_mb < MIN_FREE_MEMORY_MB and idle >= PRESSURE_IDLE:
+            self.unload(f"only {free_mb:.0f} MB free")
+
+    def unload(self, reason):
+        """Drop the pipeline; the next job loads it again. Only called from the worker thread"""
+        device, self.pipe, self._schedulers = self.device, None, {}
+        gc.collect()
+        if device == "cuda":
+            import torch
+            torch.cuda.empty_cache()
+        self.state = "unloaded"
+        self._counts["unloads"] += 1
+        print(f"💤 Unloaded Stable Diffusion ({reason})")
+
+    # ---- callers ----
+
+    def render_fields(self, prompt, profile=None, negative_prompt=NEGATIVE_PROMPT, seed=None):
+        """Everything that decides the pixels submit() renders for a prompt (image_cache keys)"""
+        settings = PROFILES[profile or DEFAULT_PROFILE]
+        return {
+            "model": self.model_id,
+            "prompt": prompt,
+            "negative_prompt": negative_prompt,
+            "seed": prompt_seed(prompt) if seed is None else seed,
+            "steps": settings["steps"],
+            "guidance": settings["guidance"],
+            "scheduler": settings["scheduler"],
+            "width": settings["width"],
+            "height": settings["height"],
+        }
+
+    def submit(self, prompts, profile=None, negative_prompt=NEGATIVE_PROMPT, seeds=None):
+        """Queue prompts to render with a quality profile; seeds default to prompt_seed() of each prompt"""
+        profile = profile or DEFAULT_PROFILE
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown image profile {profile!r}, expected one of {', '.join(PROFILES)}")
+        self.start()
+        job = ImageJob(prompts, profile, negative_prompt, seeds)
+        self._jobs.put(job)
+        return job
+
+    def stats(self):
+        latencies = sorted(self._latencies)
+
+        def pct(p):
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1) if latencies else None
+
+        return {
+            "model": self.model_id,
+            "state": self.state,
+            "device": self.device,
+            "queued_jobs": self._jobs.qsize(),
+            "busy": self._busy,
+            "load_ms": round(self._load_ms, 1) if self._load_ms is not None else None,
+            "warmup_ms": round(self._warmup_ms, 1) if self._warmup_ms is not None else None,
+            "image_p50_ms": pct(0.5),
+            "image_p95_ms": pct(0.95),
+            "idle_s": round(time.monotonic() - self._last_used, 1),
+            "available_memory_mb": available_memory_mb(),
+            "last_error": self.last_error,
+            "images_per_minute": {
+                name: round(images / seconds * 60, 2) for name, (images, seconds) in self._profile_totals.items()
+                if seconds
+            },
+            **self._counts,
+        }
+
+
+engine = ImageEngine()
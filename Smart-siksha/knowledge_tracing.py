@@ -0,0 +1,234 @@
+import os
+import json
+import math
+import time
+import quiz_db
+
+# -------------------- KNOWLEDGE TRACING SETTINGS --------------------
+# Elo-style Rasch model: P(correct) = sigmoid(ability - difficulty). Each response moves the student's
+# ability on the topic and the question's difficulty by K * (outcome - P), with K = ELO_A / (1 + ELO_B * n)
+# shrinking as the student or question collects responses.
+ELO_A = float(os.environ.get("MASTERY_ELO_A", "0.8"))
+ELO_B = float(os.environ.get("MASTERY_ELO_B", "0.05"))
+# Difficulty assumed for a weak topic named by the grader (only ones that are quiz topics count),
+# where there is no question to rate
+WEAK_TOPIC_DIFFICULTY = 0.0
+# Mastery below 50% -> simpler video, below 80% -> revision quiz, otherwise challenge questions
+VIDEO_BELOW = 0.5
+REVISION_BELOW = 0.8
+RECOMMENDATIONS = int(os.environ.get("MASTERY_RECOMMENDATIONS", "5"))
+# Quizzes replayed per backfill transaction; live quiz submissions only wait for one chunk
+BACKFILL_CHUNK = int(os.environ.get("MASTERY_BACKFILL_CHUNK", "500"))
+
+_MASTERY_SQL = "SELECT ability, attempts FROM topic_mastery WHERE user_name = ? AND topic_key = ?"
+_SAVE_MASTERY_SQL = '''
+    INSERT INTO topic_mastery (user_name, topic_key, topic, ability, attempts, correct, updated_at)
+    VALUES (:user_name, :topic_key, :topic, :ability, :attempts, :correct, :updated_at)
+    ON CONFLICT (user_name, topic_key) DO UPDATE SET
+        topic = excluded.topic,
+        ability = excluded.ability,
+        attempts = excluded.attempts,
+        correct = topic_mastery.correct + :correct,
+        updated_at = excluded.updated_at
+'''
+_SAVE_ITEM_SQL = '''
+    INSERT INTO item_difficulty (item_key, difficulty, attempts) VALUES (?, ?, ?)
+    ON CONFLICT (item_key) DO UPDATE SET difficulty = excluded.difficulty, attempts = excluded.attempts
+'''
+_USER_MASTERY_SQL = '''
+    SELECT topic, ability, attempts, correct, updated_at FROM topic_mastery WHERE user_name = ?
+'''
+_SAVE_RECOMMENDATIONS_SQL = '''
+    INSERT OR REPLACE INTO user_recommendations (user_name, recommendations, updated_at) VALUES (?, ?, ?)
+'''
+_RECOMMENDATIONS_SQL = "SELECT recommendations FROM user_recommendations WHERE user_name = ?"
+# topics someone has completed a quiz on (analytics rollups), to match the grader's weak topics against
+_QUIZ_TOPIC_SQL = "SELECT topic FROM topic_rollups WHERE topic_key = ?"
+_UNRANKED_USERS_SQL = '''
+    SELECT DISTINCT user_name FROM topic_mastery
+    WHERE user_name NOT IN (SELECT user_name FROM user_recommendations)
+'''
+# the next chunk of queued history, each student's quizzes in the order they were completed
+_BACKFILL_SQL = '''
+    SELECT s.id, s.user_name, s.topic, s.score, s.total_questions
+    FROM mastery_backfill b
+    JOIN saved_quizzes s ON s.id = b.quiz_id
+    ORDER BY s.user_name, s.completed_at, s.id
+    LIMIT ?
+'''
+# one student's queued history, replayed before their next live update so ratings see it in order
+_USER_BACKFILL_SQL = '''
+    SELECT s.id, s.user_name, s.topic, s.score, s.total_questions
+    FROM mastery_backfill b
+    JOIN saved_quizzes s ON s.id = b.quiz_id
+    WHERE s.user_name = ?
+    ORDER BY s.completed_at, s.id
+'''
+
+
+def topic_key(topic):
+    """Same key as the analytics rollups"""
+    return (topic or "").strip().lower()
+
+
+def probability(ability, difficulty=0.0):
+    return 1.0 / (1.0 + math.exp(difficulty - ability))
+
+
+def step(attempts):
+    """Elo K for something that has seen `attempts` responses"""
+    return ELO_A / (1.0 + ELO_B * attempts)
+
+
+def recommendation(mastery, topic):
+    """What to do next for a topic at this mastery (0-1)"""
+    if mastery < VIDEO_BELOW:
+        return "video", f"Recommend simpler video for {topic}"
+    elif mastery < REVISION_BELOW:
+        return "revision_quiz", f"Recommend revision quiz for {topic}"
+    else:
+        return "challenge", f"Recommend challenge questions for {topic}"
+
+
+def _load_items(conn, item_keys):
+    if not item_keys:
+        return {}
+    placeholders = ", ".join("?" * len(item_keys))
+    rows = conn.execute(f"SELECT item_key, difficulty, attempts FROM item_difficulty "
+                        f"WHERE item_key IN ({placeholders})", list(item_keys)).fetchall()
+    return {key: (difficulty, attempts) for key, difficulty, attempts in rows}
+
+
+def _update(conn, user_name, topic, responses, items=None):
+    """
+    Fold (item_key or None, outcome 0-1) responses for one topic into the student's ability and the
+    items' difficulties, inside the caller's transaction. Touches one mastery row and one row per item.
+    """
+    key = topic_key(topic)
+    if not key or not responses:
+        return
+    row = conn.execute(_MASTERY_SQL, (user_name, key)).fetchone()
+    ability, attempts = row if row else (0.0, 0)
+    items = _load_items(conn, {item for item, _ in responses if item}) if items is None else items
+    changed = {}
+    correct = 0
+    for item, outcome in responses:
+        difficulty, item_attempts = items.get(item, (WEAK_TOPIC_DIFFICULTY, 0))
+        surprise = outcome - probability(ability, difficulty)
+        ability += step(attempts) * surprise
+        attempts += 1
+        correct += outcome >= 1
+        if item:
+            items[item] = changed[item] = (difficulty - step(item_attempts) * surprise, item_attempts + 1)
+    conn.execute(_SAVE_MASTERY_SQL, {"user_name": user_name, "topic_key": key, "topic": topic.strip(),
+                                     "ability": ability, "attempts": attempts, "correct": int(correct),
+                                     "updated_at": time.time()})
+    if changed:
+        conn.executemany(_SAVE_ITEM_SQL, [(item, d, n) for item, (d, n) in changed.items()])
+
+
+def _refresh_recommendations(conn, user_name):
+    """Rank the student's topics (weakest first) and store them for the home page"""
+    topics = []
+    for topic, ability, attempts, correct, updated_at in conn.execute(_USER_MASTERY_SQL, (user_name,)):
+        mastery = probability(ability)
+        action, text = recommendation(mastery, topic)
+        topics.append({"topic": topic, "mastery": round(mastery, 3), "attempts": attempts,
+                       "correct": correct, "action": action, "recommendation": text, "updated_at": updated_at})
+    # weakest topics first; among equals the one practised most recently
+    topics.sort(key=lambda t: (t["mastery"], -t["updated_at"]))
+    conn.execute(_SAVE_RECOMMENDATIONS_SQL, (user_name, json.dumps(topics[:RECOMMENDATIONS]), time.time()))
+
+
+def _replay(conn, rows):
+    """Fold queued (quiz_id, user_name, topic, score, total) history into the model and dequeue it"""
+    for quiz_id, user_name, topic, score, total in rows:
+        # per-question answers were not kept: replay score right answers spread evenly among the wrong ones
+        score = max(0, min(int(score or 0), total))
+        outcomes = [float((i + 1) * score // total - i * score // total) for i in range(total)]
+        _update(conn, user_name, topic, [(None, outcome) for outcome in outcomes], items={})
+    conn.executemany("DELETE FROM mastery_backfill WHERE quiz_id = ?", [(row[0],) for row in rows])
+
+
+def _catch_up(conn, user_name):
+    """Replay the student's history still queued for backfill, so a live update never comes before it"""
+    rows = conn.execute(_USER_BACKFILL_SQL, (user_name,)).fetchall()
+    if rows:
+        _replay(conn, rows)
+
+
+def record_quiz(user_name, topic, responses):
+    """A submitted quiz: responses are (question_key, correct) pairs"""
+    with quiz_db.get_pool().transaction() as conn:
+        _catch_up(conn, user_name)
+        _update(conn, user_name, topic, [(item, 1.0 if correct else 0.0) for item, correct in responses])
+        _refresh_recommendations(conn, user_name)
+
+
+def record_answer(user_name, topic, question_key, score, weak_topics=()):
+    """
+    A graded short answer: score 0-10 counts as partial credit; each weak topic that names a quiz topic
+    as a missed question. Other weak topics are free text ("definitions", "examples") and are skipped.
+    """
+    with quiz_db.get_pool().transaction() as conn:
+        _catch_up(conn, user_name)
+        _update(conn, user_name, topic, [(question_key, max(0.0, min(1.0, score / 10)))])
+        for key in dict.fromkeys(topic_key(str(t)) for t in weak_topics or ()):
+            if not key or key == topic_key(topic):
+                continue
+            row = conn.execute(_QUIZ_TOPIC_SQL, (key,)).fetchone()
+            if row:
+                _update(conn, user_name, row[0], [(None, 0.0)])
+        _refresh_recommendations(conn, user_name)
+
+
+def recommendations(user_name):
+    """The stored recommendations for a student (weakest topic first), [] before their first quiz"""
+    with quiz_db.get_pool().connection() as conn:
+        row = conn.execute(_RECOMMENDATIONS_SQL, (user_name,)).fetchone()
+    return json.loads(row[0]) if row else []
+
+
+def mastery(user_name):
+    """Every topic the student has been traced on"""
+    with quiz_db.get_pool().connection() as conn:
+        rows = conn.execute(_USER_MASTERY_SQL, (user_name,)).fetchall()
+    return [{"topic": topic, "mastery": round(probability(ability), 3), "ability": round(ability, 3),
+             "attempts": attempts, "correct": correct}
+            for topic, ability, attempts, correct, _ in sorted(rows, key=lambda r: r[1])]
+
+
+def backfill():
+    """
+    Replay completed quizzes saved before knowledge tracing existed (queued by quiz_db migration 10).
+    Each chunk of BACKFILL_CHUNK quizzes is its own transaction that also dequeues them, so live
+    submissions are never held for long and an interrupted replay resumes where it stopped. A student's
+    live update first replays whatever of their history is still queued (_catch_up), so ratings always
+    see a student's quizzes in the order they were taken.
+    Students left without stored recommendations (migration 11) get them rebuilt afterwards.
+    """
+    replayed = 0
+    users = set()
+    while True:
+        with quiz_db.get_pool().transaction() as conn:
+            rows = conn.execute(_BACKFILL_SQL, (BACKFILL_CHUNK,)).fetchall()
+            if not rows:
+                # queued ids whose quiz row is gone
+                conn.execute("DELETE FROM mastery_backfill")
+                break
+            _replay(conn, rows)
+            chunk_users = {row[1] for row in rows}
+            for user_name in chunk_users:
+                _refresh_recommendations(conn, user_name)
+        replayed += len(rows)
+        users |= chunk_users
+    # students whose recommendations a migration cleared
+    with quiz_db.get_pool().connection() as conn:
+        unranked = [row[0] for row in conn.execute(_UNRANKED_USERS_SQL).fetchall()]
+    for first in range(0, len(unranked), BACKFILL_CHUNK):
+        with quiz_db.get_pool().transaction() as conn:
+            for user_name in unranked[first:first + BACKFILL_CHUNK]:
+                _refresh_recommendations(conn, user_name)
+    if replayed:
+        print(f"🧠 Knowledge tracing backfilled from {replayed} quizzes of {len(users)} students")
+    return replayed
@@ -0,0 +1,242 @@
+import os
+import time
+import threading
+from collections import deque
+import llm_client
+
+# -------------------- BREAKER SETTINGS --------------------
+# Number of recent model calls each route judges its SLO on
+WINDOW = int(os.environ.get("LLM_BREAKER_WINDOW", "20"))
+# Calls needed in the window before the breaker may trip
+MIN_CALLS = int(os.environ.get("LLM_BREAKER_MIN_CALLS", "5"))
+MAX_ERROR_RATE = float(os.environ.get("LLM_BREAKER_MAX_ERROR_RATE", "0.5"))
+# Seconds an open breaker serves fallbacks before letting one trial call through
+COOLDOWN = float(os.environ.get("LLM_BREAKER_COOLDOWN", "30"))
+
+CLOSED = "closed"        # model calls go through
+OPEN = "open"            # SLO breached: callers get CircuitOpen and serve their fallback
+HALF_OPEN = "half_open"  # one trial call decides whether to close again
+
+_breakers = {}
+_registry_lock = threading.Lock()
+
+
+class CircuitOpen(llm_client.LLMTimeout):
+    """Raised instead of calling a model whose route is breaching its latency SLO"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class HedgeTimeout(llm_client.LLMTimeout):
+    """Raised when a hedged call misses its deadline; the model call keeps running in the background"""
+
+
+class CircuitBreaker:
+    """
+    Tracks latency and errors of the last WINDOW model calls for one route.
+    Trips open when their p95 latency exceeds slo_ms or the error rate exceeds MAX_ERROR_RATE,
+    then fails fast for COOLDOWN seconds so the route serves its fallback while the model recovers.
+    With hedge_ms set, a call that has not answered by then raises HedgeTimeout instead of
+    holding the request; the late answer still lands in llm_cache for the next student.
+    """
+
+    def __init__(self, name, slo_ms, hedge_ms=0, window=WINDOW, min_calls=MIN_CALLS,
+                 max_error_rate=MAX_ERROR_RATE, cooldown=COOLDOWN):
+        self.name = name
+        self.slo_ms = slo_ms
+        self.hedge_ms = hedge_ms
+        self.min_calls = min_calls
+        self.max_error_rate = max_error_rate
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)  # (latency_ms, ok)
+        self._state = CLOSED
+        self._opened_at = None
+        self._trial_running = False
+        self.trips = 0
+        self.short_circuited = 0
+        self.hedged = 0
+
+    # ---- state ----
+    def allow(self):
+        """True when a model call may go ahead; after the cooldown only one trial call is let through"""
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.time() - self._opened_at < self.cooldown:
+                return False
+            if self._trial_running:
+                return False
+            self._state = HALF_OPEN
+            self._trial_running = True
+            return True
+
+    def is_open(self):
+        """Like allow() but never claims the trial call; for paths that do not report back"""
+        with self._lock:
+            if self._state == OPEN:
+                return time.time() - self._opened_at < self.cooldown
+            return self._state == HALF_OPEN
+
+    def retry_after(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 1
+            return max(1, int(self.cooldown - (time.time() - self._opened_at)) + 1)
+
+    def _open(self, reason):
+        self._state = OPEN
+        self._opened_at = time.time()
+        self.trips += 1
+        print(f"🚨 {self.name} breaker open ({reason}), serving fallbacks for {self.cooldown:.0f}s")
+
+    def _breach(self):
+        if len(self._samples) < self.min_calls:
+            return None
+        errors = sum(1 for _, ok in self._samples if not ok)
+        error_rate = errors / len(self._samples)
+        if error_rate > self.max_error_rate:
+            return f"error rate {error_rate:.0%}"
+        p95 = self._p95()
+        if p95 is not None and p95 > self.slo_ms:
+            return f"p95 {p95:.0f}ms > SLO {self.slo_ms:.0f}ms"
+        return None
+
+    def _p95(self):
+        latencies = sorted(latency for latency, ok in self._samples if ok)
+        if not latencies:
+            return None
+        return latencies[int(round(0.95 * (len(latencies) - 1)))]
+
+    def record(self, latency_ms, ok):
+        """Add one finished model call and move the breaker between states"""
+        with self._lock:
+            self._samples.append((latency_ms, ok))
+            if self._state == HALF_OPEN and self._trial_running:
+                self._trial_running = False
+                if ok and latency_ms <= self.slo_ms:
+                    self._state = CLOSED
+                    self._opened_at = None
+                    self._samples.clear()
+                    print(f"✅ {self.name} breaker closed, model answered in {latency_ms:.0f}ms")
+                else:
+                    self._open("trial call failed" if not ok else f"trial call took {latency_ms:.0f}ms")
+            elif self._state == CLOSED:
+                reason = self._breach()
+                if reason:
+                    self._open(reason)
+
+    def release(self):
+        """An allowed call that never reached the model (queue full) or was abandoned: it says nothing about latency"""
+        with self._lock:
+            if self._state == HALF_OPEN and self._trial_running:
+                self._trial_running = False
+                self._state = OPEN
+
+    # ---- calls ----
+    def call(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) through the breaker, timing the whole call.
+        Raises CircuitOpen while the breaker is open and HedgeTimeout when hedge_ms passes first.
+        """
+        return self.guard(self.timed, fn, *args, **kwargs)
+
+    def guard(self, fn, *args, **kwargs):
+        """
+        call() without the timing, for a fn that times only its model request with timed()
+        (not the scheduler queue before it). An allowed trial call fn never timed is released.
+        """
+        if not self.allow():
+            with self._lock:
+                self.short_circuited += 1
+            raise CircuitOpen(f"{self.name} is over its latency SLO, using fallback", self.retry_after())
+        with self._lock:
+            trial = self._state == HALF_OPEN
+
+        def untimed_trial():
+            if trial:
+                self.release()
+
+        if not self.hedge_ms:
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                untimed_trial()
+
+        done = threading.Event()
+        outcome = {}
+
+        def run():
+            try:
+                outcome["result"] = fn(*args, **kwargs)
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                untimed_trial()
+                done.set()
+
+        threading.Thread(target=run, daemon=True).start()
+        if not done.wait(self.hedge_ms / 1000.0):
+            with self._lock:
+                self.hedged += 1
+            raise HedgeTimeout(f"{self.name} missed its {self.hedge_ms:.0f}ms deadline, using fallback")
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["result"]
+
+    def timed(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) and record its latency and outcome"""
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except llm_client.LLMQueueFull:
+            self.release()
+            raise
+        except Exception:
+            self.record((time.perf_counter() - start) * 1000, False)
+            raise
+        self.record((time.perf_counter() - start) * 1000, True)
+        return result
+
+    def stats(self):
+        with self._lock:
+            samples = list(self._samples)
+            state = self._state
+            p95 = self._p95()
+        errors = sum(1 for _, ok in samples if not ok)
+        return {
+            "state": state,
+            "slo_ms": self.slo_ms,
+            "hedge_ms": self.hedge_ms,
+            "calls_in_window": len(samples),
+            "p95_ms": round(p95, 1) if p95 is not None else None,
+            "error_rate": round(errors / len(samples), 3) if samples else 0.0,
+            "trips": self.trips,
+            "short_circuited": self.short_circuited,
+            "hedged": self.hedged,
+        }
+
+
+def get(name, slo_ms, hedge_ms=0):
+    """
+    Return the breaker for a route, creating it on first use.
+    LLM_SLO_<NAME>_MS and LLM_HEDGE_<NAME>_MS override the defaults, e.g. LLM_HEDGE_GENERATE_QUIZ_MS=8000.
+    """
+    with _registry_lock:
+        if name not in _breakers:
+            env = name.upper()
+            _breakers[name] = CircuitBreaker(
+                name,
+                slo_ms=float(os.environ.get(f"LLM_SLO_{env}_MS", slo_ms)),
+                hedge_ms=float(os.environ.get(f"LLM_HEDGE_{env}_MS", hedge_ms)),
+            )
+        return _breakers[name]
+
+
+def stats():
+    """State and rolling latency/error numbers of every breaker, for /llm_breaker_stats"""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {b.name: b.stats() for b in breakers}
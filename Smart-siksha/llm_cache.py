@@ -0,0 +1,65 @@
+import os
+import json
+import hashlib
+import sqlite3
+
+from sqlite_lru import LRUStore
+
+# -------------------- CACHE SETTINGS --------------------
+LLM_CACHE_PATH = os.environ.get("LLM_CACHE_PATH", "csv/llm_cache.db")
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(7 * 24 * 3600)))   # seconds
+LLM_CACHE_MAX_BYTES = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") != "0"
+
+# Payload fields that change how a request is served but not what the model writes
+_NON_KEY_FIELDS = ("stream", "keep_alive")
+
+_store = LRUStore(LLM_CACHE_PATH, "llm_cache", ("model", "response"), LLM_CACHE_MAX_BYTES, ttl=LLM_CACHE_TTL)
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so indentation differences in prompt templates share one entry"""
+    return " ".join((prompt or "").split())
+
+
+def make_key(payload):
+    """Content hash of the normalized prompt, model and sampling parameters"""
+    keyed = {k: v for k, v in payload.items() if k not in _NON_KEY_FIELDS}
+    keyed["prompt"] = normalize_prompt(keyed.get("prompt", ""))
+    blob = json.dumps(keyed, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def get(key):
+    """Return the cached response for key, or None on a miss or expired entry"""
+    if not LLM_CACHE_ENABLED:
+        return None
+    try:
+        row = _store.get(key, ("response",))
+        return row[0] if row else None
+    except sqlite3.Error as e:
+        print(f"⚠️ LLM cache read failed: {e}")
+        return None
+
+
+def put(key, model, response):
+    """Store a response and evict least-recently-used entries beyond the size budget"""
+    if not LLM_CACHE_ENABLED or not response:
+        return
+    try:
+        _store.put(key, len(response.encode("utf-8")), model=model, response=response)
+    except sqlite3.Error as e:
+        print(f"⚠️ LLM cache write failed: {e}")
+
+
+def stats():
+    """Store counters plus the cache settings"""
+    result = _store.stats()
+    result["enabled"] = LLM_CACHE_ENABLED
+    result["ttl_seconds"] = LLM_CACHE_TTL
+    return result
+
+
+def clear():
+    """Remove every cached response"""
+    _store.clear()
@@ -0,0 +1,243 @@
+import os
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+import llm_cache
+import llm_scheduler
+from contextlib import contextmanager
+from single_flight import SingleFlight
+
+# -------------------- OLLAMA SETTINGS --------------------
+# Override with environment variables when Ollama runs on another host/port
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434").rstrip("/")
+DEFAULT_MODEL = os.environ.get("OLLAMA_MODEL", "llama3")
+POOL_SIZE = int(os.environ.get("OLLAMA_POOL_SIZE", "16"))
+CONNECT_TIMEOUT = float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "3"))
+DEFAULT_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "120"))
+# How long Ollama keeps a model in memory after a request ("" = server default of 5m)
+KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+
+# Sampling options sent with every request unless a call site overrides them
+DEFAULT_OPTIONS = {}
+
+_session = None
+_session_lock = threading.Lock()
+
+# Identical prompts that are already being generated are joined instead of re-run
+_inflight = SingleFlight("LLM generation")
+
+
+class LLMError(Exception):
+    """Raised when the Ollama API cannot produce a completion"""
+
+
+class LLMTimeout(LLMError):
+    """Raised when the Ollama API does not answer within the timeout"""
+
+
+class LLMQueueFull(LLMError):
+    """Raised when the scheduler rejects a request; retry_after is a hint in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def get_session():
+    """Return the process-wide keep-alive session to the Ollama API"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session = s
+    return _session
+
+
+@contextmanager
+def _scheduled(model, priority, timeout):
+    """Hold a scheduler slot, translating scheduler errors into LLM errors"""
+    try:
+        with llm_scheduler.scheduler.slot(model, priority, timeout=timeout):
+            yield
+    except llm_scheduler.QueueFull as e:
+        raise LLMQueueFull(str(e), e.retry_after) from e
+    except llm_scheduler.QueueTimeout as e:
+        raise LLMTimeout(str(e)) from e
+
+
+def check_capacity(priority=llm_scheduler.STANDARD):
+    """Raise LLMQueueFull now instead of after a streamed response has started"""
+    try:
+        llm_scheduler.scheduler.check_capacity(priority)
+    except llm_scheduler.QueueFull as e:
+        raise LLMQueueFull(str(e), e.retry_after) from e
+
+
+def build_payload(prompt, model=None, options=None, stream=False, **extra):
+    """Build the JSON body for /api/generate"""
+    payload = {
+        "model": model or DEFAULT_MODEL,
+        "prompt": prompt,
+        "stream": stream,
+    }
+    merged = dict(DEFAULT_OPTIONS)
+    merged.update(options or {})
+    if merged:
+        payload["options"] = merged
+    if KEEP_ALIVE:
+        payload["keep_alive"] = KEEP_ALIVE
+    payload.update(extra)
+    return payload
+
+
+def generate(prompt, model=None, timeout=None, options=None, cache=True, refresh=False,
+             priority=llm_scheduler.STANDARD, breaker=None, **extra):
+    """
+    Run a single completion through the pooled HTTP connection and return the text.
+    Identical requests are answered from llm_cache unless cache=False; refresh=True
+    skips the lookup but still stores the new answer. Concurrent identical requests
+    share one model run, which waits for a slot of the given scheduler priority.
+    With a breaker (llm_breaker.CircuitBreaker) the HTTP request of that shared run is timed against
+    the route's SLO once, without its queue wait; cache hits never touch the breaker.
+    Raises LLMQueueFull when that priority's queue is full, LLMTimeout when the model is too slow and LLMError for any other failure.
+    """
+    payload = build_payload(prompt, model=model, options=options, stream=False, **extra)
+    key = llm_cache.make_key(payload) if cache else None
+    if key and not refresh:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    if key:
+        return _inflight.do(key, _generate_uncached, payload, timeout, key, priority, breaker)
+    return _generate_uncached(payload, timeout, None, priority, breaker)
+
+
+def _generate_uncached(payload, timeout, key, priority, breaker=None):
+    """
+    The model run shared by identical requests. A breaker short-circuits or hedges it once for all of
+    them and times only the HTTP request, so one slow answer is one sample and queue wait is not in it.
+    """
+    def run():
+        text = (_post_generate(payload, timeout, priority, breaker).get("response") or "").strip()
+        if key:
+            llm_cache.put(key, payload["model"], text)
+        return text
+    return breaker.guard(run) if breaker is not None else run()
+
+
+def _post_generate(payload, timeout, priority, breaker=None):
+    """POST a non-streaming request inside a scheduler slot and return the decoded reply (timed by breaker)"""
+    with _scheduled(payload["model"], priority, timeout or DEFAULT_TIMEOUT):
+        if breaker is not None:
+            return breaker.timed(_post_json, payload, timeout)
+        return _post_json(payload, timeout)
+
+
+def _post_json(payload, timeout):
+    try:
+        response = get_session().post(
+            f"{OLLAMA_URL}/api/generate",
+            json=payload,
+            timeout=(CONNECT_TIMEOUT, timeout or DEFAULT_TIMEOUT)
+        )
+    except requests.Timeout as e:
+        raise LLMTimeout(f"Ollama did not answer in {timeout or DEFAULT_TIMEOUT}s") from e
+    except requests.RequestException as e:
+        raise LLMError(f"Ollama request failed: {e}") from e
+
+    if response.status_code != 200:
+        raise LLMError(f"Ollama HTTP API failed with status {response.status_code}")
+
+    try:
+        return response.json()
+    except ValueError as e:
+        raise LLMError("Ollama returned invalid JSON") from e
+
+
+def generate_turn(prompt, context=None, model=None, timeout=None, options=None,
+                  priority=llm_scheduler.INTERACTIVE, **extra):
+    """
+    Run one conversation turn and return (text, context).
+    context is the token list Ollama returned for the previous turn; passing it back means
+    the model continues from the already-encoded conversation instead of re-reading it.
+    Turns depend on their history, so they bypass the response cache.
+    """
+    if context:
+        extra["context"] = list(context)
+    payload = build_payload(prompt, model=model, options=options, stream=False, **extra)
+    data = _post_generate(payload, timeout, priority)
+    return (data.get("response") or "").strip(), data.get("context")
+
+
+def stream(prompt, model=None, timeout=None, options=None, cache=True, refresh=False,
+           priority=llm_scheduler.INTERACTIVE, final=None, **extra):
+    """
+    Yield response tokens as Ollama produces them.
+    The timeout applies between chunks, so it bounds time-to-first-token rather than total generation time.
+    A cache hit is yielded as one token; a completed stream is stored for next time.
+    The scheduler slot is held until the stream finishes or the caller stops reading.
+    Pass a dict as final to receive the closing chunk (context, eval counts) once the model is done.
+    """
+    payload = build_payload(prompt, model=model, options=options, stream=True, **extra)
+    key = llm_cache.make_key(payload) if cache else None
+    if key and not refresh:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    with _scheduled(payload["model"], priority, timeout or DEFAULT_TIMEOUT):
+        yield from _stream_uncached(payload, timeout, key, final)
+
+
+def _stream_uncached(payload, timeout, key, final=None):
+    try:
+        response = get_session().post(
+            f"{OLLAMA_URL}/api/generate",
+            json=payload,
+            stream=True,
+            timeout=(CONNECT_TIMEOUT, timeout or DEFAULT_TIMEOUT)
+        )
+    except requests.Timeout as e:
+        raise LLMTimeout(f"Ollama did not answer in {timeout or DEFAULT_TIMEOUT}s") from e
+    except requests.RequestException as e:
+        raise LLMError(f"Ollama request failed: {e}") from e
+
+    parts = []
+    try:
+        if response.status_code != 200:
+            raise LLMError(f"Ollama HTTP API failed with status {response.status_code}")
+        for line in response.iter_lines():
+            if not line:
+                continue
+            try:
+                chunk = json.loads(line)
+            except ValueError as e:
+                raise LLMError("Ollama returned an invalid stream chunk") from e
+            if chunk.get("error"):
+                raise LLMError(chunk["error"])
+            token = chunk.get("response")
+            if token:
+                parts.append(token)
+                yield token
+            if chunk.get("done"):
+                if final is not None:
+                    final.update(chunk)
+                if key:
+                    llm_cache.put(key, payload["model"], "".join(parts).strip())
+                break
+    except requests.exceptions.ConnectionError as e:
+        # urllib3 surfaces read timeouts mid-stream as connection errors
+        if "timed out" in str(e).lower():
+            raise LLMTimeout(f"Ollama stalled for more than {timeout or DEFAULT_TIMEOUT}s") from e
+        raise LLMError(f"Ollama stream broke: {e}") from e
+    except requests.Timeout as e:
+        raise LLMTimeout(f"Ollama stalled for more than {timeout or DEFAULT_TIMEOUT}s") from e
+    finally:
+        response.close()
@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+import requests
+import llm_client
+
+# -------------------- WARMUP / PROBE SETTINGS --------------------
+WARMUP_MODELS = [m.strip() for m in os.environ.get("OLLAMA_WARMUP_MODELS", llm_client.DEFAULT_MODEL).split(",") if m.strip()]
+PROBE_INTERVAL = float(os.environ.get("OLLAMA_PROBE_INTERVAL", "30"))
+LOAD_TIMEOUT = float(os.environ.get("OLLAMA_LOAD_TIMEOUT", "300"))
+# A probe slower than this means the model had been unloaded and was reloaded
+COLD_LOAD_MS = float(os.environ.get("OLLAMA_COLD_LOAD_MS", "2000"))
+
+# model -> {"status": "warming" | "ready" | "down", "latency_ms", "last_error", "checked_at"}
+_models = {}
+_lock = threading.Lock()
+_probe_thread = None
+
+
+def _set(model, **fields):
+    with _lock:
+        entry = _models.setdefault(model, {"status": "warming", "latency_ms": None, "last_error": None, "checked_at": None})
+        entry.update(fields)
+
+
+def load_model(model):
+    """
+    Ask Ollama to load model into memory and keep it there for KEEP_ALIVE.
+    An empty prompt loads the weights without generating anything. Returns the latency in ms.
+    """
+    payload = {"model": model, "prompt": "", "stream": False}
+    if llm_client.KEEP_ALIVE:
+        payload["keep_alive"] = llm_client.KEEP_ALIVE
+    start = time.perf_counter()
+    response = llm_client.get_session().post(
+        f"{llm_client.OLLAMA_URL}/api/generate",
+        json=payload,
+        timeout=(llm_client.CONNECT_TIMEOUT, LOAD_TIMEOUT)
+    )
+    if response.status_code != 200:
+        raise llm_client.LLMError(f"Loading {model} failed with status {response.status_code}")
+    return (time.perf_counter() - start) * 1000
+
+
+def probe(model):
+    """Load (or confirm) one model and record its readiness"""
+    try:
+        latency = load_model(model)
+        if latency > COLD_LOAD_MS:
+            print(f"🧊 {model} was cold, reloaded in {latency:.0f}ms")
+        _set(model, status="ready", latency_ms=round(latency, 1), last_error=None, checked_at=time.time())
+    except (requests.RequestException, llm_client.LLMError) as e:
+        _set(model, status="down", last_error=str(e), checked_at=time.time())
+        print(f"⚠️ Health probe for {model} failed: {e}")
+
+
+def warmup(models=None):
+    """Preload every configured model, blocking until each one is loaded or has failed"""
+    for model in models or WARMUP_MODELS:
+        _set(model, status="warming")
+        print(f"🔥 Warming up {model}...")
+        probe(model)
+        state = _models[model]
+        if state["status"] == "ready":
+            print(f"✅ {model} ready ({state['latency_ms']:.0f}ms)")
+
+
+def _probe_loop(models):
+    warmup(models)
+    while True:
+        time.sleep(PROBE_INTERVAL)
+        for model in models:
+            probe(model)
+
+
+def start(models=None):
+    """Warm up models and keep probing them from a background thread"""
+    global _probe_thread
+    if _probe_thread is not None:
+        return
+    models = list(models or WARMUP_MODELS)
+    for model in models:
+        _set(model, status="warming")
+    _probe_thread = threading.Thread(target=_probe_loop, args=(models,), daemon=True)
+    _probe_thread.start()
+
+
+def is_ready(model=None):
+    """
+    False only while the model is known to be warming up or unreachable.
+    Before start() has run, nothing is known, so callers are not held back.
+    """
+    with _lock:
+        state = _models.get(model or llm_client.DEFAULT_MODEL)
+        return state is None or state["status"] == "ready"
+
+
+def status(model=None):
+    """"warming", "ready" or "down" for a model, or None before start() has run"""
+    with _lock:
+        state = _models.get(model or llm_client.DEFAULT_MODEL)
+        return state["status"] if state else None
+
+
+def readiness():
+    """Overall status plus per-model detail for the /llm_health endpoint"""
+    with _lock:
+        models = {m: dict(s) for m, s in _models.items()}
+    statuses = {s["status"] for s in models.values()}
+    if not models:
+        status = "unknown"
+    elif statuses == {"ready"}:
+        status = "ready"
+    elif "warming" in statuses:
+        status = "warming"
+    elif statuses == {"down"}:
+        status = "down"
+    else:
+        status = "degraded"
+    return {"status": status, "ready": status in ("ready", "unknown"), "models": models}
@@ -0,0 +1,183 @@
+import os
+import math
+import time
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+
+# -------------------- PRIORITY CLASSES --------------------
+INTERACTIVE = "interactive"   # tutor chat, short-answer grading: a student is staring at the screen
+STANDARD = "standard"         # quizzes, coding lessons, audio notes: user-triggered but expected to take a while
+BATCH = "batch"               # notes PDFs, video prompts and narration: background work
+
+PRIORITY_ORDER = {INTERACTIVE: 0, STANDARD: 1, BATCH: 2}
+
+# -------------------- LIMITS --------------------
+# How many requests one model may run at once (match OLLAMA_NUM_PARALLEL)
+MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "2"))
+# Slots that only interactive requests may use, so a long batch job never blocks the tutor
+RESERVED_INTERACTIVE_SLOTS = int(os.environ.get("LLM_RESERVED_INTERACTIVE_SLOTS", "1"))
+# Maximum number of waiting requests per class before new ones are rejected with 429
+QUEUE_LIMITS = {
+    INTERACTIVE: int(os.environ.get("LLM_QUEUE_LIMIT_INTERACTIVE", "32")),
+    STANDARD: int(os.environ.get("LLM_QUEUE_LIMIT_STANDARD", "16")),
+    BATCH: int(os.environ.get("LLM_QUEUE_LIMIT_BATCH", "8")),
+}
+
+
+class QueueFull(Exception):
+    """Raised when a priority class already has too many waiting requests"""
+
+    def __init__(self, priority, retry_after):
+        super().__init__(f"LLM queue for {priority} requests is full, retry in {retry_after}s")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class QueueTimeout(Exception):
+    """Raised when a request waited in the queue longer than its timeout"""
+
+
+class _Stats:
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.service_avg = None   # exponentially weighted seconds per request
+
+    def as_dict(self):
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "avg_wait_ms": round(self.wait_total / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self.wait_max * 1000, 1),
+            "avg_service_ms": round(self.service_avg * 1000, 1) if self.service_avg else None,
+        }
+
+
+class LLMScheduler:
+    """
+    Hands out model slots in priority order.
+    Each model runs at most MAX_CONCURRENCY requests; non-interactive requests may only
+    use MAX_CONCURRENCY - RESERVED_INTERACTIVE_SLOTS of them.
+    """
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, reserved_interactive=RESERVED_INTERACTIVE_SLOTS,
+                 queue_limits=None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.reserved_interactive = min(max(0, reserved_interactive), self.max_concurrency - 1)
+        self.queue_limits = dict(queue_limits or QUEUE_LIMITS)
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting = {}    # model -> heap of (rank, seq, priority)
+        self._running = {}    # model -> {priority: count}
+        self._stats = {p: _Stats() for p in PRIORITY_ORDER}
+
+    # ---- admission ----
+    def _cap_for(self, priority):
+        if priority == INTERACTIVE:
+            return self.max_concurrency
+        return self.max_concurrency - self.reserved_interactive
+
+    def _queued(self, priority):
+        return sum(1 for heap in self._waiting.values() for entry in heap if entry[2] == priority)
+
+    def _retry_after(self, priority):
+        service = self._stats[priority].service_avg or 5.0
+        depth = self._queued(priority) + 1
+        return max(1, math.ceil(service * depth / self._cap_for(priority)))
+
+    def check_capacity(self, priority):
+        """Raise QueueFull if a new request of this class would be rejected right now"""
+        with self._cond:
+            if self._queued(priority) >= self.queue_limits.get(priority, 0):
+                self._stats[priority].rejected += 1
+                raise QueueFull(priority, self._retry_after(priority))
+
+    def _can_run(self, model, entry):
+        running = self._running.get(model, {})
+        total = sum(running.values())
+        if total >= self.max_concurrency:
+            return False
+        if entry[2] != INTERACTIVE:
+            non_interactive = total - running.get(INTERACTIVE, 0)
+            if non_interactive >= self._cap_for(entry[2]):
+                return False
+        # only the first eligible waiter in priority order may go
+        for other in sorted(self._waiting.get(model, [])):
+            if other is entry:
+                return True
+            if other[2] == INTERACTIVE or total - running.get(INTERACTIVE, 0) < self._cap_for(other[2]):
+                return False
+        return False
+
+    @contextmanager
+    def slot(self, model, priority=STANDARD, timeout=None):
+        """Block until a slot for model is free, then hold it for the duration of the with-block"""
+        if priority not in PRIORITY_ORDER:
+            priority = STANDARD
+        stats = self._stats[priority]
+        enqueued = time.perf_counter()
+
+        with self._cond:
+            if self._queued(priority) >= self.queue_limits.get(priority, 0):
+                stats.rejected += 1
+                raise QueueFull(priority, self._retry_after(priority))
+            entry = (PRIORITY_ORDER[priority], next(self._seq), priority)
+            heap = self._waiting.setdefault(model, [])
+            heapq.heappush(heap, entry)
+            deadline = enqueued + timeout if timeout else None
+            try:
+                while not self._can_run(model, entry):
+                    remaining = deadline - time.perf_counter() if deadline else None
+                    if remaining is not None and remaining <= 0:
+                        raise QueueTimeout(f"Waited more than {timeout}s for a free {model} slot")
+                    self._cond.wait(remaining)
+            finally:
+                heap.remove(entry)
+                heapq.heapify(heap)
+                self._cond.notify_all()
+            running = self._running.setdefault(model, {})
+            running[priority] = running.get(priority, 0) + 1
+            waited = time.perf_counter() - enqueued
+            stats.admitted += 1
+            stats.wait_total += waited
+            stats.wait_max = max(stats.wait_max, waited)
+
+        if waited > 0.5:
+            print(f"⏳ {priority} LLM request waited {waited:.1f}s for a {model} slot")
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._cond:
+                running[priority] -= 1
+                stats.completed += 1
+                stats.service_avg = elapsed if stats.service_avg is None else 0.8 * stats.service_avg + 0.2 * elapsed
+                self._cond.notify_all()
+
+    def stats(self):
+        """Queue depth, running counts and wait/service metrics per priority class"""
+        with self._cond:
+            result = {
+                "max_concurrency": self.max_concurrency,
+                "reserved_interactive_slots": self.reserved_interactive,
+                "classes": {},
+            }
+            for priority, stats in self._stats.items():
+                data = stats.as_dict()
+                data["queued"] = self._queued(priority)
+                data["running"] = sum(r.get(priority, 0) for r in self._running.values())
+                data["queue_limit"] = self.queue_limits.get(priority, 0)
+                result["classes"][priority] = data
+            return result
+
+
+# Shared by every LLM call in the process
+scheduler = LLMScheduler()
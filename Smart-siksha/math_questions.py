@@ -0,0 +1,118 @@
+import os
+import numpy as np
+from question_bank import normalize, question_hash
+
+# -------------------- MATH DRILL SETTINGS --------------------
+DRILL_TOPIC = "Math drill"
+# Most questions one /math_drill request may ask for
+DRILL_MAX = int(os.environ.get("MATH_DRILL_MAX", "1000"))
+
+# -------------------- DIFFICULTY BANDS --------------------
+OPERATIONS = ("add", "sub", "mul", "div", "sq", "sqrt")
+ALL_OPS = OPERATIONS
+
+# operand: range of a and b; quotient: answers of division questions; root: n in n² and √(n²)
+DIFFICULTY_BANDS = {
+    "elementary": {"ops": ("add", "sub", "mul"), "operand": (1, 12), "quotient": (2, 10), "root": (2, 10)},
+    "middle school": {"ops": ALL_OPS, "operand": (2, 20), "quotient": (2, 12), "root": (2, 15)},
+    "high school": {"ops": ALL_OPS, "operand": (5, 50), "quotient": (2, 25), "root": (5, 25)},
+    "college": {"ops": ALL_OPS, "operand": (10, 100), "quotient": (5, 50), "root": (10, 40)},
+    "graduate": {"ops": ALL_OPS, "operand": (20, 200), "quotient": (10, 99), "root": (10, 60)},
+}
+DEFAULT_BAND = "middle school"
+
+# Distractors are the first three of these offsets that keep the answer non-negative
+_DISTRACTOR_OFFSETS = np.array([-2, -1, 1, 2, 3, -3])
+
+_rng = np.random.default_rng()
+
+
+def band_for(user_class):
+    return DIFFICULTY_BANDS.get((user_class or "").strip().lower(), DIFFICULTY_BANDS[DEFAULT_BAND])
+
+
+def generate_batch(size, user_class=DEFAULT_BAND, rng=None):
+    """
+    Draw size random questions at once as NumPy arrays.
+    Returns a dict of op (index into OPERATIONS), a, b, options (size x 4) and answer_index;
+    `key` packs (op, a, b) into one int64 that identifies the question text.
+    """
+    rng = rng or _rng
+    band = band_for(user_class)
+    ops = np.array([OPERATIONS.index(o) for o in band["ops"]])[rng.integers(0, len(band["ops"]), size)]
+    lo, hi = band["operand"]
+    a = rng.integers(lo, hi + 1, size)
+    b = rng.integers(lo, hi + 1, size)
+    correct = np.zeros(size, dtype=np.int64)
+
+    add, sub, mul, div, sq, sqrt = (ops == i for i in range(len(OPERATIONS)))
+    correct[add] = a[add] + b[add]
+    # non-negative differences: the larger operand goes first
+    a[sub], b[sub] = np.maximum(a[sub], b[sub]), np.minimum(a[sub], b[sub])
+    correct[sub] = a[sub] - b[sub]
+    correct[mul] = a[mul] * b[mul]
+    # divisible by construction
+    correct[div] = rng.integers(band["quotient"][0], band["quotient"][1] + 1, int(div.sum()))
+    a[div] = correct[div] * b[div]
+    roots = rng.integers(band["root"][0], band["root"][1] + 1, size)
+    a[sq], correct[sq] = roots[sq], roots[sq] * roots[sq]
+    a[sqrt], correct[sqrt] = roots[sqrt] * roots[sqrt], roots[sqrt]
+    b[sq | sqrt] = 0
+
+    # first three valid offsets per row (a stable sort keeps their order)
+    candidates = correct[:, None] + _DISTRACTOR_OFFSETS[None, :]
+    first_valid = np.argsort(candidates < 0, axis=1, kind="stable")[:, :3]
+    distractors = np.take_along_axis(candidates, first_valid, axis=1)
+
+    # shuffle each row's four options and track where the correct one went
+    options = np.concatenate([correct[:, None], distractors], axis=1)
+    order = np.argsort(rng.random((size, 4)), axis=1)
+    options = np.take_along_axis(options, order, axis=1)
+    answer_index = np.argmax(order == 0, axis=1)
+
+    key = (ops.astype(np.int64) << 40) | (a.astype(np.int64) << 20) | b.astype(np.int64)
+    return {"op": ops, "a": a, "b": b, "options": options, "answer_index": answer_index, "key": key}
+
+
+def question_text(op, a, b):
+    name = OPERATIONS[op]
+    if name == "add":
+        return f"What is {a} + {b}?"
+    if name == "sub":
+        return f"What is {a} - {b}?"
+    if name == "mul":
+        return f"What is {a} × {b}?"
+    if name == "div":
+        return f"What is {a} ÷ {b}?"
+    if name == "sq":
+        return f"What is {a}²?"
+    return f"What is the square root of {a}?"
+
+
+def unique_questions(count, user_class=DEFAULT_BAND, exclude_hashes=(), rng=None, max_rounds=5):
+    """
+    Return up to count distinct arithmetic questions as quiz dicts.
+    Duplicates inside a batch are dropped with np.unique on the packed keys, and the whole batch is
+    checked against exclude_hashes (question_hash of normalized texts, e.g. a SeenSet's hashes) with
+    one np.isin. Fewer than count come back only if the band is nearly exhausted.
+    """
+    out = []
+    excluded = np.array(list(exclude_hashes), dtype="U16")
+    taken = np.empty(0, dtype=np.int64)
+    for _ in range(max_rounds):
+        need = count - len(out)
+        if need <= 0:
+            break
+        batch = generate_batch(max(2 * need, 64), user_class, rng)
+        _, first = np.unique(batch["key"], return_index=True)
+        first.sort()
+        texts = [question_text(op, a, b) for op, a, b in
+                 zip(batch["op"][first].tolist(), batch["a"][first].tolist(), batch["b"][first].tolist())]
+        hashes = np.array([question_hash(normalize(text)) for text in texts], dtype="U16")
+        fresh = np.flatnonzero(~np.isin(hashes, excluded) & ~np.isin(batch["key"][first], taken))[:need]
+        rows = first[fresh]
+        taken = np.concatenate([taken, batch["key"][rows]])
+        for i, options, answer in zip(fresh.tolist(), batch["options"][rows].tolist(),
+                                      batch["answer_index"][rows].tolist()):
+            out.append({"question": texts[i], "options": [str(o) for o in options], "answer_index": answer})
+    return out
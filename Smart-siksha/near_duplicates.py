@@ -0,0 +1,190 @@
+import os
+import re
+import zlib
+import hashlib
+from functools import lru_cache
+from itertools import combinations
+import numpy as np
+import quiz_db
+
+# -------------------- NEAR-DUPLICATE SETTINGS --------------------
+# Shingle-set Jaccard similarity from which two questions count as the same question
+THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.6"))
+# MinHash LSH: 20 bands of 3 rows put the candidate cut-off near Jaccard 0.37, well below THRESHOLD
+BANDS = 20
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+# Most LSH candidates verified per lookup
+CANDIDATE_LIMIT = int(os.environ.get("NEAR_DUPLICATE_CANDIDATES", "200"))
+
+# Generic English function words only: words like "define", "example" or "type" carry what a short
+# question asks for, so "Define X" and "Give an example of X" must stay different questions
+STOPWORDS = frozenset("""
+    a an the of in on at to for from by with and or is are was were be been being do does did
+    what which who whom whose when where why how that this these those it its as into about
+""".split())
+# Scaffolding around what a question asks that does not change it: "What is the process of X?" asks "What is X?"
+SCAFFOLDING = re.compile(r"\b(?:process|concept|(?:main )?idea|phenomenon) of\b")
+
+_WORD = re.compile(r"[^\W\d_]+|\d+")
+_PRIME = (1 << 31) - 1
+# fixed seed: bucket keys are stored in the database and must not change between runs
+_rng = np.random.default_rng(20240611)
+_PERM_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)[:, None]
+_PERM_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)[:, None]
+# odd 64-bit multipliers that fold a band's rows into one bucket key
+_BAND_MIX = _rng.integers(0, 1 << 63, ROWS, dtype=np.uint64) | np.uint64(1)
+
+_INDEX_SQL = "INSERT OR IGNORE INTO question_lsh (band, bucket, question_id) VALUES (?, ?, ?)"
+# CROSS JOIN pins the join order: bucket keys -> question_lsh primary key -> question_bank rowid
+_CANDIDATES_SQL = f'''
+    SELECT DISTINCT b.id, b.question, b.question_hash, b.user_class
+    FROM (VALUES {", ".join(["(?, ?)"] * BANDS)}) AS k
+    CROSS JOIN question_lsh l ON l.band = k.column1 AND l.bucket = k.column2
+    CROSS JOIN question_bank b ON b.id = l.question_id
+    LIMIT ?
+'''
+_UNINDEXED_SQL = '''
+    SELECT id, topic_key, question FROM question_bank b
+    WHERE id > ? AND NOT EXISTS (SELECT 1 FROM question_lsh WHERE question_id = b.id)
+    ORDER BY id
+    LIMIT ?
+'''
+
+
+def _stem(word):
+    """Crude suffix stripping, enough for "release" / "released" / "releases" to match"""
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    if word.endswith("e") and len(word) > 3:
+        word = word[:-1]
+    return word
+
+
+def content_words(text, numbers=False):
+    """Stemmed words of a text without stopwords, in order; numbers are kept only when asked"""
+    return [w if w.isdigit() else _stem(w) for w in _WORD.findall((text or "").lower())
+            if w not in STOPWORDS and (numbers or not w.isdigit())]
+
+
+@lru_cache(maxsize=8192)
+def features(text):
+    """
+    (shingles, numbers) of a question. The shingles are its stemmed content words and every unordered
+    pair of them, after dropping scaffolding ("the process of"), so reordered rewordings still match and
+    a changed word costs its pairs too. Numbers must match exactly ("12 + 5" vs "12 + 6").
+    """
+    text = (text or "").lower()
+    words = _WORD.findall(text)
+    numbers = tuple(w for w in words if w.isdigit())
+    terms = sorted(set(content_words(SCAFFOLDING.sub(" ", text)) or [_stem(w) for w in words]))
+    return frozenset(terms + [f"{a} {b}" for a, b in combinations(terms, 2)]), numbers
+
+
+def similarity(a, b):
+    """Jaccard similarity of two questions' shingles; 0 when their numbers differ"""
+    grams_a, numbers_a = features(a)
+    grams_b, numbers_b = features(b)
+    if numbers_a != numbers_b or not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def is_near_duplicate(a, b, threshold=None):
+    return similarity(a, b) >= (THRESHOLD if threshold is None else threshold)
+
+
+def signature(text):
+    """MinHash signature (NUM_PERM values) of a question's shingles, or None if it has none"""
+    grams = features(text)[0]
+    if not grams:
+        return None
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+    return ((_PERM_A * hashes[None, :] + _PERM_B) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def buckets(topic_key, text):
+    """(band, bucket) LSH keys of a question; the topic is part of the key, so lookups stay within a topic"""
+    sig = signature(text)
+    if sig is None:
+        return []
+    topic = np.uint64(int.from_bytes(hashlib.blake2b(topic_key.encode("utf-8"), digest_size=8).digest(), "big"))
+    keys = (sig.reshape(BANDS, ROWS).astype(np.uint64) * _BAND_MIX).sum(axis=1) ^ topic
+    return list(enumerate(keys.view(np.int64).tolist()))
+
+
+class NearDuplicateSet:
+    """
+    Question texts where `text in s` is also true for near-duplicates of a member.
+    Pairwise check, meant for the handful of questions in one quiz or batch.
+    """
+
+    def __init__(self, texts=(), threshold=None):
+        self.threshold = THRESHOLD if threshold is None else threshold
+        self.texts = set()
+        for text in texts:
+            self.add(text)
+
+    def add(self, text):
+        self.texts.add(text)
+
+    def __contains__(self, text):
+        return text in self.texts or any(is_near_duplicate(text, other, self.threshold) for other in self.texts)
+
+    def __len__(self):
+        return len(self.texts)
+
+
+# -------------------- QUESTION BANK INDEX --------------------
+
+def index(conn, question_id, topic_key, text):
+    """Add a banked question to the LSH index, inside the caller's transaction"""
+    conn.executemany(_INDEX_SQL, [(band, bucket, question_id) for band, bucket in buckets(topic_key, text)])
+
+
+def candidates(conn, topic_key, text):
+    """Banked questions of the topic sharing at least one LSH bucket with text: (id, question, hash, class)"""
+    keys = buckets(topic_key, text)
+    if not keys:
+        return []
+    params = [value for key in keys for value in key]
+    return conn.execute(_CANDIDATES_SQL, (*params, CANDIDATE_LIMIT)).fetchall()
+
+
+def find_banked(conn, topic_key, user_class, text, threshold=None):
+    """A banked question of the same topic and class that text nearly duplicates, or None"""
+    for question_id, question, _, row_class in candidates(conn, topic_key, text):
+        if row_class == user_class and is_near_duplicate(text, question, threshold):
+            return question_id, question
+    return None
+
+
+def seen_match(topic_key, text, seen_hashes, threshold=None):
+    """True when text nearly duplicates a banked question whose hash is in seen_hashes"""
+    with quiz_db.get_pool().connection() as conn:
+        rows = candidates(conn, topic_key, text)
+    return any(question_hash in seen_hashes and is_near_duplicate(text, question, threshold)
+               for _, question, question_hash, _ in rows)
+
+
+def index_missing(batch=5000):
+    """Index banked questions added before the LSH index existed; returns how many were indexed"""
+    last_id = 0
+    indexed = 0
+    while True:
+        with quiz_db.get_pool().connection() as conn:
+            rows = conn.execute(_UNINDEXED_SQL, (last_id, batch)).fetchall()
+        if not rows:
+            break
+        # one sorted batch keeps the B-tree inserts local
+        entries = sorted((band, bucket, question_id) for question_id, topic_key, question in rows
+                         for band, bucket in buckets(topic_key, question))
+        with quiz_db.get_pool().transaction() as conn:
+            conn.executemany(_INDEX_SQL, entries)
+        last_id = rows[-1][0]
+        indexed += len(rows)
+    if indexed:
+        print(f"🔎 Indexed {indexed} banked questions for near-duplicate detection")
+    return indexed
@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import random
+import hashlib
+import quiz_db
+import near_duplicates
+
+# -------------------- QUESTION BANK SETTINGS --------------------
+QUIZ_SIZE = 10
+# Refill a topic in the background once a student has fewer unseen questions than this
+LOW_WATER = int(os.environ.get("QUESTION_BANK_LOW_WATER", "20"))
+# Least-served candidates read per draw; plenty for a 10-question quiz
+SCAN_LIMIT = int(os.environ.get("QUESTION_BANK_SCAN_LIMIT", "500"))
+
+_ADD_SQL = '''
+    INSERT OR IGNORE INTO question_bank (topic, topic_key, user_class, question, options, answer_index, question_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+_CANDIDATES_SQL = '''
+    SELECT id, question, options, answer_index, question_hash
+    FROM question_bank
+    WHERE topic_key = ? AND user_class = ?
+      AND question_hash NOT IN (SELECT question_hash FROM seen_questions WHERE user_name = ? AND topic_key = ?)
+    ORDER BY served_count, id DESC
+    LIMIT ?
+'''
+# Same class, different wording of the topic ("Photosynthesis" -> "Photosynthesis in plants")
+_RELATED_SQL = '''
+    SELECT b.id, b.question, b.options, b.answer_index, b.question_hash
+    FROM question_bank_fts f JOIN question_bank b ON b.id = f.rowid
+    WHERE question_bank_fts MATCH ? AND b.user_class = ? AND b.topic_key != ?
+      AND b.question_hash NOT IN (SELECT question_hash FROM seen_questions WHERE user_name = ? AND topic_key = ?)
+    ORDER BY b.served_count
+    LIMIT ?
+'''
+_SERVED_SQL = "UPDATE question_bank SET served_count = served_count + 1 WHERE id = ?"
+_COUNT_SQL = "SELECT COUNT(*) FROM question_bank WHERE topic_key = ? AND user_class = ?"
+_SAMPLE_SQL = "SELECT question FROM question_bank WHERE topic_key = ? AND user_class = ? ORDER BY random() LIMIT ?"
+
+
+def normalize(text):
+    """Lower-case and collapse whitespace, as the quiz de-duplication does"""
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+
+def topic_key(topic):
+    return normalize(topic)
+
+
+def question_hash(normalized_text):
+    """Stable id of a normalized question text (same normalization as the quiz de-duplication)"""
+    return hashlib.sha1(normalized_text.encode("utf-8")).hexdigest()[:16]
+
+
+def _fts_query(topic):
+    words = re.findall(r"\w+", topic.lower())
+    if not words:
+        return None
+    return "topic : (" + " AND ".join(f'"{w}"' for w in words) + ")"
+
+
+def add(topic, user_class, questions):
+    """
+    Store validated questions. Exact and near-duplicates (near_duplicates.py) of banked questions,
+    or of each other, are skipped. Returns how many were new.
+    """
+    key = topic_key(topic)
+    batch = near_duplicates.NearDuplicateSet()
+    added = 0
+    with quiz_db.get_pool().transaction() as conn:
+        for q in questions:
+            text = q.get("question", "").strip()
+            if not text or text in batch:
+                continue
+            batch.add(text)
+            if near_duplicates.find_banked(conn, key, user_class, text):
+                continue
+            cursor = conn.execute(_ADD_SQL, (
+                topic, key, user_class, text, json.dumps(q["options"]),
+                q["answer_index"], question_hash(normalize(text)),
+            ))
+            if cursor.rowcount:
+                near_duplicates.index(conn, cursor.lastrowid, key, text)
+                added += 1
+    return added
+
+
+def draw(topic, user_class, user_name, count=QUIZ_SIZE):
+    """
+    Pick count questions user_name has not seen (per seen_questions), least-served first.
+    Returns (questions, fresh_left): questions is None when the bank cannot fill a quiz yet,
+    fresh_left is how many unseen questions remain for the student afterwards.
+    """
+    key = topic_key(topic)
+    with quiz_db.get_pool().connection() as conn:
+        fresh = conn.execute(_CANDIDATES_SQL, (key, user_class, user_name, key, SCAN_LIMIT)).fetchall()
+        if len(fresh) < count:
+            fts_query = _fts_query(topic)
+            if fts_query:
+                related = conn.execute(
+                    _RELATED_SQL, (fts_query, user_class, key, user_name, key, SCAN_LIMIT)).fetchall()
+                fresh += _unseen(related, {row[4] for row in fresh})
+
+    if len(fresh) < count:
+        return None, len(fresh)
+
+    # least-served first, shuffled within that so students do not all get the same quiz;
+    # related topics can word the same question differently, so skip near-duplicates
+    pool = fresh[:count * 3]
+    random.shuffle(pool)
+    chosen = []
+    picked = near_duplicates.NearDuplicateSet()
+    for row in pool + fresh[count * 3:]:
+        if row[1] not in picked:
+            picked.add(row[1])
+            chosen.append(row)
+            if len(chosen) == count:
+                break
+    if len(chosen) < count:
+        return None, len(fresh)
+    with quiz_db.get_pool().transaction() as conn:
+        conn.executemany(_SERVED_SQL, [(row[0],) for row in chosen])
+    questions = [
+        {"question": question, "options": json.loads(options), "answer_index": answer_index}
+        for _, question, options, answer_index, _ in chosen
+    ]
+    return questions, len(fresh) - count
+
+
+def _unseen(rows, used_hashes):
+    """Rows whose question is not in used_hashes, keeping one row per question text (topics can share one)"""
+    out = []
+    seen = set(used_hashes)
+    for row in rows:
+        if row[4] not in seen:
+            seen.add(row[4])
+            out.append(row)
+    return out
+
+
+def size(topic, user_class):
+    """Number of banked questions for a topic and class"""
+    with quiz_db.get_pool().connection() as conn:
+        return conn.execute(_COUNT_SQL, (topic_key(topic), user_class)).fetchone()[0]
+
+
+def sample_questions(topic, user_class, limit=15):
+    """A few banked question texts, used to steer the model away from repeats when refilling"""
+    with quiz_db.get_pool().connection() as conn:
+        return [row[0] for row in conn.execute(_SAMPLE_SQL, (topic_key(topic), user_class, limit))]
+
+
+def stats():
+    with quiz_db.get_pool().connection() as conn:
+        total, topics = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT topic_key || '|' || user_class) FROM question_bank").fetchone()
+        served = conn.execute("SELECT COALESCE(SUM(served_count), 0) FROM question_bank").fetchone()[0]
+    return {"questions": total, "topic_classes": topics, "served": served, "low_water": LOW_WATER}
@@ -0,0 +1,617 @@
+import os
+import json
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# -------------------- QUIZ DATABASE SETTINGS --------------------
+QUIZ_DB_PATH = os.environ.get("QUIZ_DB_PATH", "csv/quizzes.db")
+POOL_SIZE = int(os.environ.get("QUIZ_DB_POOL_SIZE", "8"))
+# Seconds to wait for a free pooled connection (and for SQLite's write lock)
+POOL_TIMEOUT = float(os.environ.get("QUIZ_DB_TIMEOUT", "10"))
+# Compiled statements kept per connection; every query below is a constant string so it is reused
+STATEMENT_CACHE = 128
+SAVED_PAGE_MAX = 100
+
+# -------------------- ANALYTICS ROLLUP SETTINGS --------------------
+# A completed quiz counts as passed from this percentage (the /submit_quiz points threshold)
+PASS_PERCENTAGE = 70
+# Score histogram buckets of 10 percentage points; 100% falls in the last one
+HISTOGRAM_BUCKETS = 10
+ANALYTICS_DAYS_MAX = 366
+
+# -------------------- SCHEMA MIGRATIONS --------------------
+# Applied in order; PRAGMA user_version records how many have run. Only ever append.
+MIGRATIONS = [
+    # 1: the original table
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS saved_quizzes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_name TEXT,
+            topic TEXT,
+            user_class TEXT,
+            quiz_data TEXT,
+            score INTEGER,
+            total_questions INTEGER,
+            percentage REAL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP
+        )
+        ''',
+    ],
+    # 2: indexes for "latest quiz for a topic" and the quiz history page
+    [
+        '''
+        CREATE INDEX IF NOT EXISTS idx_saved_quizzes_user_topic_created
+        ON saved_quizzes (user_name, topic, created_at DESC, id DESC)
+        ''',
+        # covers the whole history query, so paging never touches the table (or quiz_data)
+        '''
+        CREATE INDEX IF NOT EXISTS idx_saved_quizzes_user_completed
+        ON saved_quizzes (user_name, completed_at DESC, id DESC, topic, score, total_questions, percentage, created_at)
+        WHERE completed_at IS NOT NULL
+        ''',
+        "ANALYZE",
+    ],
+    # 3: question bank (question_bank.py) with a full-text index over topic and question text
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS question_bank (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic TEXT,
+            topic_key TEXT,
+            user_class TEXT,
+            question TEXT,
+            options TEXT,
+            answer_index INTEGER,
+            question_hash TEXT,
+            served_count INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (topic_key, user_class, question_hash)
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_question_bank_draw
+        ON question_bank (topic_key, user_class, served_count)
+        ''',
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS question_bank_fts
+        USING fts5(topic, question, content='question_bank', content_rowid='id')
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS question_bank_ai AFTER INSERT ON question_bank BEGIN
+            INSERT INTO question_bank_fts (rowid, topic, question) VALUES (new.id, new.topic, new.question);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS question_bank_ad AFTER DELETE ON question_bank BEGIN
+            INSERT INTO question_bank_fts (question_bank_fts, rowid, topic, question)
+            VALUES ('delete', old.id, old.topic, old.question);
+        END
+        ''',
+    ],
+    # 4: questions each student has already been shown (seen_questions.py), replacing the cookie list
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS seen_questions (
+            user_name TEXT,
+            topic_key TEXT,
+            question_hash TEXT,
+            seen_at REAL,
+            PRIMARY KEY (user_name, topic_key, question_hash)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_seen_questions_recent
+        ON seen_questions (user_name, topic_key, seen_at)
+        ''',
+    ],
+    # 5: per-topic analytics rollups, kept current by complete_quiz / insert_graded_quizzes;
+    # existing completed quizzes are folded in once here
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS topic_rollups (
+            topic_key TEXT PRIMARY KEY,
+            topic TEXT,
+            attempts INTEGER NOT NULL,
+            passed INTEGER NOT NULL,
+            mean_percentage REAL NOT NULL,
+            m2_percentage REAL NOT NULL,
+            min_percentage REAL,
+            max_percentage REAL,
+            last_completed_at TIMESTAMP
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_topic_rollups_attempts ON topic_rollups (attempts DESC)",
+        '''
+        CREATE TABLE IF NOT EXISTS topic_score_histogram (
+            topic_key TEXT,
+            bucket INTEGER,
+            attempts INTEGER NOT NULL,
+            PRIMARY KEY (topic_key, bucket)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS topic_daily_rollups (
+            topic_key TEXT,
+            day TEXT,
+            attempts INTEGER NOT NULL,
+            passed INTEGER NOT NULL,
+            sum_percentage REAL NOT NULL,
+            PRIMARY KEY (topic_key, day)
+        ) WITHOUT ROWID
+        ''',
+        f'''
+        INSERT OR IGNORE INTO topic_rollups
+        SELECT lower(trim(topic)), MAX(topic), COUNT(*), SUM(percentage >= {PASS_PERCENTAGE}), AVG(percentage),
+               MAX(0, SUM(percentage * percentage) - COUNT(*) * AVG(percentage) * AVG(percentage)),
+               MIN(percentage), MAX(percentage), MAX(completed_at)
+        FROM saved_quizzes
+        WHERE completed_at IS NOT NULL AND percentage IS NOT NULL
+        GROUP BY lower(trim(topic))
+        ''',
+        f'''
+        INSERT OR IGNORE INTO topic_score_histogram
+        SELECT lower(trim(topic)), MIN(CAST(percentage * {HISTOGRAM_BUCKETS} / 100 AS INTEGER), {HISTOGRAM_BUCKETS} - 1), COUNT(*)
+        FROM saved_quizzes
+        WHERE completed_at IS NOT NULL AND percentage IS NOT NULL
+        GROUP BY 1, 2
+        ''',
+        f'''
+        INSERT OR IGNORE INTO topic_daily_rollups
+        SELECT lower(trim(topic)), date(completed_at), COUNT(*), SUM(percentage >= {PASS_PERCENTAGE}), SUM(percentage)
+        FROM saved_quizzes
+        WHERE completed_at IS NOT NULL AND percentage IS NOT NULL
+        GROUP BY 1, 2
+        ''',
+    ],
+    # 6: MinHash LSH buckets of banked questions (near_duplicates.py); rows are filled from Python
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS question_lsh (
+            band INTEGER,
+            bucket INTEGER,
+            question_id INTEGER,
+            PRIMARY KEY (band, bucket, question_id)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_question_lsh_question ON question_lsh (question_id)",
+        '''
+        CREATE TRIGGER IF NOT EXISTS question_bank_lsh_ad AFTER DELETE ON question_bank BEGIN
+            DELETE FROM question_lsh WHERE question_id = old.id;
+        END
+        ''',
+    ],
+    # 7: model grades of short answers, keyed on (question, normalized answer) (answer_grading.py)
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS answer_grades (
+            question_key TEXT,
+            answer_key TEXT,
+            answer TEXT,
+            result TEXT,
+            score INTEGER,
+            created_at REAL,
+            PRIMARY KEY (question_key, answer_key)
+        ) WITHOUT ROWID
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_answer_grades_score ON answer_grades (question_key, score, created_at)",
+    ],
+    # 8: knowledge tracing (knowledge_tracing.py): ability per student and topic, difficulty per question,
+    # and each student's precomputed next-topic recommendations
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS topic_mastery (
+            user_name TEXT,
+            topic_key TEXT,
+            topic TEXT,
+            ability REAL,
+            attempts INTEGER,
+            correct INTEGER,
+            updated_at REAL,
+            PRIMARY KEY (user_name, topic_key)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS item_difficulty (
+            item_key TEXT PRIMARY KEY,
+            difficulty REAL,
+            attempts INTEGER
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS user_recommendations (
+            user_name TEXT PRIMARY KEY,
+            recommendations TEXT,
+            updated_at REAL
+        ) WITHOUT ROWID
+        ''',
+    ],
+    # 9: near_duplicates.py stopped treating question-intent words as stopwords, which changes the
+    # shingles of banked questions; near_duplicates.index_missing() rebuilds the buckets at startup
+    [
+        "DELETE FROM question_lsh",
+    ],
+    # 10: completed quizzes knowledge tracing has not seen yet, replayed in chunks by
+    # knowledge_tracing.backfill(). Snapshotted here, so quizzes recorded live are never replayed;
+    # a database whose model already has data (version 8 backfilled) queues nothing.
+    [
+        "CREATE TABLE IF NOT EXISTS mastery_backfill (quiz_id INTEGER PRIMARY KEY)",
+        '''
+        INSERT OR IGNORE INTO mastery_backfill (quiz_id)
+        SELECT id FROM saved_quizzes
+        WHERE completed_at IS NOT NULL AND total_questions > 0
+          AND NOT EXISTS (SELECT 1 FROM topic_mastery)
+        ''',
+    ],
+    # 11: drop mastery rows made from the grader's free-text weak topics ("definitions", "examples"):
+    # topics nobody has completed a quiz on and the student has no quiz for. knowledge_tracing.backfill()
+    # rebuilds the recommendations cleared here.
+    [
+        '''
+        DELETE FROM topic_mastery
+        WHERE topic_key NOT IN (SELECT topic_key FROM topic_rollups)
+          AND NOT EXISTS (
+              SELECT 1 FROM saved_quizzes s
+              WHERE s.user_name = topic_mastery.user_name AND lower(trim(s.topic)) = topic_mastery.topic_key
+          )
+        ''',
+        "DELETE FROM user_recommendations",
+    ],
+    # 12: near_duplicates.py shingles word pairs without question scaffolding and uses 20 bands of 3 rows,
+    # so every stored bucket key changes; near_duplicates.index_missing() rebuilds them at startup
+    [
+        "DELETE FROM question_lsh",
+    ],
+]
+
+# -------------------- QUERIES --------------------
+_LAST_QUIZ_SQL = '''
+    SELECT quiz_data, score, total_questions, percentage, created_at, completed_at
+    FROM saved_quizzes
+    WHERE user_name = ? AND topic = ?
+    ORDER BY created_at DESC, id DESC
+    LIMIT 1
+'''
+_INSERT_QUIZ_SQL = '''
+    INSERT INTO saved_quizzes (user_name, topic, user_class, quiz_data)
+    VALUES (?, ?, ?, ?)
+'''
+# already-graded attempts (class grading); created and completed together
+_INSERT_GRADED_SQL = '''
+    INSERT INTO saved_quizzes
+        (user_name, topic, user_class, quiz_data, score, total_questions, percentage, created_at, completed_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+'''
+# UPDATE ... ORDER BY ... LIMIT needs SQLITE_ENABLE_UPDATE_DELETE_LIMIT; a subquery works everywhere
+_COMPLETE_QUIZ_SQL = '''
+    UPDATE saved_quizzes
+    SET score = ?, total_questions = ?, percentage = ?, completed_at = CURRENT_TIMESTAMP
+    WHERE id = (
+        SELECT id FROM saved_quizzes
+        WHERE user_name = ? AND topic = ? AND completed_at IS NULL
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1
+    )
+'''
+# Rollups: each write folds a batch's aggregate (count, mean, M2, ...) into the topic's row with the
+# parallel form of Welford's update, so mean and variance stay exact without re-reading history.
+# SET expressions see the row's values from before the update.
+_ROLLUP_SQL = '''
+    INSERT INTO topic_rollups (topic_key, topic, attempts, passed, mean_percentage, m2_percentage,
+                               min_percentage, max_percentage, last_completed_at)
+    VALUES (lower(trim(:topic)), :topic, :attempts, :passed, :mean, :m2, :min, :max, CURRENT_TIMESTAMP)
+    ON CONFLICT (topic_key) DO UPDATE SET
+        attempts = attempts + excluded.attempts,
+        passed = passed + excluded.passed,
+        mean_percentage = mean_percentage + (excluded.mean_percentage - mean_percentage)
+            * excluded.attempts / (attempts + excluded.attempts),
+        m2_percentage = m2_percentage + excluded.m2_percentage + (excluded.mean_percentage - mean_percentage)
+            * (excluded.mean_percentage - mean_percentage) * attempts * excluded.attempts / (attempts + excluded.attempts),
+        min_percentage = MIN(min_percentage, excluded.min_percentage),
+        max_percentage = MAX(max_percentage, excluded.max_percentage),
+        last_completed_at = excluded.last_completed_at
+'''
+_HISTOGRAM_SQL = '''
+    INSERT INTO topic_score_histogram (topic_key, bucket, attempts)
+    VALUES (lower(trim(:topic)), :bucket, :attempts)
+    ON CONFLICT (topic_key, bucket) DO UPDATE SET attempts = attempts + excluded.attempts
+'''
+_DAILY_SQL = '''
+    INSERT INTO topic_daily_rollups (topic_key, day, attempts, passed, sum_percentage)
+    VALUES (lower(trim(:topic)), date('now'), :attempts, :passed, :sum)
+    ON CONFLICT (topic_key, day) DO UPDATE SET
+        attempts = attempts + excluded.attempts,
+        passed = passed + excluded.passed,
+        sum_percentage = sum_percentage + excluded.sum_percentage
+'''
+_TOPIC_ROLLUP_SQL = '''
+    SELECT topic, attempts, passed, mean_percentage, m2_percentage, min_percentage, max_percentage, last_completed_at
+    FROM topic_rollups
+    WHERE topic_key = lower(trim(?))
+'''
+_TOP_TOPICS_SQL = '''
+    SELECT topic, attempts, passed, mean_percentage, m2_percentage, min_percentage, max_percentage, last_completed_at
+    FROM topic_rollups
+    ORDER BY attempts DESC
+    LIMIT ?
+'''
+_TOPIC_HISTOGRAM_SQL = "SELECT bucket, attempts FROM topic_score_histogram WHERE topic_key = lower(trim(?))"
+_TOPIC_DAYS_SQL = '''
+    SELECT day, attempts, passed, sum_percentage
+    FROM topic_daily_rollups
+    WHERE topic_key = lower(trim(?)) AND day >= date('now', ?)
+    ORDER BY day
+'''
+_SAVED_FIRST_PAGE_SQL = '''
+    SELECT id, topic, score, total_questions, percentage, created_at, completed_at
+    FROM saved_quizzes
+    WHERE user_name = ? AND completed_at IS NOT NULL
+    ORDER BY completed_at DESC, id DESC
+    LIMIT ?
+'''
+_SAVED_NEXT_PAGE_SQL = '''
+    SELECT id, topic, score, total_questions, percentage, created_at, completed_at
+    FROM saved_quizzes
+    WHERE user_name = ? AND completed_at IS NOT NULL AND (completed_at, id) < (?, ?)
+    ORDER BY completed_at DESC, id DESC
+    LIMIT ?
+'''
+
+
+class ConnectionPool:
+    """
+    A fixed number of WAL-mode connections shared by all request threads.
+    Connections run in autocommit mode; writes go through transaction().
+    """
+
+    def __init__(self, path, size=POOL_SIZE, timeout=POOL_TIMEOUT):
+        self.path = path
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=STATEMENT_CACHE)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of the with-block"""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                new = self._created < self.size
+                if new:
+                    self._created += 1
+            if new:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(f"No free connection to {self.path} after {self.timeout}s")
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Borrow a connection and run the with-block in one write transaction"""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool for QUIZ_DB_PATH"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(QUIZ_DB_PATH)
+    return _pool
+
+
+def migrate():
+    """Apply any migrations the database has not seen yet; returns the schema version"""
+    with get_pool().transaction() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+            print(f"🗄️ Quiz database migrated to version {number}")
+        return max(version, len(MIGRATIONS))
+
+
+def last_quiz(user_name, topic):
+    """Most recent quiz row for a user and topic as a dict, or None"""
+    with get_pool().connection() as conn:
+        row = conn.execute(_LAST_QUIZ_SQL, (user_name, topic)).fetchone()
+    if row is None:
+        return None
+    quiz_data, score, total_questions, percentage, created_at, completed_at = row
+    return {
+        'quiz_data': json.loads(quiz_data),
+        'score': score,
+        'total_questions': total_questions,
+        'percentage': percentage,
+        'created_at': created_at,
+        'completed_at': completed_at,
+    }
+
+
+def insert_quiz(user_name, topic, user_class, quiz_data):
+    with get_pool().transaction() as conn:
+        conn.execute(_INSERT_QUIZ_SQL, (user_name, topic, user_class, json.dumps(quiz_data)))
+
+
+def complete_quiz(user_name, topic, score, total_questions, percentage):
+    """Store results on the newest unfinished quiz for this user and topic; returns True if one was found"""
+    with get_pool().transaction() as conn:
+        cursor = conn.execute(_COMPLETE_QUIZ_SQL, (score, total_questions, percentage, user_name, topic))
+        if cursor.rowcount > 0:
+            _record_rollups(conn, [(topic, percentage)])
+        return cursor.rowcount > 0
+
+
+def insert_graded_quizzes(rows):
+    """
+    Store many finished attempts in one transaction.
+    rows are (user_name, topic, user_class, quiz_data_json, score, total_questions, percentage).
+    """
+    with get_pool().transaction() as conn:
+        conn.executemany(_INSERT_GRADED_SQL, rows)
+        _record_rollups(conn, [(row[1], row[6]) for row in rows])
+    return len(rows)
+
+
+def _record_rollups(conn, results):
+    """Fold (topic, percentage) results into the analytics rollups, inside the caller's transaction"""
+    by_topic = {}
+    for topic, percentage in results:
+        if percentage is not None:
+            by_topic.setdefault(topic, []).append(float(percentage))
+
+    rollups, buckets = [], []
+    for topic, scores in by_topic.items():
+        count = len(scores)
+        mean = sum(scores) / count
+        rollups.append({
+            "topic": topic, "attempts": count, "passed": sum(p >= PASS_PERCENTAGE for p in scores),
+            "mean": mean, "m2": sum((p - mean) ** 2 for p in scores), "min": min(scores), "max": max(scores),
+            "sum": sum(scores),
+        })
+        histogram = {}
+        for p in scores:
+            bucket = min(int(p * HISTOGRAM_BUCKETS // 100), HISTOGRAM_BUCKETS - 1)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        buckets += [{"topic": topic, "bucket": bucket, "attempts": n} for bucket, n in histogram.items()]
+
+    if rollups:
+        conn.executemany(_ROLLUP_SQL, rollups)
+        conn.executemany(_HISTOGRAM_SQL, buckets)
+        conn.executemany(_DAILY_SQL, rollups)
+
+
+def _topic_summary(row):
+    topic, attempts, passed, mean, m2, low, high, last_completed_at = row
+    variance = m2 / (attempts - 1) if attempts > 1 else 0.0
+    return {
+        'topic': topic,
+        'attempts': attempts,
+        'pass_rate': round(passed / attempts, 3) if attempts else None,
+        'mean_percentage': round(mean, 1),
+        'variance_percentage': round(variance, 1),
+        'std_percentage': round(variance ** 0.5, 1),
+        'min_percentage': low,
+        'max_percentage': high,
+        'last_completed_at': last_completed_at,
+    }
+
+
+def topic_analytics(topic, days=30):
+    """
+    Rollup summary for one topic: attempts, pass rate, mean / variance of percentage, score histogram
+    and per-day buckets for the last days days. Reads only the rollup tables; None if never completed.
+    """
+    days = max(1, min(int(days), ANALYTICS_DAYS_MAX))
+    with get_pool().connection() as conn:
+        row = conn.execute(_TOPIC_ROLLUP_SQL, (topic,)).fetchone()
+        if row is None:
+            return None
+        histogram = dict(conn.execute(_TOPIC_HISTOGRAM_SQL, (topic,)).fetchall())
+        daily = conn.execute(_TOPIC_DAYS_SQL, (topic, f"-{days - 1} days")).fetchall()
+    summary = _topic_summary(row)
+    step = 100 // HISTOGRAM_BUCKETS
+    summary['histogram'] = [
+        {'from': bucket * step, 'to': 100 if bucket == HISTOGRAM_BUCKETS - 1 else (bucket + 1) * step,
+         'attempts': histogram.get(bucket, 0)}
+        for bucket in range(HISTOGRAM_BUCKETS)
+    ]
+    summary['daily'] = [
+        {'day': day, 'attempts': attempts, 'passed': passed, 'mean_percentage': round(total / attempts, 1)}
+        for day, attempts, passed, total in daily
+    ]
+    return summary
+
+
+def top_topics(limit=20):
+    """Most-attempted topics with their rollup summaries"""
+    limit = max(1, min(int(limit), SAVED_PAGE_MAX))
+    with get_pool().connection() as conn:
+        return [_topic_summary(row) for row in conn.execute(_TOP_TOPICS_SQL, (limit,))]
+
+
+def encode_cursor(completed_at, quiz_id):
+    return f"{completed_at}|{quiz_id}"
+
+
+def decode_cursor(cursor):
+    """Split a history cursor into (completed_at, id); raises ValueError when it is malformed"""
+    completed_at, quiz_id = cursor.rsplit("|", 1)
+    return completed_at, int(quiz_id)
+
+
+def saved_quizzes(user_name, limit=20, cursor=None):
+    """
+    One page of completed quizzes, newest first.
+    Keyset pagination: cursor is the next_cursor of the previous page, so every page costs
+    the same index range scan however deep the student pages.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    limit = max(1, min(int(limit), SAVED_PAGE_MAX))
+    with get_pool().connection() as conn:
+        if cursor:
+            completed_at, quiz_id = decode_cursor(cursor)
+            rows = conn.execute(_SAVED_NEXT_PAGE_SQL, (user_name, completed_at, quiz_id, limit + 1)).fetchall()
+        else:
+            rows = conn.execute(_SAVED_FIRST_PAGE_SQL, (user_name, limit + 1)).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][6], rows[-1][0])
+    quizzes = []
+    for quiz_id, topic, score, total_questions, percentage, created_at, completed_at in rows:
+        quizzes.append({
+            'id': quiz_id,
+            'topic': topic,
+            'score': score,
+            'total_questions': total_questions,
+            'percentage': round(percentage, 1) if percentage is not None else None,
+            'created_at': created_at,
+            'completed_at': completed_at
+        })
+    return quizzes, next_cursor
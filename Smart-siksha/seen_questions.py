@@ -0,0 +1,67 @@
+import os
+import time
+import quiz_db
+import near_duplicates
+from question_bank import normalize, question_hash, topic_key
+
+# -------------------- SEEN QUESTION SETTINGS --------------------
+# Newest questions remembered per student and topic; older ones may be asked again
+MAX_PER_TOPIC = int(os.environ.get("SEEN_QUESTIONS_PER_TOPIC", "1000"))
+
+_MARK_SQL = '''
+    INSERT OR REPLACE INTO seen_questions (user_name, topic_key, question_hash, seen_at)
+    VALUES (?, ?, ?, ?)
+'''
+_LOAD_SQL = "SELECT question_hash FROM seen_questions WHERE user_name = ? AND topic_key = ?"
+_COUNT_SQL = "SELECT COUNT(*) FROM seen_questions WHERE user_name = ? AND topic_key = ?"
+_PRUNE_SQL = '''
+    DELETE FROM seen_questions
+    WHERE user_name = ? AND topic_key = ? AND seen_at < (
+        SELECT seen_at FROM seen_questions
+        WHERE user_name = ? AND topic_key = ?
+        ORDER BY seen_at DESC
+        LIMIT 1 OFFSET ?
+    )
+'''
+
+
+class SeenSet:
+    """
+    The questions one student has been shown for one topic, as 64-bit text hashes.
+    Supports `normalized_text in seen`, so it drops in where the old list of texts was used.
+    With a topic_key it also matches near-duplicates of seen questions that are in the question bank.
+    """
+
+    def __init__(self, hashes=(), topic_key=None):
+        self.hashes = set(hashes)
+        self.topic_key = topic_key
+
+    def __contains__(self, normalized_text):
+        if question_hash(normalized_text) in self.hashes:
+            return True
+        return bool(self.topic_key and self.hashes) and near_duplicates.seen_match(
+            self.topic_key, normalized_text, self.hashes)
+
+    def __len__(self):
+        return len(self.hashes)
+
+
+def load(user_name, topic, near=False):
+    """The student's seen questions for topic; near=True also rejects reworded repeats"""
+    key = topic_key(topic)
+    with quiz_db.get_pool().connection() as conn:
+        rows = conn.execute(_LOAD_SQL, (user_name, key)).fetchall()
+    return SeenSet((row[0] for row in rows), topic_key=key if near else None)
+
+
+def mark(user_name, topic, texts):
+    """Remember question texts as shown to the student, keeping the newest MAX_PER_TOPIC per topic"""
+    key = topic_key(topic)
+    now = time.time()
+    rows = [(user_name, key, question_hash(normalize(text)), now) for text in texts if text]
+    if not rows:
+        return
+    with quiz_db.get_pool().transaction() as conn:
+        conn.executemany(_MARK_SQL, rows)
+        if conn.execute(_COUNT_SQL, (user_name, key)).fetchone()[0] > MAX_PER_TOPIC:
+            conn.execute(_PRUNE_SQL, (user_name, key, user_name, key, MAX_PER_TOPIC - 1))
@@ -0,0 +1,312 @@
+import os
+import json
+import time
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+from flask.sessions import SessionInterface, SessionMixin, SecureCookieSessionInterface
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+from flask.json.tag import TaggedJSONSerializer
+import quiz_db
+
+# -------------------- SESSION STORE SETTINGS --------------------
+# "sqlite" (default), "file", or "cookie" for Flask's signed-cookie sessions
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "sqlite")
+SESSION_DB_PATH = os.environ.get("SESSION_DB_PATH", "csv/sessions.db")
+SESSION_DIR = os.environ.get("SESSION_DIR", "csv/sessions")
+# Seconds a session survives without any request
+SESSION_LIFETIME = float(os.environ.get("SESSION_LIFETIME", str(7 * 24 * 3600)))
+# Sessions kept decoded-ready in memory; set 0 when several worker processes share one store
+SESSION_CACHE_SIZE = int(os.environ.get("SESSION_CACHE_SIZE", "2048"))
+SWEEP_INTERVAL = float(os.environ.get("SESSION_SWEEP_INTERVAL", "300"))
+# Unchanged sessions only get their expiry pushed back once this much of it has been used up
+TOUCH_INTERVAL = min(3600.0, SESSION_LIFETIME / 10)
+
+
+class SQLiteSessionStore:
+    """Sessions in one WAL-mode SQLite table, through the same pooled connections as the quiz database"""
+
+    def __init__(self, path=SESSION_DB_PATH):
+        self.pool = quiz_db.ConnectionPool(path)
+        with self.pool.transaction() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    data TEXT,
+                    expires_at REAL
+                ) WITHOUT ROWID
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+
+    def load(self, sid):
+        """Return (data, expires_at) for a live session, or None"""
+        with self.pool.connection() as conn:
+            row = conn.execute("SELECT data, expires_at FROM sessions WHERE sid = ? AND expires_at > ?",
+                               (sid, time.time())).fetchone()
+        return tuple(row) if row else None
+
+    def save(self, sid, data, expires_at):
+        with self.pool.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+                         (sid, data, expires_at))
+
+    def touch(self, sid, expires_at):
+        with self.pool.transaction() as conn:
+            conn.execute("UPDATE sessions SET expires_at = ? WHERE sid = ?", (expires_at, sid))
+
+    def delete(self, sid):
+        with self.pool.transaction() as conn:
+            conn.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def sweep(self):
+        """Delete expired sessions; returns how many were removed"""
+        with self.pool.transaction() as conn:
+            return conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (time.time(),)).rowcount
+
+
+class FileSessionStore:
+    """One JSON file per session, written atomically; handy when SQLite is not wanted"""
+
+    def __init__(self, folder=SESSION_DIR):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def _path(self, sid):
+        # never use the cookie value itself as a file name
+        return os.path.join(self.folder, hashlib.sha256(sid.encode("utf-8")).hexdigest() + ".json")
+
+    def _read(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                record = json.load(f)
+            return record["data"], record["expires_at"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def load(self, sid):
+        record = self._read(self._path(sid))
+        if record is None or record[1] <= time.time():
+            return None
+        return record
+
+    def save(self, sid, data, expires_at):
+        path = self._path(sid)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"data": data, "expires_at": expires_at}, f)
+        os.replace(tmp_path, path)
+
+    def touch(self, sid, expires_at):
+        record = self._read(self._path(sid))
+        if record is not None:
+            self.save(sid, record[0], expires_at)
+
+    def delete(self, sid):
+        try:
+            os.remove(self._path(sid))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self):
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.folder):
+            path = os.path.join(self.folder, name)
+            record = self._read(path) if name.endswith(".json") else None
+            if record is None or record[1] <= now:
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+
+class CachedSessionStore:
+    """In-memory LRU in front of another store; writes go through to it"""
+
+    def __init__(self, store, size=SESSION_CACHE_SIZE):
+        self.store = store
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, sid, record):
+        with self._lock:
+            self._items[sid] = record
+            self._items.move_to_end(sid)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+    def load(self, sid):
+        with self._lock:
+            record = self._items.get(sid)
+            if record is not None and record[1] > time.time():
+                self._items.move_to_end(sid)
+                self.hits += 1
+                return record
+            self._items.pop(sid, None)
+            self.misses += 1
+        record = self.store.load(sid)
+        if record is not None:
+            self._remember(sid, record)
+        return record
+
+    def save(self, sid, data, expires_at):
+        self.store.save(sid, data, expires_at)
+        self._remember(sid, (data, expires_at))
+
+    def touch(self, sid, expires_at):
+        self.store.touch(sid, expires_at)
+        with self._lock:
+            record = self._items.get(sid)
+            if record is not None:
+                self._items[sid] = (record[0], expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._items.pop(sid, None)
+        self.store.delete(sid)
+
+    def sweep(self):
+        now = time.time()
+        with self._lock:
+            for sid in [sid for sid, record in self._items.items() if record[1] <= now]:
+                del self._items[sid]
+        return self.store.sweep()
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session data kept on the server; only the signed session id travels in the cookie"""
+
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+        self.accessed = False
+
+    # reads count as access too, so responses get "Vary: Cookie"
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+    salt = "server-session"
+
+    def __init__(self, store, lifetime=SESSION_LIFETIME):
+        self.store = store
+        self.lifetime = lifetime
+        self._sweeper = None
+        self._sweeper_lock = threading.Lock()
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt=self.salt)
+
+    def _start_sweeper(self):
+        if self._sweeper is not None:
+            return
+        with self._sweeper_lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_loop, daemon=True)
+                self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(SWEEP_INTERVAL)
+            try:
+                removed = self.store.sweep()
+                if removed:
+                    print(f"🧹 Removed {removed} expired sessions")
+            except Exception as e:
+                print(f"⚠️ Session sweep failed: {e}")
+
+    def open_session(self, app, request):
+        if not app.secret_key:
+            return None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode("utf-8")
+            except BadSignature:
+                sid = None
+            record = self.store.load(sid) if sid else None
+            if record is not None:
+                data, expires_at = record
+                return ServerSession(self.serializer.loads(data), sid=sid, expires_at=expires_at)
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            # logout (session.clear()) or a visitor that never stored anything
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app),
+                                       httponly=self.get_cookie_httponly(app))
+            return
+
+        self._start_sweeper()
+        now = time.time()
+        if session.modified or session.new:
+            self.store.save(session.sid, self.serializer.dumps(dict(session)), now + self.lifetime)
+        elif session.expires_at is not None and session.expires_at - now < self.lifetime - TOUCH_INTERVAL:
+            self.store.touch(session.sid, now + self.lifetime)
+
+        if session.new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name,
+                self._signer(app).sign(session.sid.encode("utf-8")).decode("utf-8"),
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def make_interface(backend=SESSION_BACKEND):
+    """Session interface for a backend name: "sqlite", "file" or "cookie" (Flask's default)"""
+    if backend == "cookie":
+        return SecureCookieSessionInterface()
+    if backend == "file":
+        store = FileSessionStore()
+    elif backend == "sqlite":
+        store = SQLiteSessionStore()
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND {backend!r} (use sqlite, file or cookie)")
+    if SESSION_CACHE_SIZE > 0:
+        store = CachedSessionStore(store)
+    return ServerSessionInterface(store)
+
+
+def init_app(app, backend=SESSION_BACKEND):
+    app.session_interface = make_interface(backend)
+    print(f"✅ Sessions stored server-side ({backend})" if backend != "cookie" else "✅ Sessions stored in cookies")
@@ -0,0 +1,81 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Run at most one computation per key at a time.
+    Callers that arrive while a computation for the same key is running wait for it
+    and receive its result (or its exception) instead of starting their own.
+    """
+
+    def __init__(self, name=""):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.coalesced = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) for key, or wait for the identical run already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+        if not leader:
+            print(f"🔗 Joined in-flight {self.name or 'job'}: {key[:60] if isinstance(key, str) else key}")
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        return self._run(key, call, fn, args, kwargs)
+
+    def start_background(self, key, fn, *args, **kwargs):
+        """
+        Start fn in a daemon thread unless the same key is already running.
+        Returns True when a new job was started, False when one was already in flight.
+        """
+        with self._lock:
+            if key in self._calls:
+                self._calls[key].waiters += 1
+                self.coalesced += 1
+                return False
+            call = _Call()
+            self._calls[key] = call
+        thread = threading.Thread(target=self._run_quietly, args=(key, call, fn, args, kwargs))
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def _run(self, key, call, fn, args, kwargs):
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _run_quietly(self, key, call, fn, args, kwargs):
+        try:
+            self._run(key, call, fn, args, kwargs)
+        except Exception as e:
+            print(f"❌ Background {self.name or 'job'} {key} failed: {e}")
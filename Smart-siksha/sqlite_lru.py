@@ -0,0 +1,126 @@
+import time
+import sqlite3
+import threading
+
+from quiz_db import ConnectionPool
+
+
+class LRUStore:
+    """
+    A size-bounded table in its own SQLite file that evicts least-recently-used rows.
+    Every row has key, size, created_at and last_access plus the caller's columns.
+    Shared by the LLM response cache and the image cache; connections come from a quiz_db.ConnectionPool.
+    """
+
+    def __init__(self, path, table, columns, max_bytes, ttl=0, on_evict=None, counters=()):
+        self.path = path
+        self.table = table
+        self.columns = tuple(columns)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = dict.fromkeys(("hits", "misses", "stores", "expired", "evicted") + tuple(counters), 0)
+
+    def _get_pool(self):
+        """Open the pool and create the schema on first use"""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    pool = ConnectionPool(self.path)
+                    extra = "".join(f"{column} TEXT, " for column in self.columns)
+                    with pool.transaction() as conn:
+                        conn.execute(f'''
+                            CREATE TABLE IF NOT EXISTS {self.table} (
+                                key TEXT PRIMARY KEY, {extra}size INTEGER, created_at REAL, last_access REAL
+                            )
+                        ''')
+                        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{self.table}_last_access "
+                                     f"ON {self.table}(last_access)")
+                    self._pool = pool
+        return self._pool
+
+    def count(self, name, n=1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def get(self, key, columns=(), check=None):
+        """
+        Return the requested columns of key's row and mark it used, or None on a miss.
+        Expired rows, and rows for which check() is false, are dropped and count as misses.
+        """
+        select = ", ".join(("created_at",) + tuple(columns))
+        with self._get_pool().connection() as conn:
+            row = conn.execute(f"SELECT {select} FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None:
+                self.count("misses")
+                return None
+            expired = bool(self.ttl) and now - row[0] > self.ttl
+            if expired or (check is not None and not check()):
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                if expired:
+                    self.count("expired")
+                self.count("misses")
+                return None
+            conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+        self.count("hits")
+        return row[1:]
+
+    def put(self, key, size, **values):
+        """Insert or replace key's row, then evict beyond the size budget in the same transaction"""
+        now = time.time()
+        names = ("key",) + self.columns + ("size", "created_at", "last_access")
+        row = (key,) + tuple(values.get(column) for column in self.columns) + (size, now, now)
+        with self._get_pool().transaction() as conn:
+            conn.execute(f"INSERT OR REPLACE INTO {self.table} ({', '.join(names)}) "
+                         f"VALUES ({', '.join('?' * len(names))})", row)
+            self._evict(conn, now)
+        self.count("stores")
+
+    def _evict(self, conn, now):
+        if self.ttl:
+            expired = conn.execute(f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl,)).rowcount
+            if expired > 0:
+                self.count("expired", expired)
+
+        total = conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {self.table}").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Drop least-recently-used rows until we are back under 90% of the budget
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for key, size in conn.execute(f"SELECT key, size FROM {self.table} ORDER BY last_access ASC").fetchall():
+            if total <= target:
+                break
+            conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            if self.on_evict is not None:
+                self.on_evict(key)
+            total -= size
+            evicted += 1
+        self.count("evicted", evicted)
+
+    def stats(self):
+        """Hit/miss counters since startup plus the current size of the store"""
+        with self._stats_lock:
+            result = dict(self._stats)
+        lookups = result["hits"] + result["misses"]
+        result["hit_rate"] = round(result["hits"] / lookups, 3) if lookups else 0.0
+        result["max_bytes"] = self.max_bytes
+        try:
+            with self._get_pool().connection() as conn:
+                entries, size = conn.execute(
+                    f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {self.table}").fetchone()
+            result["entries"] = entries
+            result["bytes"] = size
+        except sqlite3.Error as e:
+            print(f"⚠️ {self.table} stats failed: {e}")
+        return result
+
+    def clear(self):
+        """Remove every row"""
+        with self._get_pool().transaction() as conn:
+            conn.execute(f"DELETE FROM {self.table}")
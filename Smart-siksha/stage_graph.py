@@ -0,0 +1,85 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class StageFailed(Exception):
+    """Raised by StageGraph.run() when a stage raised; the stage's exception is the __cause__"""
+
+    def __init__(self, stage, error):
+        super().__init__(f"Stage {stage!r} failed: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class StageGraph:
+    """
+    A small DAG of named stages, each started on its own thread as soon as the stages it runs
+    after have finished. A stage is called with its dependencies' results, in the order given.
+    on_event(stage, status, timings) is called as stages start ("running") and end ("done" / "failed").
+    """
+
+    def __init__(self, on_event=None):
+        self.on_event = on_event
+        self._stages = {}   # name -> (fn, after)
+        self._timings = {}
+        self._lock = threading.Lock()
+        self._started = None
+
+    def add(self, name, fn, after=()):
+        for dep in after:
+            if dep not in self._stages:
+                raise ValueError(f"Stage {name!r} runs after unknown stage {dep!r}")
+        self._stages[name] = (fn, tuple(after))
+        return self
+
+    def timings(self):
+        """stage -> {"status", "start_s" (from run()), "seconds"}"""
+        with self._lock:
+            return {name: dict(t) for name, t in self._timings.items()}
+
+    def _event(self, name, status, **fields):
+        with self._lock:
+            self._timings.setdefault(name, {}).update(status=status, **fields)
+        if self.on_event:
+            self.on_event(name, status, self.timings())
+
+    def _run_stage(self, name, args):
+        fn, _ = self._stages[name]
+        start = time.perf_counter()
+        self._event(name, "running", start_s=round(start - self._started, 2))
+        try:
+            result = fn(*args)
+        except Exception:
+            self._event(name, "failed", seconds=round(time.perf_counter() - start, 2))
+            raise
+        self._event(name, "done", seconds=round(time.perf_counter() - start, 2))
+        return result
+
+    def run(self):
+        """Run every stage; returns {stage: result} or raises StageFailed for the first failure"""
+        self._started = time.perf_counter()
+        results = {}
+        running = {}
+        pending = dict(self._stages)
+        executor = ThreadPoolExecutor(max_workers=max(1, len(self._stages)), thread_name_prefix="stage")
+        try:
+            while pending or running:
+                for name, (_, after) in list(pending.items()):
+                    if all(dep in results for dep in after):
+                        del pending[name]
+                        running[executor.submit(self._run_stage, name, [results[d] for d in after])] = name
+                if not running:
+                    raise ValueError(f"Stages {', '.join(pending)} can never start (dependency cycle)")
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        raise StageFailed(name, e) from e
+            return results
+        finally:
+            # after a failure nothing new starts, but running stages are waited for, so a retry
+            # never overlaps with leftovers of this run writing the same files
+            executor.shutdown(wait=True, cancel_futures=True)
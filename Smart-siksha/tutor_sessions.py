@@ -0,0 +1,117 @@
+import os
+import time
+import uuid
+import threading
+from array import array
+from collections import OrderedDict, deque
+
+# -------------------- TUTOR SESSION SETTINGS --------------------
+# Conversations kept in memory; the least recently used one is dropped beyond this
+MAX_SESSIONS = int(os.environ.get("TUTOR_MAX_SESSIONS", "500"))
+# Seconds of inactivity after which a conversation is forgotten
+IDLE_TTL = float(os.environ.get("TUTOR_SESSION_TTL", "1800"))
+# Longer contexts would overflow the model's window (num_ctx), so the conversation is re-seeded instead
+MAX_CONTEXT_TOKENS = int(os.environ.get("TUTOR_MAX_CONTEXT_TOKENS", "3072"))
+# Turns replayed as text when a conversation has to be re-seeded
+RESEED_TURNS = int(os.environ.get("TUTOR_RESEED_TURNS", "3"))
+
+
+class Conversation:
+    """
+    One student's chat with the tutor.
+    context holds Ollama's encoded conversation (token ids) so follow-up turns only send the
+    new question; the last few turns are also kept as text for when context has to be rebuilt.
+    """
+
+    def __init__(self, conversation_id, preamble):
+        self.id = conversation_id
+        self.preamble = preamble
+        self.context = None
+        self.turns = deque(maxlen=RESEED_TURNS)
+        self.turn_count = 0
+        self.last_used = time.time()
+
+    def prompt_for(self, question):
+        """Return (prompt, context) for the next turn"""
+        turn = f"Q: {question}\nA:"
+        if self.context is not None:
+            return turn, self.context
+        history = "".join(f"Q: {q}\nA: {a}\n\n" for q, a in self.turns)
+        return f"{self.preamble}\n\n{history}{turn}", None
+
+    def record(self, question, answer, context):
+        """
+        Store a finished turn. Without a usable context (stream cut short, window full)
+        the next turn is re-seeded from the preamble and the recent turns.
+        """
+        self.turns.append((question, answer))
+        self.turn_count += 1
+        self.last_used = time.time()
+        if context and len(context) <= MAX_CONTEXT_TOKENS:
+            self.context = array("i", context)
+        else:
+            self.context = None
+
+
+class TutorSessions:
+    """Bounded LRU of conversations with idle expiry"""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_ttl=IDLE_TTL):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"created": 0, "evicted": 0, "expired": 0, "reused_turns": 0, "seeded_turns": 0}
+
+    def _sweep(self, now):
+        while self._items:
+            oldest = next(iter(self._items.values()))
+            if now - oldest.last_used < self.idle_ttl:
+                break
+            self._items.popitem(last=False)
+            self._stats["expired"] += 1
+
+    def get_or_create(self, conversation_id, preamble):
+        """
+        Return the conversation for conversation_id, or a new one when it is unknown, expired
+        or was started with a different preamble (the student switched topic or class).
+        """
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            conversation = self._items.get(conversation_id) if conversation_id else None
+            if conversation is not None and conversation.preamble == preamble:
+                conversation.last_used = now
+                self._items.move_to_end(conversation.id)
+                return conversation
+            if conversation is not None:
+                del self._items[conversation.id]
+            conversation = Conversation(uuid.uuid4().hex, preamble)
+            self._items[conversation.id] = conversation
+            self._stats["created"] += 1
+            while len(self._items) > self.max_sessions:
+                self._items.popitem(last=False)
+                self._stats["evicted"] += 1
+            return conversation
+
+    def begin_turn(self, conversation, question):
+        """Prompt and context for the next turn of conversation, counting context reuse"""
+        prompt, context = conversation.prompt_for(question)
+        with self._lock:
+            self._stats["reused_turns" if context is not None else "seeded_turns"] += 1
+        return prompt, context
+
+    def reset(self, conversation_id):
+        with self._lock:
+            return self._items.pop(conversation_id, None) is not None
+
+    def stats(self):
+        with self._lock:
+            self._sweep(time.time())
+            context_tokens = sum(len(c.context) for c in self._items.values() if c.context is not None)
+            return dict(self._stats, sessions=len(self._items), max_sessions=self.max_sessions,
+                        context_tokens=context_tokens, context_bytes=context_tokens * array("i").itemsize)
+
+
+# Shared by every tutor request in the process
+sessions = TutorSessions()